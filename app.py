@@ -1,41 +1,24 @@
 import dash
 from dash import html
-import geopandas as gpd
-import pandas as pd
 import folium
 
+from data_service import get_service
+
 # -------------------------
 # 1) Load your data
 # -------------------------
-shapefile_path = r"data/khonkaen_provinces.shp"
-excel_path = r"data/df_merged_subdistrict.xlsx"
-
-# Load shapefile
-gdf = gpd.read_file(shapefile_path)
-
-# Fix column name (shp has "Subdistric" but excel has "Subdistrict")
-gdf = gdf.rename(columns={"Subdistric": "Subdistrict"})
-
-# Load excel file
-df = pd.read_excel(excel_path)
-
-# Make sure the column names are clean (trim spaces)
-df.columns = df.columns.str.strip()
-gdf.columns = gdf.columns.str.strip()
+# parquet ของ pipeline + geometry ผ่าน DataService (ไม่ต้อง read_excel ตอนเริ่ม)
+# ถ้ามีแต่ Excel แบบเดิม: python convert_excel.py
+svc = get_service()
+cube = svc.cube
+gdf = svc.geometry().asset().gdf
 
 # -------------------------
 # 2) Merge shapefile + data
 # -------------------------
-merge_cols = ["Province", "District", "Subdistrict"]
-
-# Ensure both datasets have all columns
-for col in merge_cols:
-    if col not in gdf.columns:
-        print("❌ Missing col in gdf:", col)
-    if col not in df.columns:
-        print("❌ Missing col in df:", col)
-
-gdf_merged = gdf.merge(df, on=merge_cols, how="left")
+# ค่าเฉลี่ยต่อตำบลทั้งช่วงเวลา (1 แถวต่อ feature id)
+df = svc.map_values('ndvi', cube.dates[0], cube.dates[-1])
+gdf_merged = gdf.join(df.set_index('id')['ndvi'], how="left")
 
 # -------------------------
 # 3) Generate Folium Map
@@ -43,12 +26,12 @@ gdf_merged = gdf.merge(df, on=merge_cols, how="left")
 m = folium.Map(location=[16.45, 102.83], zoom_start=9)
 
 # Add Choropleth only if we have NDVI
-if "NDVI" in gdf_merged.columns:
+if "ndvi" in gdf_merged.columns:
     folium.Choropleth(
-        geo_data=gdf_merged,
-        data=gdf_merged,
-        columns=["Subdistrict", "NDVI"],
-        key_on="feature.properties.Subdistrict",
+        geo_data=gdf_merged[["geometry"]],
+        data=gdf_merged.reset_index(),
+        columns=["id", "ndvi"],
+        key_on="feature.id",
         fill_color="YlGn",
         fill_opacity=0.7,
         line_opacity=0.2,
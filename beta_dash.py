@@ -1,68 +1,83 @@
+import numpy as np
 import pandas as pd
-import geopandas as gpd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import Dash, html, dcc, callback
+from dash import Dash, DiskcacheManager, html, dcc, callback
 from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
-from diskcache import Cache # Library Caching
+from diskcache import Cache, Lock # Library Caching
 import os
 
+from data_service import get_service
+from geo_assets import area_id, level_keys
+
 # ----------------------------------------------------
 # --- I. การตั้งค่า Global Variables และ Caching ---
 # ----------------------------------------------------
 
 # ตั้งค่า Disk Cache สำหรับ Memoization (ประสิทธิภาพ)
+# - เก็บแค่ array ค่าต่อพื้นที่ + time series + สถิติ (ไม่มี geometry) → cache hit = unpickle array เล็กๆ
+# - จำกัดขนาด แล้วลบ entry ที่ไม่ได้ใช้นานที่สุดก่อน (LRU)
+# - เก็บข้าม restart ได้: key มี version ของข้อมูล → parquet เปลี่ยนแล้ว entry เดิมไม่ถูกใช้และถูกลบออกไปเอง
 CACHE_DIR = os.path.join(os.getcwd(), "cache_directory")
+CACHE_SIZE_LIMIT = 256 * 2**20 # 256 MB
 if not os.path.exists(CACHE_DIR):
     os.makedirs(CACHE_DIR)
-cache = Cache(CACHE_DIR)
+cache = Cache(CACHE_DIR, size_limit=CACHE_SIZE_LIMIT, eviction_policy='least-recently-used')
 memoize = cache.memoize # สร้างฟังก์ชันแคช
 
-# Path File
-file_path_xlsx = r'C:\Users\NBODT\my_dash_app\data\df_merged_subdistrict.xlsx' 
-file_path_shp = r'C:\Users\NBODT\my_dash_app\data\khonkaen_provinces.shp'
+# Background Callback: งานหนักรันใน worker process (diskcache เป็นตัวกลาง ไม่ต้องมี broker ภายนอก)
+# - callback ใหม่ของ session เดิมยกเลิกงานเก่าที่ยังไม่เสร็จ (Dash ส่ง oldJob มาให้ terminate)
+# - ใช้ cache แยกจาก memoize เพื่อไม่ให้ LRU ลบสถานะของงานที่กำลังรัน
+background_cache = Cache(os.path.join(CACHE_DIR, "background"))
+background_manager = DiskcacheManager(background_cache)
+LOCK_EXPIRE = 30 # วินาที: worker ที่ถูกยกเลิกขณะถือ lock จะไม่ขวางคนอื่นนานกว่านี้
+
+# ข้อมูลทั้งหมดมาจาก DataService (parquet ของ pipeline, path ตาม DASH_DATA_DIR)
+# ถ้ามีแต่ Excel แบบเดิม: python convert_excel.py
+svc = get_service()
 
 # Global Data Structures
-df = pd.DataFrame()
-gdf = gpd.GeoDataFrame()
+cube = None
+data_version = None
 all_dates = []
 slider_marks = {}
 min_date_index = 0
 max_date_index = 0
-analysis_vars = ['LST', 'SoilMoisture', 'precipitation', 'FireCount', 'NDVI']
+analysis_vars = {'lst': 'LST', 'soilmoisture': 'SoilMoisture', 'rainfall': 'precipitation', 'firecount': 'FireCount', 'ndvi': 'NDVI'}
 all_provinces = []
 all_districts = {}
 
 # --- ฟังก์ชันสำหรับกำหนดสีตามตัวแปร ---
 def get_color_scale(variable):
     """คืนค่า Plotly Color Scale ที่เหมาะสมกับตัวแปรที่เลือก"""
-    if variable == 'NDVI':
+    if variable == 'ndvi':
         # เขียวเข้ม(ดี) -> เหลือง(ไม่ดี)
         return 'Viridis_r' 
-    if variable == 'LST':
+    if variable == 'lst':
         # ร้อน (แดงเข้ม) -> เย็น (ฟ้า)
         return 'Inferno' 
-    if variable == 'FireCount':
+    if variable == 'firecount':
         # ไฟป่า (แดงเข้ม)
         return 'YlOrRd'
-    if variable == 'SoilMoisture':
+    if variable == 'soilmoisture':
         # ชื้น (น้ำเงินเข้ม) -> แห้ง (เหลือง)
         return 'dense'
-    if variable == 'precipitation':
+    if variable == 'rainfall':
         # ฝนมาก (น้ำเงินเข้ม)
         return 'Oceans'
     return 'Plasma'
 
 # --- การโหลดและเตรียมข้อมูล (รันครั้งเดียว) ---
+# cube ของ pipeline (หรือ parquet) → TimeCube (ไม่ต้อง parse Excel / string วันที่ตอนเริ่ม)
 try:
-    df = pd.read_excel(file_path_xlsx)
-    df.columns = df.columns.str.replace(' ', '_')
-    df['year_month_dt'] = pd.to_datetime(df['year_month'], format='%Y-%m')
-    df['year_month_label'] = df['year_month_dt'].dt.strftime('%Y-%m')
+    cube = svc.cube
+    # สร้าง geometry ตอน import → process ของ DiskcacheManager (fork) ได้ของที่สร้างแล้วไป ไม่ต้องสร้างใหม่ทุก job
+    svc.geometry().asset()
+    data_version = svc.version
     
-    # เตรียม Time Slider
-    all_dates = sorted(df['year_month_label'].unique())
+    # เตรียม Time Slider (เดือนที่ไม่ซ้ำเรียงแล้วจาก cube)
+    all_dates = list(cube.dates.strftime('%Y-%m'))
     step = 12 # แสดง mark ทุก 12 เดือน (1 ปี)
     
     # ปรับ Style ของ Slider Mark ให้เข้ากับ SLATE Theme
@@ -75,26 +90,13 @@ try:
     max_date_index = len(all_dates) - 1
     
     # เตรียม Filter
-    all_provinces = sorted(df['Province'].unique())
-    for province in all_provinces:
-        all_districts[province] = sorted(df[df['Province'] == province]['District'].unique())
+    all_provinces = sorted(cube.areas['province'].unique())
+    for province, areas in cube.areas.groupby('province'):
+        all_districts[province] = sorted(areas['district'].unique())
 
-    print("✅ โหลดและเตรียมข้อมูล Excel สำเร็จ")
-except Exception as e:
-    print(f"❌ Error ในการโหลด Excel: {e}")
-
-try:
-    gdf = gpd.read_file(file_path_shp)
-    if 'Subdistric' in gdf.columns:
-        gdf = gdf.rename(columns={'Subdistric': 'Subdistrict'})
-        
-    # คำนวณจุดศูนย์กลาง (Centroid) ของแต่ละตำบลสำหรับ Marker Map
-    gdf['Lat'] = gdf.geometry.centroid.y
-    gdf['Lon'] = gdf.geometry.centroid.x
-    
-    print("✅ โหลดและเตรียม Shapefile สำเร็จ")
+    print("✅ โหลดและเตรียมข้อมูล parquet สำเร็จ")
 except Exception as e:
-    print(f"❌ Error ในการโหลด Shapefile: {e}")
+    print(f"❌ Error ในการโหลดข้อมูล: {e}")
 
 
 # ----------------------------------------------------
@@ -102,7 +104,8 @@ except Exception as e:
 # ----------------------------------------------------
 
 # ใช้ SLATE Theme เพื่อให้มีพื้นหลังสีดำ/เทา
-app = Dash(__name__, external_stylesheets=[dbc.themes.SLATE], title="Geo-Analysis Dashboard")
+app = Dash(__name__, external_stylesheets=[dbc.themes.SLATE], title="Geo-Analysis Dashboard",
+           background_callback_manager=background_manager)
 
 # Layout สำหรับส่วนควบคุม
 controls = dbc.Card(
@@ -114,8 +117,8 @@ controls = dbc.Card(
         html.Label("ตัวแปรที่ต้องการวิเคราะห์:", className="mt-3 text-light"),
         dcc.Dropdown(
             id='variable-selector',
-            options=[{'label': col, 'value': col} for col in analysis_vars],
-            value='NDVI', 
+            options=[{'label': label, 'value': col} for col, label in analysis_vars.items()],
+            value='ndvi', 
             clearable=False,
             className="mb-3 text-dark",
         ),
@@ -242,41 +245,57 @@ def set_district_options(selected_province):
     return [], None
 
 # 4.2 ฟังก์ชันคำนวณข้อมูลหลักที่ถูกแคช (เพื่อประสิทธิภาพ)
-@memoize()
-def compute_data_for_map(selected_variable, start_date, end_date, sel_prov, sel_dist, sel_level):
-    """ฟังก์ชันคำนวณข้อมูลหลักที่ถูกแคช"""
-    df_filtered = df[(df['year_month_dt'] >= start_date) & (df['year_month_dt'] <= end_date)].copy()
-    
-    # กรองตามภูมิศาสตร์
-    if sel_prov:
-        df_filtered = df_filtered[df_filtered['Province'] == sel_prov]
-    if sel_dist:
-        df_filtered = df_filtered[df_filtered['District'] == sel_dist]
-
-    # กำหนดระดับการ Merge/Groupby
-    if sel_level == 'Heatmap' or sel_level == 'Subdistrict':
-        merge_cols = ['Province', 'District', 'Subdistrict']
-    elif sel_level == 'District':
-        merge_cols = ['Province', 'District']
-    else:
-         merge_cols = ['Province', 'District', 'Subdistrict'] # Fallback
-    
-    # Groupby
-    df_map = df_filtered.groupby(merge_cols)[selected_variable].mean().reset_index()
-    
-    # Merge เฉพาะคอลัมน์ที่จำเป็นสำหรับ Heatmap/Choropleth
-    if sel_level == 'Heatmap':
-        # สำหรับ Heatmap เราต้อง Merge Lat/Lon ด้วย
-        merged_gdf = gdf[['Province', 'District', 'Subdistrict', 'Lat', 'Lon', 'geometry']].merge(
-            df_map, on=merge_cols, how='left')
-    else:
-        # สำหรับ Choropleth
-        merged_gdf = gdf.merge(df_map, on=merge_cols, how='left')
-    
-    # ***แก้ไข ValueError: ส่งค่า 4 ค่า (merged_gdf, df_filtered, merge_cols, df_map) ออกมา***
-    return merged_gdf, df_filtered, merge_cols, df_map 
+def filter_key(selected_variable, time_range_index, sel_prov, sel_dist, sel_level):
+    """ตัวกรองจาก UI → tuple มาตรฐาน (ตัวกรองที่ให้ผลเหมือนกันได้ key เดียวกัน)"""
+    level = 'district' if sel_level == 'District' else 'subdistrict' # Heatmap ใช้ค่าระดับตำบลเหมือน Subdistrict
+    return (
+        selected_variable,
+        all_dates[time_range_index[0]],
+        all_dates[time_range_index[1]],
+        sel_prov or None,
+        (sel_dist or None) if sel_prov else None,
+        level,
+    )
+
+@memoize(name='compute_data_for_map')
+def compute_data_for_map(version, selected_variable, start, end, sel_prov, sel_dist, level):
+    """
+    ค่าต่อพื้นที่ + time series + สถิติ แบบ compact (ไม่มี geometry / DataFrame ที่กรองแล้ว)
+    version = version ของข้อมูล → ข้อมูลใหม่ไม่ใช้ entry เดิม
+    """
+    df_map = svc.map_values(selected_variable, start, end, sel_prov, sel_dist, level=level)
+    dates, series = svc.series(selected_variable, start, end, sel_prov, sel_dist)
+    values = df_map[selected_variable].to_numpy(np.float32)
+
+    stats = None
+    if len(values):
+        keys = level_keys(level)
+        i_min, i_max = int(values.argmin()), int(values.argmax())
+        stats = {
+            'min': float(values[i_min]), 'max': float(values[i_max]), 'mean': float(values.mean()),
+            'min_area': ', '.join(df_map.loc[i_min, keys]), 'max_area': ', '.join(df_map.loc[i_max, keys]),
+        }
+    return {
+        'ids': df_map['id'].to_numpy(),
+        'values': values,
+        'dates': dates.to_numpy(),
+        'series': np.asarray(series, dtype=np.float32),
+        'stats': stats,
+    }
 
-# 4.3 Callback หลัก: อัปเดตแผนที่และ Time Series
+def get_data_for_map(*args):
+    """
+    compute_data_for_map + รวมคำขอที่เหมือนกัน: ถ้าหลาย worker ขอ key เดียวกันพร้อมกัน
+    ตัวแรกคำนวณ (ถือ lock ของ key นั้น) ตัวอื่นรอแล้วอ่านผลจาก cache
+    """
+    key = compute_data_for_map.__cache_key__(*args)
+    result = cache.get(key, default=None, retry=True)
+    if result is None:
+        with Lock(cache, ('lock',) + key, expire=LOCK_EXPIRE):
+            result = compute_data_for_map(*args)
+    return result
+
+# 4.3 Callback หลัก: อัปเดตแผนที่และ Time Series (background)
 @callback(
     [Output('main-map', 'figure'),
      Output('time-series-chart', 'figure'),
@@ -286,21 +305,28 @@ def compute_data_for_map(selected_variable, start_date, end_date, sel_prov, sel_
      Input('time-slider', 'value'),
      Input('province-selector', 'value'),
      Input('district-selector', 'value'),
-     Input('level-selector', 'value')]
+     Input('level-selector', 'value')],
+    background=True,
+    running=[(Output('map-title-display', 'className'), "text-center text-secondary", "text-center text-warning")],
 )
 def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, sel_level):
-    if df.empty or gdf.empty:
+    if cube is None or len(cube.dates) == 0:
         return {}, {}, "Error: ข้อมูลไม่พร้อม", ""
     
-    # 1. เตรียมช่วงเวลา (สำหรับ Key Caching)
-    start_date_str = all_dates[time_range_index[0]]
-    end_date_str = all_dates[time_range_index[1]]
-    start_date = pd.to_datetime(start_date_str, format='%Y-%m')
-    end_date = pd.to_datetime(end_date_str, format='%Y-%m')
+    # 1. ตัวกรองมาตรฐาน (Key Caching)
+    key = filter_key(selected_variable, time_range_index, sel_prov, sel_dist, sel_level)
+    _, start_date_str, end_date_str, _, _, level = key
+    start_date = cube.dates[time_range_index[0]]
+    end_date = cube.dates[time_range_index[1]]
     
     # 2. คำนวณข้อมูลโดยเรียกจากฟังก์ชันที่ถูกแคช
-    merged_gdf, df_filtered, merge_cols, df_map = compute_data_for_map(
-        selected_variable, start_date, end_date, sel_prov, sel_dist, sel_level)
+    result = get_data_for_map(data_version, *key)
+
+    # ค่าของแต่ละตำบลตามลำดับ feature ของ geometry (อำเภอ → ทุกตำบลในอำเภอได้ค่าเดียวกัน)
+    asset = svc.geometry().asset()
+    feature_ids = asset.ids if level == 'subdistrict' else area_id(asset.areas, level)
+    pos = pd.Index(result['ids']).get_indexer(feature_ids)
+    df_areas = asset.areas.assign(**{selected_variable: np.append(result['values'], np.nan)[pos]}) # -1 (ไม่มีค่า) → NaN
 
     # 3. กำหนด Title
     title_location = "ทุกพื้นที่"
@@ -311,17 +337,17 @@ def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, se
     if sel_level in ['Subdistrict', 'District']:
         # Choropleth Map (แผนที่ระบายสีตามขอบเขต)
         fig_map = px.choropleth_mapbox(
-            merged_gdf, 
-            geojson=merged_gdf.geometry.__geo_interface__, 
-            locations=merged_gdf.index, 
+            df_areas, 
+            geojson=asset.geojson, 
+            locations=asset.ids, 
             color=selected_variable, 
             color_continuous_scale=get_color_scale(selected_variable),
             mapbox_style="carto-positron", 
             zoom=6.5 if sel_prov is None else 8, 
             center={"lat": 16.1, "lon": 102.8}, 
             opacity=0.8,
-            labels={selected_variable: selected_variable},
-            hover_name=sel_level, 
+            labels={selected_variable: analysis_vars[selected_variable]},
+            hover_name=sel_level.lower(), 
             title=None
         )
         fig_map.update_traces(marker_line_width=0.1, marker_opacity=0.7) 
@@ -329,9 +355,9 @@ def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, se
     elif sel_level == 'Heatmap':
         # Heatmap / Bubble Map (จำลอง Grid-like)
         fig_map = px.scatter_mapbox(
-            merged_gdf.dropna(subset=['Lat', 'Lon', selected_variable]), 
-            lat='Lat', 
-            lon='Lon', 
+            df_areas.dropna(subset=['lat', 'lon', selected_variable]), 
+            lat='lat', 
+            lon='lon', 
             color=selected_variable, 
             size=selected_variable, 
             size_max=15, 
@@ -340,8 +366,8 @@ def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, se
             zoom=6.5 if sel_prov is None else 8, 
             center={"lat": 16.1, "lon": 102.8}, 
             opacity=0.7,
-            labels={selected_variable: selected_variable},
-            hover_name='Subdistrict'
+            labels={selected_variable: analysis_vars[selected_variable]},
+            hover_name='subdistrict'
         )
     
     else: # Fallback
@@ -350,13 +376,13 @@ def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, se
     fig_map.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, uirevision='map-layout') 
     
     # --- 5. สร้าง Time Series Figure ---
-    df_ts_all = df_filtered.groupby('year_month_dt')[selected_variable].mean().reset_index()
+    df_ts_all = pd.DataFrame({'date': result['dates'], selected_variable: result['series']})
     
-    fig_ts = px.line(df_ts_all, x='year_month_dt', y=selected_variable)
+    fig_ts = px.line(df_ts_all, x='date', y=selected_variable)
     fig_ts.update_layout(
-        title_text=f'แนวโน้มรายเดือนของ {selected_variable}',
+        title_text=f'แนวโน้มรายเดือนของ {analysis_vars[selected_variable]}',
         xaxis_title='เดือน/ปี',
-        yaxis_title=selected_variable,
+        yaxis_title=analysis_vars[selected_variable],
         template='plotly_dark'
     )
     
@@ -365,23 +391,15 @@ def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, se
     
     # --- 6. สร้างตารางสรุป Min/Max/Mean ---
     summary_table = html.P("ไม่พบข้อมูลในช่วงเวลาที่เลือก", className="text-warning")
-    if not df_map.empty and not merged_gdf[selected_variable].isnull().all(): 
-        valid_data = merged_gdf.dropna(subset=[selected_variable])
-        df_summary = valid_data[selected_variable].agg(['min', 'max', 'mean']).to_frame().T.round(3)
-        
-        idx_min = valid_data[selected_variable].idxmin()
-        idx_max = valid_data[selected_variable].idxmax()
-        
-        min_loc = valid_data.loc[idx_min, merge_cols].to_dict()
-        max_loc = valid_data.loc[idx_max, merge_cols].to_dict()
-
+    stats = result['stats']
+    if stats: 
         summary_table = dbc.Table(
             [
                 html.Thead(html.Tr([html.Th("สถิติ", className="text-info"), html.Th("ค่า", className="text-info"), html.Th("พื้นที่ (Min/Max)", className="text-info")]), style={'background-color': '#343a40'}),
                 html.Tbody([
-                    html.Tr([html.Td("Min"), html.Td(df_summary['min'].iloc[0]), html.Td(', '.join(min_loc.values()))]),
-                    html.Tr([html.Td("Max"), html.Td(df_summary['max'].iloc[0]), html.Td(', '.join(max_loc.values()))]),
-                    html.Tr([html.Td("Mean"), html.Td(df_summary['mean'].iloc[0]), html.Td("-")]),
+                    html.Tr([html.Td("Min"), html.Td(round(stats['min'], 3)), html.Td(stats['min_area'])]),
+                    html.Tr([html.Td("Max"), html.Td(round(stats['max'], 3)), html.Td(stats['max_area'])]),
+                    html.Tr([html.Td("Mean"), html.Td(round(stats['mean'], 3)), html.Td("-")]),
                 ])
             ],
             bordered=True,
@@ -392,7 +410,7 @@ def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, se
         )
     
     map_title = html.Span([
-        html.Span(f"การกระจายของ {selected_variable} ({sel_level})"),
+        html.Span(f"การกระจายของ {analysis_vars[selected_variable]} ({sel_level})"),
         html.Br(),
         html.Small(f"พื้นที่: {title_location} | ช่วงเวลา: {start_date_str} ถึง {end_date_str}", className="text-muted")
     ])
@@ -402,5 +420,4 @@ def update_dashboard(selected_variable, time_range_index, sel_prov, sel_dist, se
 
 # --- 6. รัน App ---
 if __name__ == '__main__':
-    cache.clear() 
     app.run(debug=True, port=8050)
\ No newline at end of file
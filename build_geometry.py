@@ -0,0 +1,126 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+from geo_assets import LEVELS, OUTLINE_LEVELS, area_id, level_keys, normalize, outline_coords
+
+# ----------------------------------------------------
+# OFFLINE GEOMETRY BUILD สำหรับ dashboard
+#
+#   python build_geometry.py --shp data/khonkaen_provinces.shp --out data/geo
+#
+# ต่อ level (province / district / subdistrict) × LOD (low / mid / high):
+#   - dissolve ตาม level (ทำครั้งเดียวตอน build ไม่ใช่ทุก rerun)
+#   - simplify แบบ coverage (ขอบที่ใช้ร่วมกันถูก simplify เหมือนกัน → ไม่มีรู/ทับกัน)
+#     ถ้า shapely < 2.1 ใช้ simplify(preserve_topology=True) แทน
+#   - quantize พิกัดลง grid ของ LOD แล้วตัดทศนิยมให้ข้อความสั้น
+#   - เขียน <level>_<lod>.geojson (feature id = area id ของ level) + manifest.json
+#   - เส้นขอบจังหวัด/อำเภอเป็น array lon/lat พร้อม plot → outlines_<lod>.json
+#
+# tolerance ของแต่ละ LOD ≈ ขนาด 1 pixel ที่ zoom ที่ใช้ LOD นั้น (ดู geo_assets.lod_for_zoom)
+# ----------------------------------------------------
+LODS = {
+    # name: (simplify tolerance °, quantization grid °)
+    'low': (0.005, 0.001),
+    'mid': (0.0015, 0.0002),
+    'high': (0.0004, 0.00005),
+}
+
+
+def dissolve(gdf, level):
+    """
+    1 feature ต่อ area ของ level (index = area id)
+    """
+    keys = level_keys(level)
+    out = gdf[keys + ['geometry']]
+    if level != 'subdistrict' or pd.Index(area_id(out, level)).duplicated().any():
+        out = out.dissolve(by=keys, as_index=False)
+    out.index = pd.Index(area_id(out, level), name='id')
+    return out.sort_index()
+
+
+def simplify(geoms, tolerance):
+    """
+    coverage simplify (ขอบร่วมไม่แยกออกจากกัน) ถ้ามี ไม่อย่างนั้น simplify ทีละ polygon
+    """
+    if hasattr(shapely, 'coverage_simplify'):
+        try:
+            return shapely.coverage_simplify(geoms, tolerance)
+        except shapely.errors.GEOSException as e:
+            print(f"⚠️ coverage_simplify failed ({e}) — falling back to simplify")
+    return shapely.simplify(geoms, tolerance, preserve_topology=True)
+
+
+def quantize(geoms, grid):
+    snapped = shapely.set_precision(geoms, grid)
+    decimals = int(np.ceil(-np.log10(grid)))
+    return shapely.transform(snapped, lambda xy: np.round(xy, decimals))
+
+
+def build_lod(base, tolerance, grid):
+    geoms = base.geometry.to_numpy()
+    out = quantize(simplify(geoms, tolerance), grid)
+    # polygon เล็กมากอาจหายไปตอน simplify/quantize → ใช้ geometry เดิมที่ quantize แล้วแทน
+    empty = shapely.is_empty(out)
+    if empty.any():
+        out[empty] = quantize(geoms[empty], grid)
+    lod = base.copy()
+    lod['geometry'] = out
+    return lod
+
+
+def build(shp_path, out_dir):
+    gdf = normalize(gpd.read_file(shp_path))
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(4326)
+    os.makedirs(out_dir, exist_ok=True)
+
+    full_bytes = len(dissolve(gdf, 'subdistrict')[['geometry']].to_json())
+    manifest = {'source': os.path.basename(shp_path), 'lods': {k: {'tolerance': t, 'grid': g} for k, (t, g) in LODS.items()}, 'files': {}}
+
+    outlines = {lod: {} for lod in LODS}
+    print(f"{'level':<12} {'lod':<5} {'features':>8} {'KB':>9}")
+    for level in LEVELS:
+        base = dissolve(gdf, level)
+        for lod, (tolerance, grid) in LODS.items():
+            lod_gdf = build_lod(base, tolerance, grid)
+            if level in OUTLINE_LEVELS:
+                outlines[lod][level] = dict(zip(lod_gdf.index, map(outline_coords, lod_gdf.geometry)))
+            text = lod_gdf.to_json()
+            filename = f"{level}_{lod}.geojson"
+            tmp = os.path.join(out_dir, f"{filename}.tmp")
+            with open(tmp, 'w') as f:
+                f.write(text)
+            os.replace(tmp, os.path.join(out_dir, filename))
+
+            manifest['files'].setdefault(level, {})[lod] = {'file': filename, 'features': len(base), 'bytes': len(text)}
+            print(f"{level:<12} {lod:<5} {len(base):>8} {len(text) / 1024:>9.1f}")
+
+    for lod, table in outlines.items():
+        filename = f"outlines_{lod}.json"
+        with open(os.path.join(out_dir, filename), 'w') as f:
+            json.dump(table, f, separators=(',', ':'))
+        manifest.setdefault('outlines', {})[lod] = filename
+
+    sub = manifest['files']['subdistrict']
+    print(f"\n📦 subdistrict full precision: {full_bytes / 1024:.1f} KB → "
+          + ", ".join(f"{lod} {full_bytes / v['bytes']:.1f}x smaller" for lod, v in sub.items()))
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Geometry assets saved to {out_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build multi-LOD GeoJSON assets for the dashboards")
+    parser.add_argument('--shp', default='data/khonkaen_provinces.shp')
+    parser.add_argument('--out', default='data/geo')
+    args = parser.parse_args()
+    build(args.shp, args.out)
+
+if __name__ == '__main__':
+    main()
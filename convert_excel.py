@@ -0,0 +1,60 @@
+import os
+import argparse
+import pandas as pd
+
+from data_service import DATA_DIR, LOCAL_DATA_DIR, FILES, use_pipeline_scripts
+
+use_pipeline_scripts()
+from pipeline_schema import AREA, write_parquet
+
+# ----------------------------------------------------
+# LEGACY EXCEL → PARQUET
+#
+#   python convert_excel.py --xlsx data/df_merged_subdistrict.xlsx
+#
+# แปลงไฟล์ Excel แบบเดิม (Province / District / Subdistrict / year_month / ตัวแปร)
+# เป็น column และ dtype เดียวกับ merged_dataset_FILLED.parquet ของ pipeline
+# (province, district, subdistrict, year, month, NDVI, LST, RAINFALL, SOILMOISTURE, FIRECOUNT)
+# → dashboard ทุกตัวอ่านผ่าน data_service ได้โดยไม่ต้อง read_excel ตอนเริ่ม
+# ค่าเริ่มต้นเขียนไปที่ DATA_DIR ของ data_service (ที่เดียวกับ output ของ pipeline) — ไม่ทับไฟล์เดิมถ้าไม่ใส่ --force
+# ----------------------------------------------------
+COLUMNS = {
+    'Province': 'province', 'District': 'district', 'Subdistrict': 'subdistrict', 'Subdistric': 'subdistrict',
+    'NDVI': 'NDVI', 'LST': 'LST', 'precipitation': 'RAINFALL', 'SoilMoisture': 'SOILMOISTURE', 'FireCount': 'FIRECOUNT',
+}
+VARS = ['NDVI', 'LST', 'RAINFALL', 'SOILMOISTURE', 'FIRECOUNT']
+
+
+def convert(xlsx_path, out_path):
+    df = pd.read_excel(xlsx_path)
+    df.columns = df.columns.str.strip().str.replace(' ', '_')
+    year_month = pd.to_datetime(df['year_month'], format='%Y-%m')
+
+    df = df.rename(columns=COLUMNS)
+    for col in AREA:
+        df[col] = df[col].astype(str).str.strip().str.upper()
+    df['year'] = year_month.dt.year
+    df['month'] = year_month.dt.month
+
+    values = [v for v in VARS if v in df.columns]
+    df[values] = df[values].astype(float)
+    df = df[AREA + ['year', 'month'] + values].sort_values(AREA + ['year', 'month']).reset_index(drop=True)
+
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    write_parquet(df, out_path)
+    print(f"✅ {xlsx_path} → {out_path} ({len(df):,} rows, {len(values)} variables)")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the legacy subdistrict Excel file to the pipeline parquet layout")
+    parser.add_argument('--xlsx', default=os.path.join(LOCAL_DATA_DIR, 'df_merged_subdistrict.xlsx'))
+    parser.add_argument('--out', default=os.path.join(DATA_DIR, FILES['filled']))
+    parser.add_argument('--force', action='store_true', help="Overwrite an existing parquet (e.g. the pipeline's FILLED output)")
+    args = parser.parse_args()
+    if os.path.exists(args.out) and not args.force:
+        parser.error(f"{args.out} already exists (pipeline output?) — use --force to overwrite")
+    convert(args.xlsx, args.out)
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import plotly.express as px
 import plotly.graph_objects as go
-import time
+import numpy as np
 from datetime import datetime
 
+from geo_assets import animate, area_id
+from data_service import get_service
+
 # ----------------------------------------------------
 # 1. UI CONFIGURATION
 # ----------------------------------------------------
@@ -88,49 +90,24 @@ st.markdown("""
 # ----------------------------------------------------
 # 2. DATA LOADING
 # ----------------------------------------------------
-@st.cache_data
+# DataService: filled / DTW / geometry โหลดครั้งเดียวต่อ process แล้วใช้ร่วมกันทุก session
+# (column ตัวพิมพ์เล็ก, key ตัวพิมพ์ใหญ่, มี 'date' และ 'id' แล้ว — ห้ามแก้ DataFrame ในที่)
 def load_data():
+    svc = get_service()
     try:
-        # 1. ข้อมูลหลัก (Raw Data)
-        df = pd.read_parquet('data/merged_dataset_FILLED.parquet')
-        df.columns = [c.lower() for c in df.columns]
-        df['date'] = pd.to_datetime(df[['year', 'month']].assign(day=1))
-        
-        # 2. ข้อมูล DTW (Yearly)
-        df_dtw = pd.read_parquet('data/dtw_results.parquet')
-        df_dtw.columns = [c.lower() for c in df_dtw.columns]
-        # สร้างคอลัมน์ date เป็นวันที่ 1 กรกฎาคมของปีนั้นๆ เพื่อให้จุดอยู่กลางปีเวลา plot
-        df_dtw['date'] = pd.to_datetime(df_dtw['year'].astype(str) + '-07-01')
-        
-        # 3. GeoPandas (Khon Kaen)
-        gdf = gpd.read_file('data/khonkaen_provinces.shp')
-        gdf['geometry'] = gdf['geometry'].simplify(0.005)
-        
-        name_map = {
-            'Subdistric': 'subdistrict', 'District': 'district', 'Province': 'province',
-            'ADM3_EN': 'subdistrict', 'ADM2_EN': 'district', 'ADM1_EN': 'province',
-            'amphoe_en': 'district', 'tambon_en': 'subdistrict', 'changwat_en': 'province'
-        }
-        gdf = gdf.rename(columns=name_map)
-        
-        for col in ['province', 'district', 'subdistrict']:
-            for d in [df, df_dtw]:
-                if col in d.columns: d[col] = d[col].astype(str).str.upper()
-            if col in gdf.columns: gdf[col] = gdf[col].astype(str).str.upper()
-            
-        return df, gdf, df_dtw
+        return svc.filled, svc.dtw
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return pd.DataFrame(), gpd.GeoDataFrame(), pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame()
 
-df, gdf, df_dtw = load_data()
+df, df_dtw = load_data()
+geo = get_service().geometry(static=st.get_option("server.enableStaticServing"), tolerance=0.005)
 
 
 # ----------------------------------------------------
 # 3. NAVIGATION & HEADER
 # ----------------------------------------------------
 if 'page' not in st.session_state: st.session_state.page = 'dashboard'
-if 'playing' not in st.session_state: st.session_state.playing = False
 if 'date_index' not in st.session_state: st.session_state.date_index = 0
 
 st.markdown("""
@@ -191,18 +168,11 @@ if st.session_state.page == 'dashboard' and not df.empty:
         st.markdown("<div class='sidebar-title'>⏳ AUTO PLAY & TIMELINE</div>", unsafe_allow_html=True)
 
         
-        # --- Animation Session State ---
-        if 'playing' not in st.session_state: st.session_state.playing = False
+        # --- Animation: เล่นใน browser (ปุ่ม ▶/⏸ และ slider อยู่บนแผนที่) ---
         if 'date_index' not in st.session_state: st.session_state.date_index = 0
 
-        col_p1, col_p2 = st.columns(2)
-        if col_p1.button("▶️ Play" if not st.session_state.playing else "⏸️ Pause", use_container_width=True):
-            st.session_state.playing = not st.session_state.playing
-            st.rerun()
-            
-        if col_p2.button("Reset 🔄", use_container_width=True):
+        if st.button("Reset 🔄", use_container_width=True):
             st.session_state.date_index = 0
-            st.session_state.playing = False
             st.rerun()
 
         play_speed = st.select_slider("Speed (sec)", options=[0.1, 0.3, 0.5, 1.0], value=0.3)
@@ -222,7 +192,6 @@ if st.session_state.page == 'dashboard' and not df.empty:
             st.session_state.date_index = all_dates.index(selected_date)
             start_date = end_date = selected_date
         else:
-            st.session_state.playing = False 
             date_range = st.select_slider(
                 "Select Range",
                 options=all_dates,
@@ -290,62 +259,58 @@ if st.session_state.page == 'dashboard' and not df.empty:
             st.markdown(f"#### 🗺️ Spatial Distribution ({time_title})")
             
             # Map Logic: ใช้ข้อมูล dff_map (เดือนเดียว)
-            df_map_latest = dff_map.groupby(['province', 'district', 'subdistrict'])[selected_var].mean().reset_index()
-            merged_gdf = gdf.merge(df_map_latest, on=['province', 'district', 'subdistrict'], how='inner')
+            if time_mode == "Auto Play (Single)":
+                # Auto Play: ค่าทุกเดือนของพื้นที่ที่เลือก (ตำบล × เดือน) → animation frames
+                frame_pivot = dff_area.pivot_table(index=['id', 'province', 'district', 'subdistrict'], columns='date',
+                                                   values=selected_var, aggfunc='mean').reindex(columns=all_dates)
+                frame_pivot = frame_pivot[frame_pivot.index.get_level_values('id').isin(geo.ids)]
+                df_map_latest = frame_pivot.index.to_frame(index=False)
+                df_map_latest[selected_var] = frame_pivot[start_date].to_numpy()
+            else:
+                df_map_latest = dff_map.groupby(['province', 'district', 'subdistrict'])[selected_var].mean().reset_index()
+                df_map_latest['id'] = area_id(df_map_latest)
+                df_map_latest = df_map_latest[df_map_latest['id'].isin(geo.ids)]
             
-            if not merged_gdf.empty:
-                province_boundary = merged_gdf.dissolve(by='province')
-                bounds = merged_gdf.total_bounds
+            if not df_map_latest.empty:
+                bounds = geo.bounds(df_map_latest['id'])
                 center_lat, center_lon = (bounds[1] + bounds[3]) / 2, (bounds[0] + bounds[2]) / 2
                 
-                # Dynamic Zoom
+                # Dynamic Zoom → เลือก geometry LOD ที่พอดีกับ zoom
                 max_diff = max(bounds[3] - bounds[1], bounds[2] - bounds[0])
                 zoom_level = 11 if max_diff < 0.1 else 9 if max_diff < 0.5 else 8 if max_diff < 1.5 else 7
+                asset = geo.for_zoom(zoom_level)
                 
                 map_themes = {'ndvi': 'YlGn', 'soilmoisture': 'Greens', 'rainfall': 'Blues', 'lst': 'OrRd'}
                 map_theme = map_themes.get(selected_var, 'Reds')
 
-                # แก้ไขส่วนการสร้าง fig_map
-                fig_map = px.choropleth_mapbox(
-                    merged_gdf, 
-                    geojson=merged_gdf.geometry.__geo_interface__, 
-                    locations=merged_gdf.index,
-                    color=selected_var, 
-                    color_continuous_scale=map_theme,
-                    range_color=[df[selected_var].min(), df[selected_var].max()],
-                    mapbox_style="carto-positron", 
-                    center={"lat": center_lat, "lon": center_lon}, 
-                    zoom=zoom_level, 
-                    opacity=0.85, 
-                    height=500,
-                    # ✅ เพิ่มส่วนนี้เพื่อกำหนดข้อมูลที่จะแสดงใน Hover
-                    hover_name='subdistrict', # หัวข้อหลักในกล่อง hover จะเป็นชื่อตำบล
-                    hover_data={
-                        'province': True,    # แสดงจังหวัด
-                        'district': True,    # แสดงอำเภอ
-                        'subdistrict': False, # ซ่อนตำบลซ้ำ (เพราะมีใน hover_name แล้ว)
-                        selected_var: ':.4f'  # แสดงค่าตัวแปรพร้อมทศนิยม 4 ตำแหน่ง
-                    }
-                )
-
-                # ปรับแต่ง hovertemplate ให้สวยงามและไม่มีคำว่า "index"
-                fig_map.update_traces(
+                # แผนที่ส่งแค่ id + ค่า (geometry อยู่ใน asset ที่ browser cache ไว้แล้ว)
+                fig_map = go.Figure(go.Choroplethmapbox(
+                    geojson=asset.ref(), 
+                    featureidkey="id", 
+                    locations=df_map_latest['id'],
+                    z=df_map_latest[selected_var], 
+                    colorscale=map_theme,
+                    zmin=df[selected_var].min(), zmax=df[selected_var].max(),
+                    marker_opacity=0.85, 
+                    colorbar=dict(title=selected_var),
+                    # Hover: ชื่อตำบลเป็นหัวข้อ + จังหวัด/อำเภอ/ค่า
+                    hovertext=df_map_latest['subdistrict'],
+                    customdata=df_map_latest[['province', 'district']].to_numpy(),
                     hovertemplate="<b>%{hovertext}</b><br>Province: %{customdata[0]}<br>District: %{customdata[1]}<br>Value: %{z:.4f}<extra></extra>"
+                ))
+                fig_map.update_layout(
+                    mapbox=dict(style="carto-positron", center={"lat": center_lat, "lon": center_lon}, zoom=zoom_level),
+                    height=500
                 )
+                if time_mode == "Auto Play (Single)":
+                    animate(fig_map, frame_pivot.to_numpy().T, [d.strftime('%b %Y') for d in all_dates],
+                            duration=int(play_speed * 1000), active=all_dates.index(start_date))
+
+                # Add Province Borders (เส้นขอบที่ dissolve ไว้แล้วตอน build → trace เดียว)
+                lons, lats = geo.outline('province', df_map_latest['province'].unique(), zoom=zoom_level)
+                fig_map.add_trace(go.Scattermapbox(lon=lons, lat=lats, mode='lines', line=dict(width=2, color='#000000'), hoverinfo='skip', showlegend=False))
 
-                # Add Province Borders
-                for _, row in province_boundary.iterrows():
-                    if row.geometry.geom_type == 'Polygon':
-                        coords = list(row.geometry.exterior.coords)
-                    elif row.geometry.geom_type == 'MultiPolygon':
-                        coords = []
-                        for poly in row.geometry.geoms:
-                            coords.extend(list(poly.exterior.coords))
-                            coords.append((None, None))
-                    lons, lats = zip(*coords)
-                    fig_map.add_trace(go.Scattermapbox(lon=lons, lat=lats, mode='lines', line=dict(width=2, color='#000000'), hoverinfo='skip', showlegend=False))
-
-                fig_map.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, uirevision=selected_var)
+                fig_map.update_layout(margin={"r":0,"t":0,"l":0,"b":70 if time_mode == "Auto Play (Single)" else 0}, uirevision=selected_var)
                 st.plotly_chart(fig_map, use_container_width=True)
 
         with col_right:
@@ -408,12 +373,27 @@ if st.session_state.page == 'dashboard' and not df.empty:
         display_start = pd.Timestamp(year=start_date.year, month=1, day=1)
         display_end = pd.Timestamp(year=end_date.year, month=12, day=1)
 
+        # --- ตำแหน่ง tick ปี / เส้นแบ่งปี คำนวณครั้งเดียวจากแกนวันที่ (ใช้ร่วมทุกจังหวัด) ---
+        heat_dates = pd.DatetimeIndex([d for d in all_dates if display_start <= d <= display_end])
+        heat_years = heat_dates.year.to_numpy()
+        years_present, year_first, year_count = np.unique(heat_years, return_index=True, return_counts=True)
+        # เก็บค่าตำแหน่งกึ่งกลางปีไว้ทำ Tick Label
+        tick_vals = heat_dates[year_first + year_count // 2]
+        tick_text = [f"<b>{yr}</b>" for yr in years_present]
+        # เส้นแบ่งแนวตั้งดำๆ ระหว่างปี: เดือนสุดท้ายของแต่ละปี + 15 วัน
+        div_pos = heat_dates[np.flatnonzero(np.diff(heat_years))] + pd.Timedelta(days=15)
+        year_shapes = [
+            dict(type="line", x0=x, x1=x, y0=0, y1=1, yref="paper", line=dict(color="black", width=1.5))
+            for x in div_pos
+        ]
+        date_labels = heat_dates.strftime('%B %Y').to_numpy()
+
         for prov in dff_area['province'].unique():
             prov_data = df[(df['province'] == prov) & (df['date'] >= display_start) & (df['date'] <= display_end)]
-            district_map = prov_data.drop_duplicates('subdistrict').set_index('subdistrict')['district'].to_dict()
             heat_pivot = prov_data.pivot_table(index='subdistrict', columns='date', values=selected_var, aggfunc='mean')
             
             if not heat_pivot.empty:
+                heat_pivot = heat_pivot.reindex(columns=heat_dates)
                 fig_heat = px.imshow(
                     heat_pivot, 
                     color_continuous_scale=map_theme, 
@@ -421,38 +401,24 @@ if st.session_state.page == 'dashboard' and not df.empty:
                     aspect="auto"
                 )
 
-                # --- 1. Hover Configuration ---
-                hover_texts = []
-                for sub in heat_pivot.index:
-                    dist = district_map.get(sub, "N/A")
-                    row_hover = [
-                        f"<b>Province:</b> {prov}<br><b>District:</b> {dist}<br><b>Subdistrict:</b> {sub}<br><b>Date:</b> {dt.strftime('%B %Y')}<br><b>Value:</b> {val:.4f}" 
-                        for dt, val in heat_pivot.loc[sub].items()
-                    ]
-                    hover_texts.append(row_hover)
-                fig_heat.update_traces(hovertemplate="%{customdata}<extra></extra>", customdata=hover_texts)
-
-                # --- 2. จัดการเส้นแบ่งปี (Shapes) ---
-                dates_list = heat_pivot.columns
-                year_shapes = []
-                tick_vals = []
-                tick_text = []
-
-                years_present = sorted(list(set([d.year for d in dates_list])))
-                for yr in years_present:
-                    year_dates = [d for d in dates_list if d.year == yr]
-                    # เก็บค่าตำแหน่งกึ่งกลางปีไว้ทำ Tick Label
-                    mid_date = year_dates[len(year_dates)//2]
-                    tick_vals.append(mid_date)
-                    tick_text.append(f"<b>{yr}</b>")
-                    
-                    # เส้นแบ่งแนวตั้งดำๆ ระหว่างปี
-                    if yr != years_present[-1]:
-                        div_pos = year_dates[-1] + pd.Timedelta(days=15)
-                        year_shapes.append(dict(
-                            type="line", x0=div_pos, x1=div_pos, y0=-0.5, y1=len(heat_pivot)-0.5,
-                            line=dict(color="black", width=1.5)
-                        ))
+                # --- 1. Hover Configuration: customdata (district, date) + hovertemplate ---
+                districts = prov_data.drop_duplicates('subdistrict').set_index('subdistrict')['district']
+                districts = districts.reindex(heat_pivot.index).fillna("N/A").to_numpy(dtype=object)
+                shape = heat_pivot.shape
+                hover_data = np.stack([
+                    np.broadcast_to(districts[:, None], shape),
+                    np.broadcast_to(date_labels[None, :], shape),
+                ], axis=-1)
+                fig_heat.update_traces(
+                    customdata=hover_data,
+                    hovertemplate=(
+                        f"<b>Province:</b> {prov}<br>"
+                        "<b>District:</b> %{customdata[0]}<br>"
+                        "<b>Subdistrict:</b> %{y}<br>"
+                        "<b>Date:</b> %{customdata[1]}<br>"
+                        "<b>Value:</b> %{z:.4f}<extra></extra>"
+                    ),
+                )
 
                 # --- 3. ปรับ Layout ให้ตัวเลขปีเนียนไปกับชื่อตำบล ---
                 fig_heat.update_layout(
@@ -493,16 +459,6 @@ if st.session_state.page == 'dashboard' and not df.empty:
 
                 st.plotly_chart(fig_heat, use_container_width=True)
 
-        # --- AUTO-PLAY ENGINE ---
-        if st.session_state.playing and time_mode == "Auto Play (Single)":
-            if st.session_state.date_index < len(all_dates) - 1:
-                st.session_state.date_index += 1
-                time.sleep(play_speed)
-                st.rerun()
-            else:
-                st.session_state.playing = False
-                st.rerun()
-
 
 # ----------------------------------------------------
 # 4.2 DTW Analysis Page (With Auto Play & Timeline)
@@ -545,17 +501,11 @@ elif st.session_state.page == 'dtw' and not df_dtw.empty:
         # 3. AUTO PLAY & TIMELINE (ยกมาจากหน้าหลัก)
         st.markdown("<div class='sidebar-title'>⏳ AUTO PLAY & TIMELINE</div>", unsafe_allow_html=True)
         
-        if 'dtw_playing' not in st.session_state: st.session_state.dtw_playing = False
+        # Animation เล่นใน browser (ปุ่ม ▶/⏸ และ slider อยู่บนแผนที่)
         if 'dtw_year_index' not in st.session_state: st.session_state.dtw_year_index = 0
 
-        col_p1, col_p2 = st.columns(2)
-        if col_p1.button("▶️ Play" if not st.session_state.dtw_playing else "⏸️ Pause", key="dtw_play_btn", use_container_width=True):
-            st.session_state.dtw_playing = not st.session_state.dtw_playing
-            st.rerun()
-            
-        if col_p2.button("Reset 🔄", key="dtw_reset_btn", use_container_width=True):
+        if st.button("Reset 🔄", key="dtw_reset_btn", use_container_width=True):
             st.session_state.dtw_year_index = 0
-            st.session_state.dtw_playing = False
             st.rerun()
 
         play_speed = st.select_slider("Speed (sec)", options=[0.1, 0.3, 0.5, 1.0], value=0.3, key="dtw_speed")
@@ -573,7 +523,6 @@ elif st.session_state.page == 'dtw' and not df_dtw.empty:
             st.session_state.dtw_year_index = all_years.index(selected_year)
             start_yr = end_yr = selected_year
         else:
-            st.session_state.dtw_playing = False 
             year_range = st.select_slider(
                 "Select Range",
                 options=all_years,
@@ -690,20 +639,28 @@ elif st.session_state.page == 'dtw' and not df_dtw.empty:
             st.markdown(f"#### 🗺️ Spatial Anomaly ({time_title})")
             
             # 1. กรองข้อมูลเฉพาะปีที่เลือกและลบแถวที่ไม่มีข้อมูลสำคัญ
-            df_map_dtw = dff_map.copy()
-            merged_dtw = gdf.merge(df_map_dtw, on=['province', 'district', 'subdistrict'], how='inner')
+            merged_dtw = dff_map[dff_map['id'].isin(geo.ids)].copy()
+            animated = time_mode == "Auto Play (Single)" and flag_col in dff_area.columns and selected_dtw in dff_area.columns
+            if animated:
+                # Auto Play: flag + ค่า DTW ทุกปีของพื้นที่ที่เลือก (ตำบล × ปี) → animation frames
+                frame_area = dff_area[dff_area['id'].isin(geo.ids)]
+                frame_flag = frame_area.pivot_table(index='id', columns='year', values=flag_col, aggfunc='max').reindex(columns=all_years)
+                frame_value = frame_area.pivot_table(index='id', columns='year', values=selected_dtw, aggfunc='mean').reindex(index=frame_flag.index, columns=all_years)
+                merged_dtw = frame_area.drop_duplicates('id').set_index('id').loc[frame_flag.index, ['province', 'district', 'subdistrict']].reset_index()
+                merged_dtw[flag_col] = frame_flag[start_yr].to_numpy()
+                merged_dtw[selected_dtw] = frame_value[start_yr].to_numpy()
             
             # ตรวจสอบว่ามีข้อมูลและมีคอลัมน์ครบไหมก่อนรัน Map
             if not merged_dtw.empty and flag_col in merged_dtw.columns and selected_dtw in merged_dtw.columns:
                 
                 # --- 🎯 ส่วนการคำนวณหาจุดกึ่งกลางและเส้นขอบจังหวัด ---
-                province_boundary = merged_dtw.dissolve(by='province')
-                bounds = merged_dtw.total_bounds
+                bounds = geo.bounds(merged_dtw['id'])
                 center_lat = (bounds[1] + bounds[3]) / 2
                 center_lon = (bounds[0] + bounds[2]) / 2
                 
                 max_diff = max(bounds[2] - bounds[0], bounds[3] - bounds[1])
                 zoom_level = 11 if max_diff < 0.1 else 9.5 if max_diff < 0.5 else 8.5 if max_diff < 1.5 else 7.5
+                asset = geo.for_zoom(zoom_level)
                 
 
                 # 2. สร้างแผนที่
@@ -711,61 +668,52 @@ elif st.session_state.page == 'dtw' and not df_dtw.empty:
                 #  สร้างคอลัมน์สำหรับแสดงสถานะใน Hover (Display Column)
                 merged_dtw['status'] = merged_dtw[flag_col].apply(lambda x: '🚨 Abnormal' if x == 1 else '✅ Normal')
 
-                #  สร้างแผนที่
-                fig_map_dtw = px.choropleth_mapbox(
-                    merged_dtw, 
-                    geojson=merged_dtw.geometry.__geo_interface__, 
-                    locations=merged_dtw.index,
-                    color=flag_col,
-                    color_continuous_scale=[[0, '#e2e8f0'], [1, '#ef4444']], 
-                    mapbox_style="carto-positron", 
-                    zoom=zoom_level, 
-                    center={"lat": center_lat, "lon": center_lon}, 
-                    height=500, 
-                    opacity=0.8,
-                    hover_name='subdistrict', 
-                    # ระบุคอลัมน์ที่ต้องการให้ปรากฏใน Hover
-                    hover_data={
-                        'province': True, 
-                        'district': True,
-                        'status': True, # แสดงผลภาษาไทย/อังกฤษตามที่ตั้งไว้
-                        selected_dtw: ':.4f',
-                        flag_col: False # ปิดเลข 0, 1 เดิม
-                    }
-                )
-
-                # ปรับแต่งหัวข้อใน Hover ให้สวยงามยิ่งขึ้น
-                fig_map_dtw.update_traces(
+                #  สร้างแผนที่ (ส่งแค่ id + flag ต่อตำบล)
+                fig_map_dtw = go.Figure(go.Choroplethmapbox(
+                    geojson=asset.ref(), 
+                    featureidkey="id", 
+                    locations=merged_dtw['id'],
+                    z=merged_dtw[flag_col],
+                    colorscale=[[0, '#e2e8f0'], [1, '#ef4444']], 
+                    zmin=0, zmax=1,
+                    showscale=False, # flag 0/1 ไม่ต้องมี colorbar (trace ไม่ได้ใช้ coloraxis)
+                    marker_opacity=0.8,
+                    hovertext=merged_dtw['subdistrict'], 
+                    # คอลัมน์ที่แสดงใน Hover: จังหวัด, อำเภอ, สถานะ, ค่า DTW
+                    customdata=merged_dtw[['province', 'district', 'status', selected_dtw]].to_numpy(),
+                    # ปรับแต่งหัวข้อใน Hover ให้สวยงามยิ่งขึ้น
                     hovertemplate="<b>%{hovertext}</b><br>" +
                                   "Province: %{customdata[0]}<br>" +
                                   "District: %{customdata[1]}<br>" +
                                   "Status: %{customdata[2]}<br>" +
                                   "Value: %{customdata[3]:.4f}<extra></extra>"
+                ))
+                fig_map_dtw.update_layout(
+                    mapbox=dict(style="carto-positron", center={"lat": center_lat, "lon": center_lon}, zoom=zoom_level),
+                    height=500
                 )
+                if animated:
+                    # hover ของแต่ละปีเปลี่ยนตาม status/ค่า → ส่ง customdata ไปกับ frame ด้วย
+                    flags = frame_flag.to_numpy()
+                    status = np.select([flags == 1, flags == 0], ['🚨 Abnormal', '✅ Normal'], default='N/A')
+                    keys = merged_dtw[['province', 'district']].to_numpy()
+                    values = frame_value.to_numpy()
+                    frame_custom = [np.column_stack([keys, status[:, i], values[:, i]]) for i in range(len(all_years))]
+                    animate(fig_map_dtw, flags.T, all_years, duration=int(play_speed * 1000),
+                            active=all_years.index(start_yr), customdata=frame_custom)
 
                 # 3. 🔥 เพิ่มเส้นขอบจังหวัด (Province Borders)
-                for _, row in province_boundary.iterrows():
-                    if row.geometry.geom_type == 'Polygon':
-                        coords = list(row.geometry.exterior.coords)
-                    elif row.geometry.geom_type == 'MultiPolygon':
-                        coords = []
-                        for poly in row.geometry.geoms:
-                            coords.extend(list(poly.exterior.coords))
-                            coords.append((None, None))
-                    
-                    if coords:
-                        lons, lats = zip(*coords)
-                        fig_map_dtw.add_trace(go.Scattermapbox(
-                            lon=lons, lat=lats, 
-                            mode='lines', 
-                            line=dict(width=2, color='#000000'),
-                            hoverinfo='skip', 
-                            showlegend=False
-                        ))
+                lons, lats = geo.outline('province', merged_dtw['province'].unique(), zoom=zoom_level)
+                fig_map_dtw.add_trace(go.Scattermapbox(
+                    lon=lons, lat=lats, 
+                    mode='lines', 
+                    line=dict(width=2, color='#000000'),
+                    hoverinfo='skip', 
+                    showlegend=False
+                ))
 
                 fig_map_dtw.update_layout(
-                    margin={"r":0,"t":0,"l":0,"b":0}, 
-                    coloraxis_showscale=False,
+                    margin={"r":0,"t":0,"l":0,"b":70 if animated else 0}, 
                     # ใช้ uirevision ผูกกับสถานที่เพื่อให้แผนที่ขยับเมื่อเปลี่ยนที่ แต่ไม่ขยับเมื่อเล่น Auto Play
                     uirevision=f"{sel_provs_dtw}-{sel_dists_dtw}-{sel_subs_dtw}"
                 )
@@ -881,16 +829,6 @@ elif st.session_state.page == 'dtw' and not df_dtw.empty:
                 
                 st.plotly_chart(fig_heat_dtw, use_container_width=True)
 
-        # --- [AUTO-PLAY ENGINE: AT THE END OF PAGE] ---
-    if st.session_state.dtw_playing and time_mode == "Auto Play (Single)":
-        if st.session_state.dtw_year_index < len(all_years) - 1:
-            st.session_state.dtw_year_index += 1
-            import time
-            time.sleep(play_speed)
-            st.rerun()
-        else:
-            st.session_state.dtw_playing = False
-            st.rerun()
 # ----------------------------------------------------
 # 5. ABOUT PROJECT PAGE 
 # ----------------------------------------------------
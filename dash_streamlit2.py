@@ -1,9 +1,9 @@
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import plotly.express as px
 import plotly.graph_objects as go
-import time
+from geo_assets import animate
+from data_service import get_service
 
 # ----------------------------------------------------
 # 1. TOTAL UI RE-ENGINEERING (HIGH CONTRAST CSS)
@@ -65,34 +65,16 @@ st.markdown("""
 # ----------------------------------------------------
 # 2. DATA LOAD & MEMORY OPTIMIZATION
 # ----------------------------------------------------
-@st.cache_data
-def load_data():
-    parquet_path = r'C:\Users\NBODT\my_dash_app\data\merged_dataset_FILLED.parquet'
-    shp_path = r'C:\Users\NBODT\my_dash_app\data\khonkaen_provinces.shp'
-    
-    df = pd.read_parquet(parquet_path, engine='pyarrow')
-    df.columns = [c.lower() for c in df.columns]
-    df['date'] = pd.to_datetime(df[['year', 'month']].assign(day=1))
-    
-    gdf = gpd.read_file(shp_path)
-    gdf['geometry'] = gdf['geometry'].simplify(0.001, preserve_topology=True) # Prevent MemoryError
-    
-    if 'Subdistric' in gdf.columns:
-        gdf = gdf.rename(columns={'Subdistric': 'subdistrict', 'District': 'district', 'Province': 'province'})
-    
-    for col in ['province', 'district', 'subdistrict']:
-        df[col] = df[col].astype(str).str.upper()
-        gdf[col] = gdf[col].astype(str).str.upper()
-        
-    return df, gdf
-
-df, gdf = load_data()
+# DataService: โหลด parquet → TimeCube (ตำบล, เดือน, ตัวแปร) + geometry ครั้งเดียวต่อ process
+# ใช้ร่วมกันทุก session, query (map / trend / KPI) ถูก cache ตาม filter
+svc = get_service()
+cube = svc.cube
+geo = svc.geometry(static=st.get_option("server.enableStaticServing"), tolerance=0.001)
 
 # ----------------------------------------------------
 # 3. NAVIGATION STATE
 # ----------------------------------------------------
 if 'page' not in st.session_state: st.session_state.page = 'dashboard'
-if 'play_idx' not in st.session_state: st.session_state.play_idx = 0
 
 col_h1, col_h2 = st.columns([3.5, 1])
 with col_h1:
@@ -115,8 +97,8 @@ if st.session_state.page == 'dashboard':
             indicators = {'ndvi': 'NDVI', 'lst': 'LST', 'soilmoisture': 'SOIL MOISTURE', 'rainfall': 'RAINFALL'}
             selected_var = st.selectbox("VARIABLE", options=list(indicators.keys()), format_func=lambda x: indicators[x])
             
-            sel_prov = st.selectbox("PROVINCE", ["ALL PROVINCES"] + sorted(df['province'].unique()))
-            dist_list = sorted(df[df['province'] == sel_prov]['district'].unique()) if sel_prov != "ALL PROVINCES" else []
+            sel_prov = st.selectbox("PROVINCE", ["ALL PROVINCES"] + sorted(cube.areas['province'].unique()))
+            dist_list = sorted(cube.areas.loc[cube.areas['province'] == sel_prov, 'district'].unique()) if sel_prov != "ALL PROVINCES" else []
             sel_dist = st.selectbox("DISTRICT", ["ALL DISTRICTS"] + dist_list)
 
         st.markdown("### MAP SETTINGS")
@@ -125,27 +107,23 @@ if st.session_state.page == 'dashboard':
         
         st.markdown("### TIMELINE CONTROL")
         with st.container(border=True):
-            all_dates = sorted(df['date'].unique())
+            all_dates = list(cube.dates)
             play_mode = st.checkbox("AUTO-PLAY (SEQUENCE)")
+            date_range = st.select_slider("SELECT RANGE", options=all_dates, value=(all_dates[0], all_dates[-1]), format_func=lambda x: x.strftime('%Y-%m'))
+            start_date, end_date = date_range
             if play_mode:
-                st.session_state.play_idx = (st.session_state.play_idx + 1) % len(all_dates)
-                start_date = all_dates[st.session_state.play_idx]
-                end_date = start_date
-                time.sleep(0.6)
-                st.rerun()
-            else:
-                date_range = st.select_slider("SELECT RANGE", options=all_dates, value=(all_dates[0], all_dates[-1]), format_func=lambda x: x.strftime('%Y-%m'))
-                start_date, end_date = date_range
-
-    # Data Filtering
-    dff = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
-    if sel_prov != "ALL PROVINCES":
-        dff = dff[dff['province'] == sel_prov]
-        if sel_dist != "ALL DISTRICTS":
-            dff = dff[dff['district'] == sel_dist]
+                # เล่นใน browser: แต่ละเดือนในช่วงที่เลือกเป็น 1 frame (ไม่ rerun script)
+                frame_sec = st.select_slider("FRAME (SEC)", options=[0.2, 0.4, 0.6, 1.0], value=0.6)
+
+    # Data Filtering: query ของ DataService (ช่วง index ใน cube — ไม่ filter DataFrame)
+    query = (
+        selected_var, start_date, end_date,
+        None if sel_prov == "ALL PROVINCES" else sel_prov,
+        None if sel_prov == "ALL PROVINCES" or sel_dist == "ALL DISTRICTS" else sel_dist,
+    )
 
     # KPI ROW - BORDERED
-    df_map = dff.groupby(['province', 'district', 'subdistrict'])[selected_var].mean().reset_index()
+    df_map = svc.map_values(*query)
     if not df_map.empty:
         c1, c2, c3, c4 = st.columns(4)
         avg_val = df_map[selected_var].mean()
@@ -158,20 +136,37 @@ if st.session_state.page == 'dashboard':
         with c4: st.markdown(f"<div class='stMetric'>OBSERVATION<br><h2>{start_date.strftime('%b %Y')}</h2></div>", unsafe_allow_html=True)
 
     # --- MAP ---
-    merged_gdf = gdf.merge(df_map, on=['province', 'district', 'subdistrict'], how='left')
-    fig_map = px.choropleth_map(
-        merged_gdf, geojson=merged_gdf.geometry.__geo_interface__, locations=merged_gdf.index,
-        color=selected_var, color_continuous_scale='YlGnBu' if selected_var=='rainfall' else 'Viridis',
-        center={"lat": merged_gdf.geometry.centroid.y.mean(), "lon": merged_gdf.geometry.centroid.x.mean()},
-        map_style="open-street-map", zoom=7.5, opacity=map_opacity, height=600
+    # zoom ตามพื้นที่ที่เลือก แล้วใช้ geometry LOD ที่พอดีกับ zoom นั้น
+    map_ids = df_map['id'].to_numpy()
+    zoom = 7.5 if sel_prov == "ALL PROVINCES" else 9 if sel_dist == "ALL DISTRICTS" else 10.5
+    asset = geo.for_zoom(zoom)
+    center = geo.center(map_ids if len(map_ids) else None)
+
+    # ส่งแค่ id + ค่า ต่อพื้นที่ (geometry อยู่ใน asset ที่ browser cache ไว้แล้ว)
+    fig_map = go.Figure(go.Choroplethmap(
+        geojson=asset.ref(), featureidkey="id", locations=asset.ids,
+        z=asset.align(map_ids, df_map[selected_var]),
+        colorscale='YlGnBu' if selected_var=='rainfall' else 'Viridis',
+        colorbar=dict(title=selected_var), marker_opacity=map_opacity,
+        marker_line_width=1.0, marker_line_color="black"
+    ))
+    fig_map.update_layout(
+        map=dict(style="open-street-map", center=center, zoom=zoom),
+        height=600, margin={"r":0,"t":0,"l":0,"b":0}
     )
-    fig_map.update_traces(marker_line_width=1.0, marker_line_color="black")
-    fig_map.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+    if play_mode:
+        # ค่ารายเดือน (เดือน, ตำบล) ส่งครั้งเดียวเป็น frames — geometry ใช้ร่วมกันทุก frame
+        frame_ids, frame_dates, frame_values = svc.month_values(*query)
+        frames = asset.align(frame_ids, frame_values.T).T
+        animate(fig_map, frames, [d.strftime('%Y-%m') for d in frame_dates],
+                duration=int(frame_sec * 1000), prefix="MONTH: ")
+        fig_map.update_layout(height=680, margin={"r":0,"t":0,"l":0,"b":80})
     st.plotly_chart(fig_map, use_container_width=True)
 
     # --- INSIGHT TREND ---
     st.markdown("### TEMPORAL ANALYTICS: TREND OVERVIEW")
-    trend_data = dff.groupby('date')[selected_var].mean().reset_index()
+    trend_dates, trend_values = svc.series(*query)
+    trend_data = pd.DataFrame({'date': trend_dates, selected_var: trend_values})
     fig_trend = px.line(trend_data, x='date', y=selected_var, markers=True)
     fig_trend.update_layout(template="plotly_white", font=dict(color="black", size=14))
     fig_trend.update_traces(line=dict(color='black', width=3))
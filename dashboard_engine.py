@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+from geo_assets import AREA, area_id, level_keys
+
+# ----------------------------------------------------
+# DASHBOARD DATA ENGINE: TimeCube
+#
+# เก็บข้อมูลเป็น array (area, month, variable) แล้วสร้าง summed-area table
+# ของผลรวมและจำนวนค่าที่ไม่ใช่ NaN ตามทั้งแกน area และแกนเวลา:
+#
+#   S[a, t] = ผลรวมของค่าใน area < a และ month < t     shape (A+1, T+1, V)
+#
+# area เรียงตาม province → district → subdistrict ดังนั้นจังหวัด/อำเภอที่เลือก
+# เป็นช่วง area ต่อเนื่อง [a0, a1) และช่วงวันที่เป็น [t0, t1] → ผลรวมของสี่เหลี่ยมใดๆ
+# = S[a1,t1+1] - S[a0,t1+1] - S[a1,t0] + S[a0,t0]
+#
+#   - ค่าเฉลี่ยต่อตำบลในช่วงวันที่ (แผนที่)            O(ตำบล)   ไม่ต้อง filter + groupby
+#   - ค่าเฉลี่ยต่อเดือนของพื้นที่ที่เลือก (trend)        O(เดือน)
+#   - ค่าเฉลี่ยรวมของทั้งพื้นที่และช่วงเวลา (KPI)       O(1)
+#
+# ผลลัพธ์เท่ากับ groupby().mean() ของ pandas (ข้าม NaN) — ผลรวมเป็น float64
+# ----------------------------------------------------
+
+
+class TimeCube:
+    """
+    สร้างจาก long-format DataFrame (AREA + date + variables) ด้วย TimeCube.from_frame
+    หรือจาก cube ของ pipeline (cube_store) ด้วย TimeCube.from_store
+    """
+
+    def __init__(self, areas, dates, variables, values):
+        self.areas = areas
+        self.ids = area_id(areas)
+        self.dates = dates
+        self.variables = list(variables)
+        self.values = values
+
+        present = ~np.isnan(values)
+        self._sum = self._table(np.where(present, values, 0.0).astype(np.float64))
+        self._count = self._table(present.astype(np.int32))
+
+        # (province,) / (province, district) → ช่วง area [a0, a1)
+        self._slices = {}
+        for level in (AREA[:1], AREA[:2]):
+            for key, idx in areas.groupby(level, sort=False).indices.items():
+                key = key if isinstance(key, tuple) else (key,)
+                self._slices[key] = (int(idx.min()), int(idx.max()) + 1)
+
+    @staticmethod
+    def _table(x):
+        out = np.zeros((x.shape[0] + 1, x.shape[1] + 1, x.shape[2]), dtype=x.dtype)
+        np.cumsum(x, axis=0, out=out[1:, 1:])
+        np.cumsum(out[1:, 1:], axis=1, out=out[1:, 1:])
+        return out
+
+    @classmethod
+    def from_frame(cls, df, variables, date_col='date'):
+        variables = [v for v in variables if v in df.columns]
+
+        keys = df[AREA].astype(str)
+        areas = keys.drop_duplicates().sort_values(AREA).reset_index(drop=True)
+        a = pd.MultiIndex.from_frame(areas).get_indexer(pd.MultiIndex.from_frame(keys))
+
+        dates = pd.DatetimeIndex(sorted(df[date_col].unique()))
+        t = dates.get_indexer(df[date_col])
+
+        values = np.full((len(areas), len(dates), len(variables)), np.nan, dtype=np.float32)
+        values[a, t, :] = df[variables].to_numpy(np.float32)
+        return cls(areas, dates, variables, values)
+
+    @classmethod
+    def from_store(cls, store, variables):
+        """
+        cube_store.Cube (by_area.f32 ข้าง parquet ของ pipeline) → TimeCube โดยไม่ต้อง pivot ใน pandas
+        ตัวแปรใน store เป็นชื่อของ pipeline (ตัวพิมพ์ใหญ่)
+        """
+        index = {v.lower(): i for i, v in enumerate(store.variables)}
+        variables = [v for v in variables if v in index]
+
+        keys = store.areas[AREA].astype(str)
+        areas = keys.apply(lambda s: s.str.upper()).sort_values(AREA)
+        order = areas.index.to_numpy()
+        areas = areas.reset_index(drop=True)
+
+        dates = pd.DatetimeIndex(pd.to_datetime(pd.DataFrame({'year': store.years, 'month': store.months, 'day': 1})))
+        values = np.asarray(store.by_area[:, :, [index[v] for v in variables]], dtype=np.float32)[order]
+        return cls(areas, dates, variables, values)
+
+    # ---- lookups ----
+    def area_slice(self, province=None, district=None):
+        """
+        ช่วง area ของจังหวัด/อำเภอ (None = ทั้งหมด)
+        """
+        if province is None:
+            return 0, len(self.areas)
+        key = (province,) if district is None else (province, district)
+        return self._slices.get(key, (0, 0))
+
+    def time_index(self, date):
+        return int(self.dates.get_loc(pd.Timestamp(date)))
+
+    def _rect(self, table, var, areas, t0, t1):
+        a0, a1 = areas
+        v = self.variables.index(var)
+        return table[a1, t1 + 1, v] - table[a0, t1 + 1, v] - table[a1, t0, v] + table[a0, t0, v]
+
+    # ---- aggregations ----
+    def area_means(self, var, t0, t1, areas=None):
+        """
+        ค่าเฉลี่ยของแต่ละตำบลในช่วง [t0, t1] → (areas DataFrame, values)
+        """
+        a0, a1 = areas or (0, len(self.areas))
+        v = self.variables.index(var)
+        s = self._sum[a0 + 1:a1 + 1, t1 + 1, v] - self._sum[a0:a1, t1 + 1, v] - self._sum[a0 + 1:a1 + 1, t0, v] + self._sum[a0:a1, t0, v]
+        n = self._count[a0 + 1:a1 + 1, t1 + 1, v] - self._count[a0:a1, t1 + 1, v] - self._count[a0 + 1:a1 + 1, t0, v] + self._count[a0:a1, t0, v]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.areas.iloc[a0:a1], np.where(n > 0, s / n, np.nan)
+
+    def group_means(self, var, t0, t1, level, areas=None):
+        """
+        ค่าเฉลี่ยของแต่ละจังหวัด/อำเภอ (level) ในช่วง [t0, t1] → (keys DataFrame, values)
+        กลุ่มเป็นช่วง area ต่อเนื่อง → 1 สี่เหลี่ยมต่อกลุ่ม
+        """
+        a0, a1 = areas or (0, len(self.areas))
+        keys = self.areas.iloc[a0:a1][level_keys(level)]
+        if keys.empty:
+            return keys, np.array([])
+        k = keys.to_numpy()
+        starts = np.flatnonzero(np.r_[True, (k[1:] != k[:-1]).any(axis=1)])
+        lo, hi = a0 + starts, np.r_[a0 + starts[1:], a1]
+        v = self.variables.index(var)
+        s = self._sum[hi, t1 + 1, v] - self._sum[lo, t1 + 1, v] - self._sum[hi, t0, v] + self._sum[lo, t0, v]
+        n = self._count[hi, t1 + 1, v] - self._count[lo, t1 + 1, v] - self._count[hi, t0, v] + self._count[lo, t0, v]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return keys.iloc[starts], np.where(n > 0, s / n, np.nan)
+
+    def series(self, var, t0, t1, areas=None):
+        """
+        ค่าเฉลี่ยต่อเดือนของพื้นที่ในช่วง area [a0, a1) → (dates, values)
+        """
+        a0, a1 = areas or (0, len(self.areas))
+        v = self.variables.index(var)
+        s = self._sum[a1, t0 + 1:t1 + 2, v] - self._sum[a0, t0 + 1:t1 + 2, v] - self._sum[a1, t0:t1 + 1, v] + self._sum[a0, t0:t1 + 1, v]
+        n = self._count[a1, t0 + 1:t1 + 2, v] - self._count[a0, t0 + 1:t1 + 2, v] - self._count[a1, t0:t1 + 1, v] + self._count[a0, t0:t1 + 1, v]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.dates[t0:t1 + 1], np.where(n > 0, s / n, np.nan)
+
+    def month_values(self, var, t0, t1, areas=None):
+        """
+        ค่ารายเดือนของแต่ละตำบล (month, area) สำหรับ animation frames
+        """
+        a0, a1 = areas or (0, len(self.areas))
+        return self.values[a0:a1, t0:t1 + 1, self.variables.index(var)].T
+
+    def mean(self, var, t0, t1, areas=None):
+        """
+        ค่าเฉลี่ยของทุกค่าในพื้นที่และช่วงเวลา (O(1))
+        """
+        areas = areas or (0, len(self.areas))
+        n = self._rect(self._count, var, areas, t0, t1)
+        return self._rect(self._sum, var, areas, t0, t1) / n if n else np.nan
@@ -0,0 +1,277 @@
+import os
+import sys
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from geo_assets import AREA, area_id, level_keys, load_geometry
+from dashboard_engine import TimeCube
+
+# ----------------------------------------------------
+# DASHBOARD DATA SERVICE (1 copy ต่อ process)
+#
+#   from data_service import get_service
+#   svc = get_service()
+#   svc.filled / svc.dtw / svc.cube / svc.geometry(static=...)
+#   svc.map_values(var, start, end, province, district)   ค่าเฉลี่ยต่อตำบล (level='district' → ต่ออำเภอ)
+#   svc.series(var, start, end, province, district)       ค่าเฉลี่ยรายเดือน
+#   svc.mean(var, start, end, province, district)         ค่าเฉลี่ยรวม
+#
+# - โหลดแต่ละ dataset ครั้งแรกที่ใช้ (lazy) แล้วใช้ร่วมกันทุก session/callback
+# - column เป็นตัวพิมพ์เล็ก, key พื้นที่เป็นตัวพิมพ์ใหญ่, มี 'date' และ 'id' (= geo_assets.area_id)
+# - query ถูก cache (LRU) ตาม argument — map_values คืนสำเนา DataFrame, series คืน array แบบ read-only
+#
+# path อ้างอิงจากตำแหน่งของไฟล์นี้ (รันจาก directory ไหนก็ได้) ไม่ใช้ path ของเครื่องใดเครื่องหนึ่ง:
+#   DASH_DATA_DIR  parquet + cube (ค่าเริ่มต้น gee-pipeline/outputs/merged = output ของ pipeline โดยตรง)
+#   DASH_LOCAL_DIR ไฟล์ที่ไม่ได้มาจาก pipeline: shapefile, geo/ จาก build_geometry.py, Excel เดิม (ค่าเริ่มต้น data/)
+# pin ข้อมูลจาก snapshots ของ pipeline (เลข version นับแยกต่อ dataset):
+#   DASH_FILLED_VERSION / DASH_DTW_VERSION = <เลข version | tag | latest> ของแต่ละ dataset
+#   DASH_DATA_VERSION = <tag | latest> ใช้กับทุก dataset ที่ไม่ได้ตั้งค่าแยก (tag ชื่อเดียวกันในแต่ละ dataset)
+# ถ้ามี <filled>.cube (cube_store) ที่ตรงกับ parquet ปัจจุบัน svc.cube จะอ่านจาก cube แทนการ pivot DataFrame
+# ----------------------------------------------------
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get('DASH_DATA_DIR', os.path.join(ROOT, 'gee-pipeline', 'outputs', 'merged'))
+LOCAL_DATA_DIR = os.environ.get('DASH_LOCAL_DIR', os.path.join(ROOT, 'data'))
+DATA_VERSION = os.environ.get('DASH_DATA_VERSION')
+PINS = {
+    'filled': os.environ.get('DASH_FILLED_VERSION', DATA_VERSION),
+    'dtw': os.environ.get('DASH_DTW_VERSION', DATA_VERSION),
+}
+PIPELINE_SCRIPTS = os.path.join(ROOT, 'gee-pipeline', 'scripts')
+
+FILES = {
+    'filled': 'merged_dataset_FILLED.parquet',
+    'dtw': 'dtw_results.parquet',
+}
+SHP_FILE = 'khonkaen_provinces.shp'
+VARIABLES = ['ndvi', 'lst', 'soilmoisture', 'rainfall', 'firecount']
+QUERY_CACHE = 256
+
+
+def upper_keys(s):
+    """
+    key พื้นที่ → ตัวพิมพ์ใหญ่ (แปลงเฉพาะค่าที่ไม่ซ้ำ ไม่ใช่ทุกแถว)
+    """
+    codes, uniques = pd.factorize(s)
+    upper = pd.Index(uniques.astype(str)).str.upper().to_numpy()
+    return pd.Series(upper[codes], index=s.index)
+
+
+def normalize_frame(df):
+    df.columns = [c.lower() for c in df.columns]
+    for col in AREA:
+        if col in df.columns:
+            df[col] = upper_keys(df[col])
+    if all(col in df.columns for col in AREA):
+        df['id'] = area_id(df)
+    return df
+
+
+def use_pipeline_scripts():
+    """
+    ให้ import module ของ pipeline (snapshots, cube_store, pipeline_schema) ได้
+    """
+    if PIPELINE_SCRIPTS not in sys.path:
+        sys.path.append(PIPELINE_SCRIPTS)
+
+
+def _frozen(values):
+    values = np.asarray(values)
+    values.flags.writeable = False
+    return values
+
+
+class DataService:
+    """
+    dataset ของ dashboard (filled / DTW / geometry) + query ที่ cache แล้ว
+    """
+
+    def __init__(self, data_dir=DATA_DIR, pins=None, local_dir=LOCAL_DATA_DIR):
+        if pins is None and DATA_VERSION is not None and DATA_VERSION.isdigit():
+            raise ValueError("❌ DASH_DATA_VERSION must be a tag or 'latest' (version numbers differ per dataset); "
+                             "use DASH_FILLED_VERSION / DASH_DTW_VERSION to pin numbers")
+        self.data_dir = data_dir
+        self.local_dir = local_dir
+        self.pins = dict(PINS if pins is None else pins)
+        self._resolved = {}
+        self._lock = threading.RLock()
+        self._frames = {}
+        self._cube = None
+        self._geo = {}
+
+        self._map_cache = lru_cache(QUERY_CACHE)(self._map_values)
+        self.series = lru_cache(QUERY_CACHE)(self._series)
+        self.mean = lru_cache(QUERY_CACHE)(self._mean)
+
+    # ---- loading ----
+    def path(self, name):
+        return os.path.join(self.data_dir, FILES[name])
+
+    def resolved(self, name):
+        """
+        เลข version ของ snapshot ที่ pin ไว้ (None = อ่านไฟล์ใน data_dir) — resolve ครั้งเดียวต่อ process
+        """
+        if self.pins.get(name) is None:
+            return None
+        with self._lock:
+            if name not in self._resolved:
+                use_pipeline_scripts()
+                from snapshots import resolve_version
+                self._resolved[name] = resolve_version(name, self.pins[name])
+            return self._resolved[name]
+
+    def _read(self, name):
+        version = self.resolved(name)
+        if version is not None:
+            use_pipeline_scripts()
+            from snapshots import read_snapshot
+            return read_snapshot(name, version)
+        return pd.read_parquet(self.path(name))
+
+    def frame(self, name):
+        with self._lock:
+            if name not in self._frames:
+                df = normalize_frame(self._read(name))
+                if name == 'filled':
+                    df['date'] = pd.to_datetime(df[['year', 'month']].assign(day=1))
+                else:
+                    # วันที่ 1 กรกฎาคมของปีนั้นๆ เพื่อให้จุดอยู่กลางปีเวลา plot
+                    df['date'] = pd.to_datetime(df['year'].astype(str) + '-07-01')
+                self._frames[name] = df
+                print(f"✅ Loaded {name}: {len(df):,} rows")
+            return self._frames[name]
+
+    @property
+    def filled(self):
+        return self.frame('filled')
+
+    @property
+    def dtw(self):
+        return self.frame('dtw')
+
+    @property
+    def cube(self):
+        with self._lock:
+            if self._cube is None:
+                store = self._store()
+                if store is not None:
+                    self._cube = TimeCube.from_store(store, VARIABLES)
+                    print(f"✅ Loaded cube: {store.path} {store.shape}")
+                else:
+                    self._cube = TimeCube.from_frame(self.filled, VARIABLES)
+            return self._cube
+
+    def _store(self):
+        """
+        cube_store.Cube ข้าง parquet ของ filled ถ้ายังตรงกับไฟล์ (ไม่ใช้ตอน pin snapshot)
+        """
+        if self.pins.get('filled') is not None:
+            return None
+        use_pipeline_scripts()
+        from cube_store import cube_path, open_cube
+        path = cube_path(self.path('filled'))
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        store = open_cube(path)
+        return store if store.is_fresh(self.path('filled')) else None
+
+    @property
+    def version(self):
+        """
+        ตัวระบุชุดข้อมูล (เลข version ของ snapshot หรือ mtime/size ของไฟล์) สำหรับ key ของ cache ภายนอก
+        """
+        parts = []
+        for name in FILES:
+            path = self.path(name)
+            if self.pins.get(name) is not None:
+                parts.append(f"{name}:v{self.resolved(name)}")
+            elif os.path.exists(path):
+                stat = os.stat(path)
+                parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+        return "|".join(parts)
+
+    def geometry(self, static=False, tolerance=0.001):
+        """
+        GeoSet (geo_assets.load_geometry) — สร้างครั้งเดียวต่อ (static, tolerance)
+        """
+        key = (bool(static), tolerance)
+        with self._lock:
+            if key not in self._geo:
+                self._geo[key] = load_geometry(os.path.join(self.local_dir, SHP_FILE), tolerance=tolerance, static=static,
+                                               geo_dir=os.path.join(self.local_dir, 'geo'))
+            return self._geo[key]
+
+    # ---- queries ----
+    def window(self, start, end, province=None, district=None):
+        """
+        (start, end, province, district) → (ช่วง area, t0, t1) ของ cube
+        """
+        cube = self.cube
+        t0 = int(cube.dates.searchsorted(pd.Timestamp(start), side='left'))
+        t1 = int(cube.dates.searchsorted(pd.Timestamp(end), side='right')) - 1
+        return cube.area_slice(province, district if province else None), t0, t1
+
+    def map_values(self, *args, **kwargs):
+        """
+        ผลของ _map_values จาก cache — คืนสำเนา ผู้เรียกเพิ่ม/แก้ column ได้โดยไม่กระทบ cache
+        """
+        return self._map_cache(*args, **kwargs).copy()
+
+    def _map_values(self, var, start, end, province=None, district=None, level='subdistrict'):
+        """
+        ค่าเฉลี่ยต่อพื้นที่ของ level ในช่วงวันที่ → DataFrame (keys, id, var) เฉพาะพื้นที่ที่มีค่า
+        """
+        areas, t0, t1 = self.window(start, end, province, district)
+        if t1 < t0:
+            return pd.DataFrame(columns=level_keys(level) + ['id', var])
+        if level == 'subdistrict':
+            rows, values = self.cube.area_means(var, t0, t1, areas)
+            ids = self.cube.ids[areas[0]:areas[1]]
+        else:
+            rows, values = self.cube.group_means(var, t0, t1, level, areas)
+            ids = area_id(rows, level)
+        out = rows.assign(id=ids, **{var: values})
+        return out[~np.isnan(values)].reset_index(drop=True)
+
+    def _series(self, var, start, end, province=None, district=None):
+        """
+        ค่าเฉลี่ยรายเดือนของพื้นที่ → (dates, values)
+        """
+        areas, t0, t1 = self.window(start, end, province, district)
+        if t1 < t0:
+            return self.cube.dates[:0], _frozen(np.array([]))
+        dates, values = self.cube.series(var, t0, t1, areas)
+        return dates, _frozen(values)
+
+    def _mean(self, var, start, end, province=None, district=None):
+        areas, t0, t1 = self.window(start, end, province, district)
+        return float(self.cube.mean(var, t0, t1, areas)) if t1 >= t0 else np.nan
+
+    def month_values(self, var, start, end, province=None, district=None):
+        """
+        ค่ารายเดือนของแต่ละตำบล → (ids, dates, (month, area) array) สำหรับ animation frames
+        """
+        areas, t0, t1 = self.window(start, end, province, district)
+        cube = self.cube
+        return cube.ids[areas[0]:areas[1]], cube.dates[t0:t1 + 1], cube.month_values(var, t0, t1, areas)
+
+    def clear(self):
+        for fn in (self._map_cache, self.series, self.mean):
+            fn.cache_clear()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """
+    DataService ตัวเดียวของ process (ทุก dashboard / session ใช้ร่วมกัน)
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DataService()
+        return _service
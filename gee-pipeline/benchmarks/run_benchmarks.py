@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime, timezone
+
+from synthetic import generate_panel, outputs, write_layer
+
+# ----------------------------------------
+# PIPELINE BENCHMARKS
+#
+#   python gee-pipeline/benchmarks/run_benchmarks.py --sizes 200x3 1000x5 2000x10
+#
+# ต่อ 1 ขนาด: สร้าง panel สังเคราะห์ใน temp root แล้วรัน script จริง
+# (subprocess, cwd = temp root) ตามลำดับ clean → merge → fill → dtw
+# ผลลัพธ์เก็บเป็น JSON ใน benchmarks/results/ และเทียบกับ run ก่อนหน้า
+# จากหลายขนาดจะ fit power law แล้วประมาณเวลาที่ 7,000 ตำบลเทียบกับ budget ของ workflow
+# ----------------------------------------
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS = BENCH_DIR.parent / "scripts"
+RESULTS_DIR = BENCH_DIR / "results"
+
+# stage → (script, layer ที่ต้องมีก่อนรัน, path ของ input นั้นใต้ outputs/)
+STAGES = {
+    "clean": ("clean_raw_data.py", "raw", "raw_parquet"),
+    "merge": ("merge_cleaned.py", "clean", "clean"),
+    "fill": ("final_fill_after_merge.py", "merged", "merged/merged_dataset.parquet"),
+    "dtw": ("compute_dtw_from_baseline.py", "filled", "merged/merged_dataset_FILLED.parquet"),
+}
+
+TARGET_AREAS = 7000
+BUDGET_MINUTES = 360  # timeout ของ GitHub Actions job
+
+
+def parse_size(text):
+    areas, years = text.lower().split("x")
+    return int(areas), int(years)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+# ----------------------------------------
+# RUN ONE SIZE
+# ----------------------------------------
+def run_stage(root, stage, timeout):
+    """
+    รัน script ของ stage ใน root แล้วอ่านตัวเลขจาก run log ของ instrumentation
+    """
+    script = SCRIPTS / STAGES[stage][0]
+    env = os.environ | {"PIPELINE_RUN_ID": f"bench-{stage}"}
+    log = Path(root) / f"{stage}.log"
+
+    t0 = time.perf_counter()
+    with open(log, "w") as f:
+        proc = subprocess.run(
+            [sys.executable, str(script)],
+            cwd=root, env=env, stdout=f, stderr=subprocess.STDOUT, timeout=timeout,
+        )
+    wall = time.perf_counter() - t0
+
+    result = {"stage": stage, "status": "ok" if proc.returncode == 0 else "failed", "wall_s": round(wall, 3)}
+    if proc.returncode != 0:
+        print(log.read_text()[-2000:])
+
+    run_log = outputs(root) / "state" / "run_log.jsonl"
+    if run_log.exists():
+        records = [json.loads(line) for line in run_log.read_text().splitlines() if line.strip()]
+        records = [r for r in records if r["run_id"] == env["PIPELINE_RUN_ID"]]
+        total = next((r for r in records if r["stage"] == "total"), None)
+        if total:
+            # work_s ไม่รวม interpreter startup/import — ใช้ตอน fit scaling
+            result.update(work_s=total["wall_s"], cpu_s=total["cpu_s"], peak_rss_mb=total["peak_rss_mb"])
+        result["steps"] = {
+            r["stage"]: {k: r[k] for k in ["wall_s", "rows_in", "rows_out", "bytes_read", "bytes_written"]}
+            for r in records if r["stage"] != "total"
+        }
+    return result
+
+
+def run_size(areas, years, stages, seed, timeout, keep=False):
+    root = tempfile.mkdtemp(prefix=f"gee-bench-{areas}x{years}-")
+    print(f"\n🧪 {areas} areas × {years} years ({areas * years * 12:,} area-months) in {root}")
+
+    t0 = time.perf_counter()
+    panel = generate_panel(areas, years, seed=seed)
+    print(f"   generated panel in {time.perf_counter() - t0:.1f}s")
+
+    results = []
+    try:
+        for stage in stages:
+            _, layer, input_path = STAGES[stage]
+            # stage ก่อนหน้าไม่ได้ถูกเลือก → เขียน input ของ stage นี้จาก panel ตรง ๆ
+            if not (outputs(root) / input_path).exists():
+                write_layer(panel, root, layer)
+
+            r = run_stage(root, stage, timeout)
+            r.update(areas=areas, years=years, cells=areas * years * 12)
+            results.append(r)
+            print(f"   {stage:<6} {r['status']:<7} {r['wall_s']:>9.1f}s  peak {r.get('peak_rss_mb', 0):>7.0f} MB")
+            if r["status"] != "ok":
+                break
+    except subprocess.TimeoutExpired:
+        print(f"   {stage:<6} timeout after {timeout}s")
+        results.append({"stage": stage, "status": "timeout", "wall_s": timeout, "areas": areas, "years": years, "cells": areas * years * 12})
+    finally:
+        if not keep:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+# ----------------------------------------
+# COMPARE + PROJECT
+# ----------------------------------------
+def latest_result(exclude=None):
+    files = sorted(p for p in RESULTS_DIR.glob("bench_*.json") if p != exclude)
+    return files[-1] if files else None
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {(r["areas"], r["years"], r["stage"]): r for r in previous["runs"] if r["status"] == "ok"}
+
+    print(f"\n📈 VS {previous_path.name} (commit {previous.get('commit')})")
+    print(f"   {'size':<12} {'stage':<6} {'before s':>10} {'now s':>10} {'change':>8}")
+    for r in current:
+        b = before.get((r["areas"], r["years"], r["stage"]))
+        if b is None or r["status"] != "ok":
+            continue
+        change = (r["wall_s"] - b["wall_s"]) / b["wall_s"] if b["wall_s"] else 0.0
+        flag = " ⚠️" if change > 0.2 else ""
+        print(f"   {str(r['areas']) + 'x' + str(r['years']):<12} {r['stage']:<6} {b['wall_s']:>10.1f} {r['wall_s']:>10.1f} {change:>+8.0%}{flag}")
+
+
+def project(runs, target_cells):
+    """
+    fit log(work) = a + b·log(area-months) ต่อ stage แล้วประมาณที่ target (+ startup)
+    """
+    df = pd.DataFrame([r for r in runs if r["status"] == "ok"])
+    out = {}
+    if df.empty:
+        return out
+    if "work_s" not in df:
+        df["work_s"] = df["wall_s"]
+    df["work_s"] = df["work_s"].fillna(df["wall_s"])
+    df["overhead_s"] = df["wall_s"] - df["work_s"]
+
+    for stage, g in df.groupby("stage", sort=False):
+        overhead = g["overhead_s"].median()
+        g = g.groupby("cells", as_index=False)["work_s"].median()
+        if len(g) < 2:
+            continue
+        b, a = np.polyfit(np.log(g["cells"]), np.log(g["work_s"].clip(lower=1e-3)), 1)
+        seconds = np.exp(a + b * np.log(target_cells)) + overhead
+        out[stage] = {"exponent": round(float(b), 3), "seconds": round(float(seconds), 1)}
+    return out
+
+
+def print_projection(projection, target_areas, target_years, budget_minutes):
+    if not projection:
+        print("\n⚠️ Need at least two sizes per stage to project")
+        return
+    print(f"\n🔮 PROJECTION: {target_areas:,} areas × {target_years} years")
+    for stage, p in projection.items():
+        print(f"   {stage:<6} ~{p['seconds'] / 60:>8.1f} min   (time ∝ size^{p['exponent']})")
+    total = sum(p["seconds"] for p in projection.values()) / 60
+    verdict = "✅ fits" if total <= budget_minutes else "❌ exceeds"
+    print(f"   total  ~{total:>8.1f} min   {verdict} the {budget_minutes} min budget")
+
+# ----------------------------------------
+# MAIN
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline scripts on synthetic tambon panels")
+    parser.add_argument("--sizes", nargs="+", default=["200x3", "1000x3", "1000x6"], help="AREASxYEARS, e.g. 7000x10")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size (projection uses the median)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=int, default=3600, help="Seconds per stage")
+    parser.add_argument("--target-areas", type=int, default=TARGET_AREAS)
+    parser.add_argument("--target-years", type=int, default=datetime.now().year - 2015 + 1)
+    parser.add_argument("--budget-minutes", type=float, default=BUDGET_MINUTES)
+    parser.add_argument("--compare", default="latest", help="Result file to compare against, 'latest' or 'none'")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary roots")
+    args = parser.parse_args()
+
+    stages = [s for s in STAGES if s in args.stages]
+    runs = []
+    for size in args.sizes:
+        areas, years = parse_size(size)
+        for _ in range(args.repeat):
+            runs.extend(run_size(areas, years, stages, args.seed, args.timeout, args.keep))
+
+    projection = project(runs, args.target_areas * args.target_years * 12)
+    print_projection(projection, args.target_areas, args.target_years, args.budget_minutes)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    created = datetime.now(timezone.utc)
+    path = RESULTS_DIR / f"bench_{created:%Y%m%dT%H%M%SZ}.json"
+    with open(path, "w") as f:
+        json.dump({
+            "created": created.isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "machine": machine_info(),
+            "seed": args.seed,
+            "target": {"areas": args.target_areas, "years": args.target_years, "budget_minutes": args.budget_minutes},
+            "projection": projection,
+            "runs": runs,
+        }, f, indent=2)
+    print(f"\n📝 Results: {path}")
+
+    previous = latest_result(exclude=path) if args.compare == "latest" else (
+        None if args.compare == "none" else Path(args.compare)
+    )
+    if previous is not None:
+        compare(runs, previous)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from cleaning_rules import CLEANING_RULES
+
+# ----------------------------------------
+# SYNTHETIC TAMBON PANEL
+#
+# ข้อมูลรายเดือน N ตำบล × Y ปี × 5 ตัวแปร ในหน่วยจริง (หลัง clean)
+# มีฤดูกาล, ค่าต่างกันต่อตำบล/อำเภอ, ช่องว่าง และ outlier
+# แล้วเขียนออกเป็น layout เดียวกับ pipeline (raw / clean / merged / filled)
+# ----------------------------------------
+KEYS = ["province", "district", "subdistrict", "year", "month"]
+AREA = ["province", "district", "subdistrict"]
+VARS = ["NDVI", "LST", "RAINFALL", "SOILMOISTURE", "FIRECOUNT"]
+
+# ตำบล/อำเภอ และ อำเภอ/จังหวัด ใกล้ค่าเฉลี่ยของไทย (outlier แบบ spatial ต้องมีเพื่อนบ้าน)
+SUBDISTRICTS_PER_DISTRICT = 9
+DISTRICTS_PER_PROVINCE = 12
+
+GAP_RATE = 0.03       # ค่าหายทีละเซลล์
+GAP_RUN_RATE = 0.002  # ช่วงหายต่อเนื่อง 2–4 เดือน (ทดสอบ interpolate limit)
+OUTLIER_RATE = 0.005
+
+
+def make_areas(n_areas):
+    i = np.arange(n_areas)
+    d = i // SUBDISTRICTS_PER_DISTRICT
+    p = d // DISTRICTS_PER_PROVINCE
+    province = np.char.add("P", np.char.zfill(p.astype(str), 3))
+    district = np.char.add(np.char.add(province, "-D"), np.char.zfill((d % DISTRICTS_PER_PROVINCE).astype(str), 2))
+    subdistrict = np.char.add(np.char.add(district, "-S"), np.char.zfill((i % SUBDISTRICTS_PER_DISTRICT).astype(str), 2))
+    return pd.DataFrame({"province": province, "district": district, "subdistrict": subdistrict})
+
+
+def seasonal(month, peak):
+    return np.cos(2 * np.pi * (month - peak) / 12)
+
+
+def generate_panel(n_areas, n_years, start_year=2015, seed=0):
+    """
+    คืนค่า DataFrame (KEYS + VARS) เรียงตามตำบลแล้วเวลา — NaN = ค่าหาย
+    """
+    rng = np.random.default_rng(seed)
+    areas = make_areas(n_areas)
+    n_months = n_years * 12
+
+    area_idx = np.repeat(np.arange(n_areas), n_months)
+    t = np.tile(np.arange(n_months), n_areas)
+    year = start_year + t // 12
+    month = t % 12 + 1
+
+    # ผลของอำเภอ (ตำบลในอำเภอเดียวกันคล้ายกัน) + ของตำบลเอง
+    district_code = pd.factorize(areas["district"])[0]
+    district_effect = rng.normal(0, 1, district_code.max() + 1)[district_code]
+    area_effect = (0.7 * district_effect + 0.3 * rng.normal(0, 1, n_areas))[area_idx]
+    trend = t / 120
+
+    n = len(t)
+    noise = rng.normal(0, 1, (len(VARS), n))
+    values = {
+        "NDVI": 0.55 + 0.15 * seasonal(month, 9) + 0.05 * area_effect + 0.03 * noise[0],
+        "LST": 32 + 4 * seasonal(month, 4) + 1.5 * area_effect + 0.3 * trend + 1.0 * noise[1],
+        "RAINFALL": np.maximum(0, 120 + 110 * seasonal(month, 8) + 20 * area_effect + 25 * noise[2]),
+        "SOILMOISTURE": 0.28 + 0.08 * seasonal(month, 9) + 0.03 * area_effect + 0.02 * noise[3],
+        "FIRECOUNT": rng.poisson(np.maximum(0.05, 3 + 3 * seasonal(month, 3) + area_effect)).astype(float),
+    }
+    values["NDVI"] = np.clip(values["NDVI"], -0.19, 0.99)
+    values["SOILMOISTURE"] = np.clip(values["SOILMOISTURE"], 0.01, 0.99)
+
+    for var in VARS:
+        v = values[var]
+
+        spikes = rng.random(n) < OUTLIER_RATE
+        v[spikes] = v[spikes] * rng.choice([0.2, 3.0], spikes.sum())
+
+        gaps = rng.random(n) < GAP_RATE
+        for length in rng.integers(2, 5, int(n * GAP_RUN_RATE)):
+            start = rng.integers(0, n - length)
+            gaps[start:start + length] = True
+        v[gaps] = np.nan
+
+    panel = areas.iloc[area_idx].reset_index(drop=True)
+    panel["year"] = year.astype("int32")
+    panel["month"] = month.astype("int32")
+    for var in VARS:
+        panel[var] = values[var]
+    return panel
+
+# ----------------------------------------
+# WRITERS (layout เดียวกับ gee-pipeline/outputs)
+# ----------------------------------------
+def outputs(root):
+    return Path(root) / "gee-pipeline" / "outputs"
+
+
+def to_raw(var, values):
+    """
+    ย้อนกฎ clean: raw = (value - offset) / scale, NDVI ที่หายเป็น 0 (fill value)
+    """
+    rule = CLEANING_RULES[var]
+    raw = (values - rule.get("offset", 0.0)) / rule.get("scale", 1.0)
+    if rule.get("null_values"):
+        raw = np.where(np.isnan(raw), rule["null_values"][0], raw)
+    return raw
+
+
+def write_monthly(panel, root, layer):
+    """
+    layer="raw"  → raw_parquet/<VAR>/<VAR>_YYYY_MM.parquet (subdistric, mean/sum)
+    layer="clean" → clean/<VAR>/<VAR>_YYYY_MM.parquet
+    """
+    base = outputs(root) / ("raw_parquet" if layer == "raw" else "clean")
+    for var in VARS:
+        (base / var).mkdir(parents=True, exist_ok=True)
+
+    for (year, month), part in panel.groupby(["year", "month"], sort=True):
+        keys = part[KEYS].reset_index(drop=True)
+        for var in VARS:
+            if layer == "raw":
+                df = keys.rename(columns={"subdistrict": "subdistric"})
+                df[CLEANING_RULES[var]["source"]] = to_raw(var, part[var].to_numpy())
+            else:
+                df = keys.copy()
+                df[var] = part[var].to_numpy()
+            df.to_parquet(base / var / f"{var}_{year}_{month:02d}.parquet", index=False)
+
+
+def write_merged(panel, root, filled=False):
+    merged = outputs(root) / "merged"
+    merged.mkdir(parents=True, exist_ok=True)
+    df = panel.sort_values(KEYS).reset_index(drop=True)
+    if filled:
+        # กรอกแบบง่าย (climatology ต่อตำบล) — พอสำหรับเป็น input ของ DTW
+        clim = df.groupby(AREA + ["month"])[VARS].transform("mean")
+        df[VARS] = df[VARS].fillna(clim).fillna(df[VARS].mean())
+        path = merged / "merged_dataset_FILLED.parquet"
+    else:
+        path = merged / "merged_dataset.parquet"
+    df.to_parquet(path, index=False)
+    return path
+
+
+def write_layer(panel, root, layer):
+    if layer in ("raw", "clean"):
+        write_monthly(panel, root, layer)
+    elif layer == "merged":
+        write_merged(panel, root)
+    elif layer == "filled":
+        write_merged(panel, root, filled=True)
+    else:
+        raise ValueError(f"❌ Unknown layer: {layer}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic tambon panel in the pipeline layout")
+    parser.add_argument("--areas", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layer", choices=["raw", "clean", "merged", "filled"], default="raw")
+    parser.add_argument("--root", required=True, help="Folder that plays the role of the repo root")
+    args = parser.parse_args()
+
+    panel = generate_panel(args.areas, args.years, seed=args.seed)
+    write_layer(panel, args.root, args.layer)
+    print(f"✅ {args.areas} areas × {args.years} years → {args.layer} layer in {outputs(args.root)}")
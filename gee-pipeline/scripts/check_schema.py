@@ -1,51 +1,214 @@
 import os
-import pandas as pd
+import sys
+import json
+import argparse
+import pyarrow as pa
+import pyarrow.parquet as pq
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from cleaning_rules import CLEANING_RULES
+from instrumentation import init, stage
 
 RAW_DIR = "gee-pipeline/outputs/raw_parquet"
 CLEAN_DIR = "gee-pipeline/outputs/clean"
+REPORT_PATH = "gee-pipeline/outputs/state/schema_report.json"
 
 EXPECTED_KEYS = {"province", "district", "subdistrict", "year", "month"}
+STRING_KEYS = ["province", "district", "subdistrict"]
+INT_KEYS = ["year", "month"]
 
-def check_folder(folder):
-    print(f"\n📂 Checking folder: {folder}")
-    schema_map = defaultdict(list)
+# ----------------------------------------
+# TYPE HELPERS
+# ----------------------------------------
+def is_string(t):
+    if pa.types.is_dictionary(t):
+        t = t.value_type
+    return pa.types.is_string(t) or pa.types.is_large_string(t)
+
+
+def is_number(t):
+    return pa.types.is_floating(t) or pa.types.is_integer(t)
+
+# ----------------------------------------
+# CHECK ONE FILE (footer only)
+# ----------------------------------------
+def column_range(meta, name):
+    """
+    min/max ของคอลัมน์จาก row-group statistics (ไม่อ่านข้อมูล)
+    """
+    idx = meta.schema.names.index(name)
+    lo = hi = None
+    for i in range(meta.num_row_groups):
+        stats = meta.row_group(i).column(idx).statistics
+        if stats is None or not stats.has_min_max:
+            return None
+        lo = stats.min if lo is None else min(lo, stats.min)
+        hi = stats.max if hi is None else max(hi, stats.max)
+    return lo, hi
+
+
+def check_file(path, layer, deep=False):
+    result = {"path": path, "layer": layer, "errors": [], "warnings": []}
+    errors = result["errors"]
+
+    try:
+        f = pq.ParquetFile(path)
+    except Exception as e:
+        errors.append(f"unreadable: {e}")
+        return result
+
+    meta = f.metadata
+    schema = f.schema_arrow
+    cols = set(schema.names)
+    if layer == "raw":
+        cols = {"subdistrict" if c == "subdistric" else c for c in cols}
+
+    result["rows"] = meta.num_rows
+    result["columns"] = sorted(schema.names)
+
+    missing = EXPECTED_KEYS - cols
+    if missing:
+        errors.append(f"missing key columns: {sorted(missing)}")
+
+    if meta.num_rows == 0:
+        errors.append("no rows")
+
+    for name in schema.names:
+        t = schema.field(name).type
+        key = "subdistrict" if name == "subdistric" else name
+        if key in STRING_KEYS and not is_string(t):
+            errors.append(f"{name}: expected string, got {t}")
+        elif key in INT_KEYS and not pa.types.is_integer(t):
+            errors.append(f"{name}: expected integer, got {t}")
+
+    var = os.path.basename(os.path.dirname(path)).upper()
+    if layer == "clean":
+        values = [v for v in CLEANING_RULES if v in schema.names]
+        if not values:
+            errors.append("no variable column")
+        for v in values:
+            if not is_number(schema.field(v).type):
+                errors.append(f"{v}: expected numeric, got {schema.field(v).type}")
+    elif layer == "raw" and var in CLEANING_RULES:
+        source = CLEANING_RULES[var]["source"]
+        if source not in schema.names:
+            errors.append(f"missing value column '{source}'")
 
+    # 1 ไฟล์ควรมีเดือนเดียว
+    if not missing and meta.num_rows:
+        years, months = column_range(meta, "year"), column_range(meta, "month")
+        if years is None or months is None:
+            result["warnings"].append("no year/month statistics in footer")
+        else:
+            result["period"] = [years[0], months[0]]
+            if years[0] != years[1] or months[0] != months[1]:
+                errors.append(f"spans several months: year {years}, month {months}")
+
+    # --deep: อ่านเฉพาะคอลัมน์ key เพื่อนับแถวซ้ำ
+    if deep and not missing and layer == "clean":
+        keys = f.read(columns=sorted(EXPECTED_KEYS)).to_pandas()
+        dup = int(keys.duplicated().sum())
+        result["duplicate_keys"] = dup
+        if dup:
+            errors.append(f"{dup} duplicate key rows")
+
+    return result
+
+# ----------------------------------------
+# CHECK FOLDERS
+# ----------------------------------------
+def list_files(folder):
     for root, _, files in os.walk(folder):
         for f in files:
             if f.endswith(".parquet"):
-                path = os.path.join(root, f)
-                try:
-                    df = pd.read_parquet(path, engine="pyarrow")
-                    cols = set(df.columns)
-                    missing = EXPECTED_KEYS - cols
-                    extra = cols - EXPECTED_KEYS
+                yield os.path.join(root, f)
+
+
+def duplicate_periods(results):
+    """
+    ไฟล์หลายไฟล์ในโฟลเดอร์ตัวแปรเดียวกันที่ครอบเดือนเดียวกัน = key ซ้ำตอน merge
+    """
+    seen = defaultdict(list)
+    for r in results:
+        if "period" in r:
+            folder = os.path.dirname(r["path"])
+            seen[(folder, tuple(r["period"]))].append(r["path"])
+    return {
+        f"{os.path.basename(folder)} {year}-{month:02d}": paths
+        for (folder, (year, month)), paths in seen.items()
+        if len(paths) > 1
+    }
+
+
+def check_folder(folder, layer, workers, deep=False):
+    print(f"\n📂 Checking folder: {folder}")
+    paths = sorted(list_files(folder))
 
-                    schema_map[str(cols)].append(path)
+    with stage(layer) as st:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(lambda p: check_file(p, layer, deep), paths))
+        st.rows(rows_in=sum(r.get("rows", 0) for r in results))  # จำนวนแถวจาก footer (ไม่ใช่จำนวนไฟล์)
 
-                    if missing:
-                        print(f"❌ {path}")
-                        print(f"   Missing columns: {missing}")
-                    else:
-                        print(f"✅ {path}")
+    schema_map = defaultdict(int)
+    for r in results:
+        schema_map[str(r.get("columns"))] += 1
+        if r["errors"]:
+            print(f"❌ {r['path']}")
+            for e in r["errors"]:
+                print(f"   {e}")
 
-                except Exception as e:
-                    print(f"🔥 Failed to read {path}: {e}")
+    dups = duplicate_periods(results)
+    for label, files in dups.items():
+        print(f"❌ duplicate month {label}: {len(files)} files")
 
     print("\n📊 Schema summary:")
-    for schema, files in schema_map.items():
-        print(f"\nSchema ({len(files)} files):")
+    for schema, n in schema_map.items():
+        print(f"\nSchema ({n} files):")
         print(schema)
 
+    return {
+        "folder": folder,
+        "files": len(results),
+        "rows": sum(r.get("rows", 0) for r in results),
+        "failed": sum(1 for r in results if r["errors"]),
+        "duplicate_months": dups,
+        "results": results,
+    }
+
 # -------------------------------
 # Run checks
 # -------------------------------
-if os.path.exists(RAW_DIR):
-    check_folder(RAW_DIR)
-else:
-    print("⚠️ raw_parquet not found")
-
-if os.path.exists(CLEAN_DIR):
-    check_folder(CLEAN_DIR)
-else:
-    print("⚠️ clean folder not found")
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=16, help="Threads for reading footers")
+    parser.add_argument("--deep", action="store_true", help="Also read key columns to count duplicate rows")
+    parser.add_argument("--report", default=REPORT_PATH, help="Where to write the JSON report")
+    parser.add_argument("--log", action="store_true", help="Record timings in the pipeline run log")
+    args = parser.parse_args()
+
+    # validator อ่านอย่างเดียว — เขียน run_log.jsonl เฉพาะเมื่อขอ
+    if args.log:
+        init("check_schema")
+    report = {"folders": []}
+    for folder, layer in [(RAW_DIR, "raw"), (CLEAN_DIR, "clean")]:
+        if os.path.exists(folder):
+            report["folders"].append(check_folder(folder, layer, args.workers, args.deep))
+        else:
+            print(f"⚠️ {folder} not found")
+
+    violations = sum(f["failed"] + len(f["duplicate_months"]) for f in report["folders"])
+    report["violations"] = violations
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n📝 Report: {args.report}")
+
+    if violations:
+        print(f"❌ {violations} contract violations")
+        sys.exit(1)
+    print("✅ All files match the contract")
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,202 @@
+import os
+import json
+import hashlib
+import argparse
 import pandas as pd
-import numpy as np
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from cleaning_rules import CLEANING_RULES, RULE_STEPS, apply_rules, rule_version
+from outlier_engine import filter_partition
+from instrumentation import init, stage
+from pipeline_schema import write_parquet
 
 RAW_DIR = Path("gee-pipeline/outputs/raw_parquet")
 CLEAN_DIR = Path("gee-pipeline/outputs/clean")
+STATE_DIR = Path("gee-pipeline/outputs/state")
+MANIFEST_PATH = STATE_DIR / "clean_manifest.json"
+REJECTIONS_PATH = STATE_DIR / "clean_rejections.parquet"
 CLEAN_DIR.mkdir(parents=True, exist_ok=True)
 
 KEYS = ["province", "district", "subdistrict", "year", "month"]
 
-VALUE_COLUMN_MAP = {
-    "LST": "mean",
-    "NDVI": "mean",
-    "SOILMOISTURE": "mean",
-    "RAINFALL": "sum",
-    "FIRECOUNT": "sum",
-}
+# ไฟล์จาก export แบบ combined (หลายตัวแปรใน 1 ตาราง/เดือน)
+COMBINED = "COMBINED"
 
-def iqr_filter(s):
-    q1, q3 = s.quantile([0.25, 0.75])
-    iqr = q3 - q1
-    return s.where((s >= q1 - 1.5 * iqr) & (s <= q3 + 1.5 * iqr))
+def combined_column(var):
+    # converter ทำชื่อคอลัมน์เป็นตัวเล็ก: NDVI_mean -> ndvi_mean
+    return f"{var.lower()}_{CLEANING_RULES[var]['source']}"
+
+def rules_version(var):
+    if var == COMBINED:
+        return ",".join(f"{v}:{rule_version(v)}" for v in CLEANING_RULES)
+    return f"{var}:{rule_version(var)}"
+
+# ----------------------------------------
+# MANIFEST (content hash + rule version)
+# ----------------------------------------
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
 
-for pq in RAW_DIR.rglob("*.parquet"):
-    var = pq.parent.name.upper()
-    print(f"🧹 CLEAN {var}: {pq.name}")
 
-    if var not in VALUE_COLUMN_MAP:
-        continue
+def input_state(path, entry, version):
+    """
+    fingerprint ของไฟล์ input: ถ้า size/mtime ไม่เปลี่ยนใช้ hash เดิม
+    ไม่ต้องอ่านไฟล์ซ้ำทุกเดือน
+    """
+    st = os.stat(path)
+    if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+        sha = entry["sha256"]
+    else:
+        sha = file_sha256(path)
+    return {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "rules": version}
+
+
+def is_up_to_date(entry, state):
+    return (
+        entry is not None
+        and entry.get("sha256") == state["sha256"]
+        and entry.get("rules") == state["rules"]
+        and os.path.exists(entry.get("output", ""))
+    )
+
+# ----------------------------------------
+# CLEAN ONE FILE (runs in worker process)
+# ----------------------------------------
+def clean_file(path):
+    pq = Path(path)
+    var = pq.parent.name.upper()
 
     df = pd.read_parquet(pq)
     df = df.rename(columns={"subdistric": "subdistrict"})
 
-    val_col = VALUE_COLUMN_MAP[var]
-    df = df[KEYS + [val_col]].rename(columns={val_col: var})
+    if var == COMBINED:
+        columns = {v: combined_column(v) for v in CLEANING_RULES if combined_column(v) in df.columns}
+    else:
+        columns = {var: CLEANING_RULES[var]["source"]}
+
+    out_df = df[KEYS].copy()
+    rejected = {}
+    for v, col in columns.items():
+        out_df[v], rejected[v] = apply_rules(df, v, column=col)
+
+    return str(CLEAN_DIR / var / pq.name), out_df, rejected
+
+
+def filter_outliers(results):
+    """
+    outlier แบบ seasonal/spatial ทำรวดเดียวทั้ง partition ต่อตัวแปร
+    (ต้องเห็นทุกตำบลของเดือนนั้นพร้อมกัน + state ข้ามเดือน)
+    """
+    for var, rule in CLEANING_RULES.items():
+        if rule.get("outlier") != "seasonal_spatial":
+            continue
+
+        parts = [(i, df) for i, (_, df, _) in enumerate(results) if var in df.columns]
+        if not parts:
+            continue
+
+        frame = pd.concat([df[KEYS + [var]] for _, df in parts], keys=[i for i, _ in parts])
+        values, n_out = filter_partition(frame, var)
+        print(f"🎯 {var}: {n_out} seasonal/spatial outliers")
+
+        for i, df in parts:
+            part = values.loc[i]
+            results[i][2][var]["outlier"] = int((df[var].notna().to_numpy() & part.isna().to_numpy()).sum())
+            df[var] = part.to_numpy()
+
+
+def write_rejections(manifest):
+    """
+    ตารางจำนวนค่าที่ถูกตัดต่อไฟล์/ตัวแปร/กฎ (ให้ขั้นตอน profiling อ่านต่อ)
+    """
+    rows = [
+        {"file": key, "variable": var, "rule": step, "count": counts.get(step, 0)}
+        for key, entry in manifest.items()
+        for var, counts in entry.get("rejected", {}).items()
+        for step in RULE_STEPS
+    ]
+    report = pd.DataFrame(rows, columns=["file", "variable", "rule", "count"])
+    report.to_parquet(REJECTIONS_PATH, index=False)
+    return report
+
+# ----------------------------------------
+# MAIN
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-clean every input regardless of the manifest")
+    args = parser.parse_args()
+
+    init("clean_raw_data")
+
+    with stage("scan") as st:
+        manifest = load_manifest()
+        todo = []
+        skipped = 0
+
+        for pq in sorted(RAW_DIR.rglob("*.parquet")):
+            var = pq.parent.name.upper()
+            if var not in CLEANING_RULES and var != COMBINED:
+                continue
+
+            key = pq.relative_to(RAW_DIR).as_posix()
+            entry = manifest.get(key)
+            state = input_state(pq, entry, rules_version(var))
+
+            if not args.force and is_up_to_date(entry, state):
+                skipped += 1
+                continue
+
+            todo.append((key, pq, state))
+        st.rows(len(todo) + skipped, len(todo))
+
+    print(f"🧹 CLEAN: {len(todo)} changed, {skipped} up to date")
 
-    # ---------- RULES ----------
-    if var == "LST":
-        df[var] = df[var] * 0.02 - 273.15
-        df[var] = df[var].where(df[var].between(5, 55))
-        df[var] = iqr_filter(df[var])
+    if todo:
+        with stage("clean") as st:
+            with ProcessPoolExecutor(max_workers=args.workers) as ex:
+                results = list(ex.map(clean_file, [str(pq) for _, pq, _ in todo]))
+            st.read(*[pq for _, pq, _ in todo], rows=sum(len(df) for _, df, _ in results))
 
-    elif var == "NDVI":
-        df[var] = df[var] / 10000
-        df[var] = df[var].where(df[var].between(-0.2, 1.0))
-        df.loc[df[var] == 0, var] = np.nan
-        df[var] = iqr_filter(df[var])
+        with stage("outliers"):
+            filter_outliers(results)
 
-    elif var == "SOILMOISTURE":
-        df[var] = df[var].where(df[var].between(0, 1))
-        df[var] = iqr_filter(df[var])
+        with stage("write") as st:
+            for (key, pq, state), (output, df, rejected) in zip(todo, results):
+                Path(output).parent.mkdir(exist_ok=True)
+                write_parquet(df, output)
+                st.wrote(output, rows=len(df))
+                print(f"🧹 CLEAN {pq.parent.name.upper()}: {pq.name} ({len(df)} rows)")
+                manifest[key] = state | {"output": output, "rejected": rejected}
 
-    elif var == "RAINFALL":
-        df[var] = df[var].where(df[var] >= 0)
+            save_manifest(manifest)
+            report = write_rejections(manifest)
 
-    elif var == "FIRECOUNT":
-        df[var] = df[var].where(df[var] >= 0)
+        print("🚫 Rejected values per rule:")
+        print(report.pivot_table(index="variable", columns="rule", values="count", aggfunc="sum")[RULE_STEPS].to_string())
 
-    out = CLEAN_DIR / var
-    out.mkdir(exist_ok=True)
-    df.to_parquet(out / pq.name, index=False)
+    print("✅ CLEAN DONE (no filling yet)")
 
-print("✅ CLEAN DONE (no filling yet)")
+if __name__ == "__main__":
+    main()
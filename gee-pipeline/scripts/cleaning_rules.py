@@ -0,0 +1,144 @@
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------
+# ตารางกฎการ clean ต่อตัวแปร (ใช้ร่วมกันทั้ง scripts และ scripts_auto)
+#
+#   source       คอลัมน์ค่าจาก reduceRegions ("mean" / "sum")
+#   null_values  ค่า fill/sentinel ของ raw ที่ต้องเป็น NaN
+#   scale/offset value = raw * scale + offset
+#   valid_range  (min, max) หลังแปลงหน่วย, None = ไม่จำกัดด้านนั้น
+#   outlier      "iqr" = ตัดด้วย 1.5 * IQR ต่อเดือน
+#                "seasonal_spatial" = เทียบประวัติตำบลเดิม + ตำบลในอำเภอเดียวกัน
+#                (outlier_engine.py, ทำทีละ partition ใน clean stage)
+#                None = ไม่ตัด
+#
+# เพิ่ม product ใหม่ = เพิ่ม entry ในตารางนี้
+# ----------------------------------------
+CLEANING_RULES = {
+    "LST": {
+        "source": "mean",
+        "scale": 0.02,
+        "offset": -273.15,
+        "valid_range": (5, 55),
+        "outlier": "seasonal_spatial",
+    },
+    "NDVI": {
+        "source": "mean",
+        "scale": 0.0001,
+        "valid_range": (-0.2, 1.0),
+        "null_values": [0],
+        "outlier": "seasonal_spatial",
+    },
+    "SOILMOISTURE": {
+        "source": "mean",
+        "valid_range": (0, 1),
+        "outlier": "seasonal_spatial",
+    },
+    "RAINFALL": {
+        "source": "sum",
+        "valid_range": (0, None),
+    },
+    "FIRECOUNT": {
+        "source": "sum",
+        "valid_range": (0, None),
+    },
+}
+
+# ลำดับขั้นตอน (ใช้เป็นชื่อใน rejection counts ด้วย)
+RULE_STEPS = ["missing", "null_values", "valid_range", "outlier"]
+IQR_K = 1.5
+
+
+def rule_version(var):
+    """
+    hash ของกฎตัวแปรนั้น — เปลี่ยนกฎเมื่อไร ไฟล์ของตัวแปรนั้นถูก clean ใหม่
+    """
+    spec = json.dumps(CLEANING_RULES[var], sort_keys=True)
+    return hashlib.sha1(spec.encode()).hexdigest()[:12]
+
+
+def iqr_bounds(values, groups=None):
+    """
+    ขอบล่าง/บนของ IQR ต่อกลุ่ม (เช่น ต่อ year, month) คืนค่าเป็น array ยาวเท่า values
+    """
+    s = pd.Series(values)
+    if groups is None:
+        q1, q3 = s.quantile([0.25, 0.75])
+        lo, hi = np.full(len(s), q1), np.full(len(s), q3)
+    else:
+        keys = groups.reset_index(drop=True)
+        cols = list(keys.columns)
+        q = s.groupby([keys[c] for c in cols]).quantile([0.25, 0.75]).unstack()
+        q.index.names = cols
+        b = keys.merge(q, left_on=cols, right_index=True, how="left")
+        lo, hi = b[0.25].to_numpy(float), b[0.75].to_numpy(float)
+
+    iqr = hi - lo
+    return lo - IQR_K * iqr, hi + IQR_K * iqr
+
+
+def compile_rule(var):
+    """
+    แปลง entry ในตารางเป็นฟังก์ชัน vectorized 1 pass:
+    run(values, groups=None) -> (cleaned Series, {step: rejected count})
+    """
+    rule = CLEANING_RULES[var]
+    scale = rule.get("scale", 1.0)
+    offset = rule.get("offset", 0.0)
+    null_values = rule.get("null_values", [])
+    lo, hi = rule.get("valid_range", (None, None))
+    outlier = rule.get("outlier")
+
+    def run(values, groups=None):
+        v = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", copy=True)
+        counts = dict.fromkeys(RULE_STEPS, 0)
+        counts["missing"] = int(np.isnan(v).sum())
+
+        if null_values:
+            bad = np.isin(v, null_values)
+            counts["null_values"] = int(bad.sum())
+            v[bad] = np.nan
+
+        if scale != 1.0 or offset != 0.0:
+            v = v * scale + offset
+
+        if lo is not None or hi is not None:
+            valid = ~np.isnan(v)
+            bad = np.zeros(len(v), dtype=bool)
+            if lo is not None:
+                bad |= valid & (v < lo)
+            if hi is not None:
+                bad |= valid & (v > hi)
+            counts["valid_range"] = int(bad.sum())
+            v[bad] = np.nan
+
+        if outlier == "iqr":
+            low, high = iqr_bounds(v, groups)
+            bad = ~np.isnan(v) & ((v < low) | (v > high))
+            counts["outlier"] = int(bad.sum())
+            v[bad] = np.nan
+        elif outlier == "seasonal_spatial":
+            pass  # ต้องใช้ state ข้ามเดือน — clean stage เรียก outlier_engine ต่อ
+        elif outlier is not None:
+            raise ValueError(f"❌ Unknown outlier filter for {var}: {outlier}")
+
+        return pd.Series(v, index=values.index, name=var), counts
+
+    return run
+
+
+COMPILED_RULES = {var: compile_rule(var) for var in CLEANING_RULES}
+
+
+def apply_rules(df, var, column=None, group_keys=("year", "month")):
+    """
+    clean คอลัมน์ของตัวแปร var ทั้งไฟล์หรือทั้ง partition ในครั้งเดียว
+    outlier คิดแยกต่อ group_keys (ค่าเริ่มต้น: ต่อเดือน)
+    """
+    column = column or CLEANING_RULES[var]["source"]
+    keys = [k for k in group_keys if k in df.columns]
+    groups = df[keys] if keys else None
+    return COMPILED_RULES[var](df[column], groups)
@@ -1,8 +1,11 @@
-import pandas as pd
+import os
 import numpy as np
-from scipy.stats import trim_mean
 from pathlib import Path
 
+from instrumentation import init, stage
+from cube_store import load_or_build
+from pipeline_schema import write_parquet
+
 # -----------------------------
 # CONFIG
 # -----------------------------
@@ -40,106 +43,100 @@ def dtw_distance(X, Y):
             )
     return D[N, M]
 
+
+def trimmed_monthly_mean(blocks):
+    """
+    (area, year, 12) → (area, 12): trimmed mean ข้ามปีของแต่ละเดือน ไม่นับ NaN
+    ตัดแบบเดียวกับ scipy.stats.trim_mean (int(ratio * n) ค่าต่อด้าน)
+    """
+    values = np.sort(blocks.astype(float), axis=1)  # NaN ไปอยู่ท้าย
+    n = (~np.isnan(blocks)).sum(axis=1)
+    cut = (TRIM_RATIO * n).astype(int)
+
+    i = np.arange(blocks.shape[1])[None, :, None]
+    keep = (i >= cut[:, None, :]) & (i < (n - cut)[:, None, :])
+    total = np.where(keep, values, 0.0).sum(axis=1)
+    count = keep.sum(axis=1)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
 # -----------------------------
-# LOAD DATA
+# LOAD DATA (area × month cube — ไม่ต้อง groupby/pivot)
 # -----------------------------
+init("compute_dtw_from_baseline")
+
 print("Loading dataset...")
-df = pd.read_parquet(INPUT_PATH)
-df.columns = df.columns.str.strip().str.lower()
+with stage("load") as st:
+    cube = load_or_build(INPUT_PATH, VARIABLES)
 
-required_cols = {"province", "district", "subdistrict", "year", "month"}
-missing = required_cols - set(df.columns)
-if missing:
-    raise ValueError(f"Missing required columns: {missing}")
+    missing = set(VARIABLES) - set(cube.variables)
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+
+    blocks = {}
+    for var in VARIABLES:
+        blocks[var], years = cube.year_blocks(var)
+    present = cube.present_years()
+    st.read(os.path.join(cube.path, "by_area.f32"), rows=int(cube.present.sum()))
 
 # -----------------------------
 # BASELINE (trimmed mean per month per SUBDISTRICT)
 # -----------------------------
 print("Computing baseline (local subdistrict baseline)...")
-baseline_series = {}
-
-for (province, district, subdistrict), group in df.groupby(
-    ["province", "district", "subdistrict"]
-):
-    key = (province, district, subdistrict)
-    baseline_series[key] = {}
-
-    for var in VARIABLES:
-        col = var.lower()
-        monthly_baseline = []
-
-        for m in range(1, 13):
-            vals = group[group["month"] == m][col].dropna().values
-            monthly_baseline.append(
-                trim_mean(vals, TRIM_RATIO) if len(vals) > 0 else np.nan
-            )
-
-        baseline_series[key][var] = np.array(monthly_baseline)
+with stage("baseline"):
+    baseline = {var: trimmed_monthly_mean(blocks[var]) for var in VARIABLES}
 
 # -----------------------------
 # DTW CALCULATION + BASELINE COLUMNS
 # -----------------------------
 print("Computing DTW distances...")
-results = []
-
-for (province, district, subdistrict), group in df.groupby(
-    ["province", "district", "subdistrict"]
-):
-    key = (province, district, subdistrict)
-
-    for year, year_group in group.groupby("year"):
-        year_group = year_group.sort_values("month")
-
-        row = {
-            "province": province,
-            "district": district,
-            "subdistrict": subdistrict,
-            "year": year
-        }
+with stage("dtw") as st:
+    # 1 แถวต่อ (ตำบล, ปี) ที่มีข้อมูล เรียงแบบเดียวกับ groupby เดิม
+    area_idx, year_idx = np.nonzero(present)
 
-        # ---- baseline (12 months) ----
-        for var in VARIABLES:
-            baseline_vals = baseline_series[key][var]
-            for m in range(12):
-                row[f"baseline_{var.lower()}_m{m+1:02d}"] = baseline_vals[m]
+    dtw_df = cube.areas.iloc[area_idx].reset_index(drop=True)
+    dtw_df["year"] = years[year_idx]
 
-        # ---- DTW ----
-        for var in VARIABLES:
-            col = var.lower()
-            X = year_group[col].values.astype(float)
-            Y = baseline_series[key][var].astype(float)
+    # ---- baseline (12 months) ----
+    for var in VARIABLES:
+        baseline_vals = baseline[var][area_idx]
+        for m in range(12):
+            dtw_df[f"baseline_{var.lower()}_m{m+1:02d}"] = baseline_vals[:, m]
 
-            if len(X) != 12 or np.isnan(X).any() or np.isnan(Y).any():
-                dist = np.nan
-            else:
-                dist = dtw_distance(X, Y)
+    # ---- DTW ----
+    for var in VARIABLES:
+        X_all = blocks[var][area_idx, year_idx].astype(float)
+        Y_all = baseline[var][area_idx]
+        valid = ~np.isnan(X_all).any(axis=1) & ~np.isnan(Y_all).any(axis=1)
 
-            row[f"dtw_{col}"] = dist
+        dist = np.full(len(dtw_df), np.nan)
+        for r in np.flatnonzero(valid):
+            dist[r] = dtw_distance(X_all[r], Y_all[r])
 
-        results.append(row)
+        dtw_df[f"dtw_{var.lower()}"] = dist
 
-dtw_df = pd.DataFrame(results)
+    st.rows(int(cube.present.sum()), len(dtw_df))
 
 # -----------------------------
 # LOCAL STATS (mean, std per subdistrict)
 # -----------------------------
 print("Computing local statistics...")
 
-for var in VARIABLES:
-    col = f"dtw_{var.lower()}"
+with stage("local_stats"):
+    for var in VARIABLES:
+        col = f"dtw_{var.lower()}"
 
-    stats = (
-        dtw_df
-        .groupby(["district", "subdistrict"])[col]
-        .agg(["mean", "std"])
-        .reset_index()
-        .rename(columns={
-            "mean": f"{col}_local_mean",
-            "std": f"{col}_local_std"
-        })
-    )
+        stats = (
+            dtw_df
+            .groupby(["district", "subdistrict"], observed=True)[col]
+            .agg(["mean", "std"])
+            .reset_index()
+            .rename(columns={
+                "mean": f"{col}_local_mean",
+                "std": f"{col}_local_std"
+            })
+        )
 
-    dtw_df = dtw_df.merge(stats, on=["district", "subdistrict"], how="left")
+        dtw_df = dtw_df.merge(stats, on=["district", "subdistrict"], how="left")
 
 # -----------------------------
 # NORMALIZATION (Z-score)
@@ -179,8 +176,10 @@ dtw_df = dtw_df.drop(columns=drop_cols)
 # -----------------------------
 # SAVE OUTPUT
 # -----------------------------
-Path(OUTPUT_PATH).parent.mkdir(parents=True, exist_ok=True)
-dtw_df.to_parquet(OUTPUT_PATH, index=False)
+with stage("write") as st:
+    Path(OUTPUT_PATH).parent.mkdir(parents=True, exist_ok=True)
+    dtw_df = write_parquet(dtw_df, OUTPUT_PATH)
+    st.wrote(OUTPUT_PATH, rows=len(dtw_df))
 
 print("DTW computation finished.")
 print(f"Saved to {OUTPUT_PATH}")
@@ -0,0 +1,246 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+from merged_manifest import from_period, period_label, parse_label, to_period
+
+# ----------------------------------------
+# CUBE STORE: (area, month, variable) float32 แบบ memory-mapped
+#
+#   <dataset>.cube/
+#     meta.json       shape, ตัวแปร, เดือนแรก, ที่มาของข้อมูล
+#     areas.parquet   province / district / subdistrict ตามลำดับ index ของ area
+#     by_area.f32     (area, month, var)  — 1 ตำบลทุกเดือน อ่านต่อเนื่อง (time series)
+#     by_month.f32    (month, area, var)  — 1 เดือนทุกตำบล อ่านต่อเนื่อง (แผนที่)
+#     present.u1      (area, month)       — แถวนี้มีใน parquet หรือไม่
+#
+# merge / fill stage เขียน cube ข้าง parquet ทุกครั้ง ผู้ใช้เปิดด้วย open_cube()
+# แล้ว slice ได้เลยโดยไม่ต้อง pivot ใน pandas (อ่านจาก disk เฉพาะส่วนที่ใช้)
+# ----------------------------------------
+AREA = ["province", "district", "subdistrict"]
+VERSION = 1
+DTYPE = np.float32
+
+
+def cube_path(parquet_path):
+    return os.path.splitext(str(parquet_path))[0] + ".cube"
+
+
+def _source_state(parquet_path):
+    st = os.stat(parquet_path)
+    return {"path": os.path.basename(str(parquet_path)), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+# ----------------------------------------
+# WRITE
+# ----------------------------------------
+def write_cube(df, path, variables, source=None):
+    """
+    long-format DataFrame (AREA + year + month + variables) → cube
+    area เรียงตามชื่อ (ลำดับเดียวกับ groupby ของ pandas) เดือนต่อเนื่องจากเดือนแรกถึงเดือนสุดท้าย
+    """
+    variables = [v for v in variables if v in df.columns]
+
+    area_keys = df[AREA].astype(str)
+    areas = area_keys.drop_duplicates().sort_values(AREA).reset_index(drop=True)
+    area_idx = pd.MultiIndex.from_frame(areas).get_indexer(pd.MultiIndex.from_frame(area_keys))
+
+    period = df["year"].to_numpy(int) * 12 + df["month"].to_numpy(int) - 1
+    start = int(period.min())
+    t_idx = period - start
+    n_area, n_time, n_var = len(areas), int(period.max()) - start + 1, len(variables)
+
+    values = np.full((n_area, n_time, n_var), np.nan, dtype=DTYPE)
+    values[area_idx, t_idx, :] = df[variables].to_numpy(DTYPE)
+    present = np.zeros((n_area, n_time), dtype=np.uint8)
+    present[area_idx, t_idx] = 1
+
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    areas.to_parquet(os.path.join(tmp, "areas.parquet"), index=False)
+    values.tofile(os.path.join(tmp, "by_area.f32"))
+    np.ascontiguousarray(values.transpose(1, 0, 2)).tofile(os.path.join(tmp, "by_month.f32"))
+    present.tofile(os.path.join(tmp, "present.u1"))
+
+    meta = {
+        "version": VERSION,
+        "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "shape": [n_area, n_time, n_var],
+        "variables": variables,
+        "start": period_label(start),
+        "source": _source_state(source) if source else None,
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # สลับทั้งโฟลเดอร์ — ผู้อ่านไม่เห็น cube ที่เขียนไม่ครบ
+    old = f"{path}.old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+    print(f"🧊 Cube saved: {path} {tuple(meta['shape'])}")
+    return path
+
+# ----------------------------------------
+# READ
+# ----------------------------------------
+class Cube:
+    """
+    เปิดแบบ lazy: memmap จะถูกสร้างเมื่อใช้ครั้งแรก
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.shape = tuple(self.meta["shape"])
+        self.variables = self.meta["variables"]
+        self.start = parse_label(self.meta["start"])
+        self._areas = None
+        self._lookup = None
+        self._maps = {}
+
+    def _map(self, name, shape, dtype=DTYPE):
+        if name not in self._maps:
+            self._maps[name] = np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+        return self._maps[name]
+
+    @property
+    def by_area(self):
+        return self._map("by_area.f32", self.shape)
+
+    @property
+    def by_month(self):
+        n_area, n_time, n_var = self.shape
+        return self._map("by_month.f32", (n_time, n_area, n_var))
+
+    @property
+    def present(self):
+        return self._map("present.u1", self.shape[:2], np.uint8)
+
+    @property
+    def areas(self):
+        if self._areas is None:
+            self._areas = pd.read_parquet(os.path.join(self.path, "areas.parquet"))
+        return self._areas
+
+    @property
+    def periods(self):
+        return np.arange(self.start, self.start + self.shape[1])
+
+    @property
+    def years(self):
+        return self.periods // 12
+
+    @property
+    def months(self):
+        return self.periods % 12 + 1
+
+    def is_fresh(self, parquet_path):
+        """
+        cube ตรงกับ parquet ปัจจุบัน (size/mtime ตอนเขียน) หรือไม่
+        """
+        source = self.meta.get("source")
+        return bool(source) and os.path.exists(parquet_path) and source == _source_state(parquet_path)
+
+    # ---- index lookups ----
+    def var_index(self, var):
+        return self.variables.index(var)
+
+    def area_index(self, province, district, subdistrict):
+        if self._lookup is None:
+            self._lookup = {tuple(a): i for i, a in enumerate(self.areas[AREA].itertuples(index=False))}
+        return self._lookup[(province, district, subdistrict)]
+
+    def time_index(self, year, month):
+        t = to_period(year, month) - self.start
+        if not 0 <= t < self.shape[1]:
+            raise KeyError(f"{year}-{month:02d} not in cube")
+        return t
+
+    # ---- slices (numpy views บน memmap) ----
+    def series(self, area, var=None):
+        """
+        time series ของ 1 ตำบล: (month, var) หรือ (month,) ถ้าระบุ var
+        area = index หรือ (province, district, subdistrict)
+        """
+        a = area if isinstance(area, (int, np.integer)) else self.area_index(*area)
+        block = self.by_area[a]
+        return block if var is None else block[:, self.var_index(var)]
+
+    def month_slice(self, year, month, var=None):
+        """
+        ค่าทุกตำบลของ 1 เดือน: (area, var) หรือ (area,) ถ้าระบุ var
+        """
+        block = self.by_month[self.time_index(year, month)]
+        return block if var is None else block[:, self.var_index(var)]
+
+    def window(self, start, end, var):
+        """
+        (area, month) ของ var ช่วง [start, end] (year, month) — สำหรับ heatmap
+        """
+        t0, t1 = self.time_index(*start), self.time_index(*end)
+        return self.by_area[:, t0:t1 + 1, self.var_index(var)]
+
+    def year_blocks(self, var):
+        """
+        (area, year, 12) ของ var โดยเติม NaN ให้ปีแรก/ปีสุดท้ายครบ 12 เดือน
+        คืนค่า (array, years)
+        """
+        first_year, first_month = from_period(self.start)
+        lead = first_month - 1
+        total = lead + self.shape[1]
+        n_years = -(-total // 12)
+        out = np.full((self.shape[0], n_years * 12), np.nan, dtype=DTYPE)
+        out[:, lead:total] = self.by_area[:, :, self.var_index(var)]
+        return out.reshape(self.shape[0], n_years, 12), np.arange(first_year, first_year + n_years)
+
+    def present_years(self):
+        """
+        (area, year) bool — ปีที่ตำบลนั้นมีอย่างน้อย 1 แถวใน parquet
+        """
+        lead = from_period(self.start)[1] - 1
+        total = lead + self.shape[1]
+        n_years = -(-total // 12)
+        out = np.zeros((self.shape[0], n_years * 12), dtype=bool)
+        out[:, lead:total] = self.present.astype(bool)
+        return out.reshape(self.shape[0], n_years, 12).any(axis=2)
+
+    def to_frame(self):
+        """
+        กลับเป็น long format (เฉพาะแถวที่มีใน parquet)
+        """
+        a, t = np.nonzero(self.present)
+        df = self.areas.iloc[a].reset_index(drop=True)
+        period = self.start + t
+        df["year"] = period // 12
+        df["month"] = period % 12 + 1
+        df[self.variables] = self.by_area[a, t, :]
+        return df
+
+
+def open_cube(path):
+    return Cube(path)
+
+
+def load_or_build(parquet_path, variables):
+    """
+    เปิด cube ข้าง parquet ถ้ายังตรงกับไฟล์ ไม่อย่างนั้นสร้างใหม่จาก parquet
+    """
+    path = cube_path(parquet_path)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        cube = Cube(path)
+        if cube.is_fresh(parquet_path) and all(v in cube.variables for v in variables):
+            return cube
+
+    print(f"🧊 Building cube from {parquet_path}")
+    df = pd.read_parquet(parquet_path)
+    write_cube(df, path, variables, source=parquet_path)
+    return Cube(path)
@@ -2,6 +2,10 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from instrumentation import init, stage
+from cube_store import cube_path, write_cube
+from pipeline_schema import write_parquet
+
 MERGED = Path("gee-pipeline/outputs/merged/merged_dataset.parquet")
 OUT = Path("gee-pipeline/outputs/merged/merged_dataset_FILLED.parquet")
 
@@ -10,68 +14,87 @@ TIME = ["year", "month"]
 VARS = ["NDVI", "LST", "RAINFALL", "SOILMOISTURE", "FIRECOUNT"]
 THRESHOLD = 2
 
-df = pd.read_parquet(MERGED)
+init("final_fill_after_merge")
+
+with stage("load") as st:
+    df = pd.read_parquet(MERGED)
+    st.read(MERGED, rows=len(df))
 
 # ---------------------------------------
 # Build full time grid (สำคัญมาก)
 # ---------------------------------------
-df["date"] = pd.to_datetime(
-    df["year"].astype(str) + "-" + df["month"].astype(str) + "-01"
-)
+with stage("grid") as st:
+    st.rows(rows_in=len(df))
+    df["date"] = pd.to_datetime(
+        df["year"].astype(str) + "-" + df["month"].astype(str) + "-01"
+    )
 
-full_dates = pd.date_range(df["date"].min(), df["date"].max(), freq="MS")
-areas = df[KEYS].drop_duplicates()
+    full_dates = pd.date_range(df["date"].min(), df["date"].max(), freq="MS")
+    areas = df[KEYS].drop_duplicates()
 
-grid = pd.DataFrame(
-    [
-        dict(zip(KEYS, a)) | {"date": d}
-        for a in areas.values
-        for d in full_dates
-    ]
-)
+    grid = pd.DataFrame(
+        [
+            dict(zip(KEYS, a)) | {"date": d}
+            for a in areas.values
+            for d in full_dates
+        ]
+    )
 
-df = grid.merge(df, on=KEYS + ["date"], how="left")
-df["year"] = df["date"].dt.year
-df["month"] = df["date"].dt.month
+    df = grid.merge(df, on=KEYS + ["date"], how="left")
+    df["year"] = df["date"].dt.year
+    df["month"] = df["date"].dt.month
+    st.rows(rows_out=len(df))
 
 # ---------------------------------------
 # FINAL FILL LOGIC
 # ---------------------------------------
-for var in VARS:
-    if var not in df.columns:
-        continue
+with stage("fill"):
+    for var in VARS:
+        if var not in df.columns:
+            continue
 
-    print(f"💉 FILL {var}")
+        print(f"💉 FILL {var}")
 
-    def fill_group(x):
-        x = x.sort_values("date")
+        def fill_group(x):
+            x = x.sort_values("date")
 
-        # 1) interpolate (time)
-        x[var] = x[var].interpolate(limit=THRESHOLD - 1)
+            # 1) interpolate (time)
+            x[var] = x[var].interpolate(limit=THRESHOLD - 1)
 
-        # 2) month climatology (same area)
-        miss = x[var].isna()
-        if miss.any():
-            clim = x.groupby("month")[var].mean()
-            x.loc[miss, var] = x.loc[miss, "month"].map(clim)
+            # 2) month climatology (same area)
+            miss = x[var].isna()
+            if miss.any():
+                clim = x.groupby("month")[var].mean()
+                x.loc[miss, var] = x.loc[miss, "month"].map(clim)
 
-        return x
+            return x
 
-    df = df.groupby(KEYS, group_keys=False).apply(fill_group)
+        with stage(var) as st:
+            st.rows(rows_in=len(df))
 
-    # 3) district mean
-    df[var] = df.groupby(["province", "district"])[var].transform(
-        lambda x: x.fillna(x.mean())
-    )
+            with stage("interpolate_climatology"):
+                df = df.groupby(KEYS, group_keys=False, observed=True).apply(fill_group)
 
-    # 4) province mean
-    df[var] = df.groupby("province")[var].transform(
-        lambda x: x.fillna(x.mean())
-    )
+            with stage("area_means"):
+                # 3) district mean
+                df[var] = df.groupby(["province", "district"], observed=True)[var].transform(
+                    lambda x: x.fillna(x.mean())
+                )
+
+                # 4) province mean
+                df[var] = df.groupby("province", observed=True)[var].transform(
+                    lambda x: x.fillna(x.mean())
+                )
+
+                # 5) global mean (กันสุดท้าย)
+                df[var] = df[var].fillna(df[var].mean())
 
-    # 5) global mean (กันสุดท้าย)
-    df[var] = df[var].fillna(df[var].mean())
+            st.rows(rows_out=len(df))
 
-df.drop(columns="date").to_parquet(OUT, index=False)
+with stage("write") as st:
+    df = df.drop(columns="date")
+    df = write_parquet(df, OUT)
+    write_cube(df, cube_path(OUT), VARS, source=OUT)
+    st.wrote(OUT, rows=len(df))
 
 print("✅ FINAL FILL COMPLETED")
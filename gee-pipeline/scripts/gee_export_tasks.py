@@ -4,6 +4,8 @@ import os
 import time
 from datetime import datetime
 
+from instrumentation import init, stage
+
 # -----------------------------
 # Load service account
 # -----------------------------
@@ -175,5 +177,7 @@ def run_all_exports():
 # Run
 # -----------------------------
 if __name__ == "__main__":
+    init("gee_export_tasks")
     print("🚀 Exporting FireCount ONLY (FIXED)")
-    run_all_exports()
+    with stage("submit") as st:
+        st.rows(rows_out=len(run_all_exports()))
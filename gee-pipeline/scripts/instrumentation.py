@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ----------------------------------------
+# INSTRUMENTATION (เวลา / CPU / หน่วยความจำ / rows / bytes ต่อ stage)
+#
+#   from instrumentation import init, stage
+#   init("merge")
+#   with stage("load") as s:
+#       df = pd.read_parquet(path)
+#       s.read(path, rows=len(df))
+#
+# ทุก stage ถูกเขียนเป็น 1 บรรทัด JSON ใน run_log.jsonl และพิมพ์ตารางสรุป
+# ตอนจบ script (เทียบ wall time กับ run ก่อนหน้า)
+# run_pipeline.py ส่ง PIPELINE_RUN_ID ให้ script ลูก ทุก stage ของ run เดียวกัน
+# จึงรวมกันได้
+#
+# เขียน log เฉพาะ script ที่เรียก init() เอง (entry point ของ pipeline)
+# ถ้าไม่ได้ init, stage() ยังวัดได้แต่ไม่เขียนลง log (เช่น validator / import จาก notebook)
+# log เกิน PIPELINE_RUN_LOG_MAX_MB → ย้ายไป run_log.jsonl.1 (เก็บไว้ 1 ไฟล์) ตอน init
+# ----------------------------------------
+LOG_PATH = Path(os.environ.get("PIPELINE_RUN_LOG", "gee-pipeline/outputs/state/run_log.jsonl"))
+ROTATED_PATH = LOG_PATH.with_name(LOG_PATH.name + ".1")
+MAX_LOG_BYTES = int(float(os.environ.get("PIPELINE_RUN_LOG_MAX_MB", "16")) * 1024 * 1024)
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+SAMPLE_SECONDS = 0.05
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+_lock = threading.Lock()
+_local = threading.local()
+_open = set()
+_run = {}
+
+# ----------------------------------------
+# MEMORY / CPU PROBES
+# ----------------------------------------
+def current_rss():
+    """
+    RSS ปัจจุบัน (bytes) จาก /proc/self/statm — None ถ้าไม่ใช่ Linux
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss():
+    """
+    high-water mark ของทั้ง process (ใช้แทนเมื่ออ่าน /proc ไม่ได้)
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def children_cpu():
+    """
+    CPU ของ process ลูกที่จบแล้ว (ProcessPoolExecutor, subprocess)
+    """
+    if resource is None:
+        return 0.0
+    r = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return r.ru_utime + r.ru_stime
+
+
+def _sampler():
+    while True:
+        time.sleep(SAMPLE_SECONDS)
+        rss = current_rss()
+        if rss is None:
+            return
+        with _lock:
+            for st in _open:
+                st.peak = max(st.peak, rss)
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+# ----------------------------------------
+# STAGE
+# ----------------------------------------
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak = 0
+
+    def read(self, *paths, rows=None):
+        """
+        bytes = ขนาดไฟล์บน disk (อ่านบางคอลัมน์ก็นับทั้งไฟล์)
+        """
+        self.bytes_read += sum(_size(p) for p in paths)
+        if rows is not None:
+            self.rows_in += int(rows)
+
+    def wrote(self, *paths, rows=None):
+        self.bytes_written += sum(_size(p) for p in paths)
+        if rows is not None:
+            self.rows_out += int(rows)
+
+    def rows(self, rows_in=None, rows_out=None):
+        if rows_in is not None:
+            self.rows_in += int(rows_in)
+        if rows_out is not None:
+            self.rows_out += int(rows_out)
+
+
+def _write(record):
+    with _lock:
+        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOG_PATH, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def rotate_log():
+    """
+    log ใหญ่เกิน MAX_LOG_BYTES → ย้ายไป ROTATED_PATH (ทับไฟล์เก่า) แล้วเริ่มไฟล์ใหม่
+    """
+    with _lock:
+        if _size(LOG_PATH) > MAX_LOG_BYTES:
+            os.replace(LOG_PATH, ROTATED_PATH)
+
+
+def stage(name):
+    """
+    วัด stage / sub-step — stage ซ้อนกันได้ ชื่อจะเป็น "parent/child"
+    ชื่อซ้ำ (เช่น ต่อไฟล์) ถูกรวมในตารางสรุป
+    เขียนลง log เฉพาะเมื่อ script เรียก init() แล้ว
+    """
+    return _measure(name, nested=True)
+
+
+@contextmanager
+def _measure(name, nested):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    st = Stage(f"{stack[-1].name}/{name}" if nested and stack else name)
+    st.peak = current_rss() or 0
+    with _lock:
+        _open.add(st)
+    if nested:
+        stack.append(st)
+
+    started = datetime.now(timezone.utc)
+    wall0, cpu0, child0 = time.perf_counter(), time.process_time(), children_cpu()
+    status = "ok"
+    try:
+        yield st
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        wall = time.perf_counter() - wall0
+        cpu = time.process_time() - cpu0 + children_cpu() - child0
+        if nested:
+            stack.pop()
+        if status == "error" and _run:
+            _run["failed"] = True
+        with _lock:
+            _open.discard(st)
+        peak = max(st.peak, current_rss() or max_rss())
+
+        if _run:
+            _write({
+                "run_id": _run["run_id"],
+                "script": _run["script"],
+                "stage": st.name,
+                "started": started.isoformat(timespec="seconds"),
+                "wall_s": round(wall, 3),
+                "cpu_s": round(cpu, 3),
+                "peak_rss_mb": round(peak / _MB, 1),
+                "rows_in": st.rows_in,
+                "rows_out": st.rows_out,
+                "bytes_read": st.bytes_read,
+                "bytes_written": st.bytes_written,
+                "status": status,
+            })
+
+# ----------------------------------------
+# RUN
+# ----------------------------------------
+def init(script, scope="script"):
+    """
+    เริ่มวัดทั้ง script: บันทึก stage "total" และพิมพ์ตารางสรุปตอน exit
+    scope="run" = สรุปทุก script ที่มี run_id เดียวกัน (ใช้ใน run_pipeline)
+    """
+    if _run:
+        return _run["run_id"]
+
+    rotate_log()
+    run_id = os.environ.get(RUN_ID_ENV)
+    if not run_id:
+        run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{os.getpid()}"
+    _run.update(script=script, run_id=run_id, scope=scope)
+
+    total = _measure("total", nested=False)
+    total.__enter__()
+
+    hook = sys.excepthook
+
+    def excepthook(*exc):
+        _run["failed"] = True
+        hook(*exc)
+
+    def finish():
+        if _run.get("failed"):
+            total.__exit__(RuntimeError, RuntimeError(), None)
+        else:
+            total.__exit__(None, None, None)
+        print_summary(run_id, None if scope == "run" else script)
+
+    sys.excepthook = excepthook
+    atexit.register(finish)
+    threading.Thread(target=_sampler, daemon=True).start()
+    return run_id
+
+# ----------------------------------------
+# SUMMARY
+# ----------------------------------------
+def read_log(paths=(ROTATED_PATH, LOG_PATH)):
+    """
+    record ทั้งหมด (ไฟล์ที่ rotate แล้ว + ไฟล์ปัจจุบัน) เรียงตามเวลาที่เขียน
+    """
+    records = []
+    for path in paths:
+        if os.path.exists(path):
+            with open(path) as f:
+                records += [json.loads(line) for line in f if line.strip()]
+    return records
+
+
+def aggregate(records):
+    """
+    รวม record ต่อ (script, stage): เวลา/rows/bytes รวมกัน, peak ใช้ค่าสูงสุด
+    """
+    out = {}
+    for r in records:
+        key = (r["script"], r["stage"])
+        a = out.setdefault(key, defaultdict(float, n=0, status="ok"))
+        a["n"] += 1
+        for col in ["wall_s", "cpu_s", "rows_in", "rows_out", "bytes_read", "bytes_written"]:
+            a[col] += r[col]
+        a["peak_rss_mb"] = max(a["peak_rss_mb"], r["peak_rss_mb"])
+        if r["status"] != "ok":
+            a["status"] = r["status"]
+    return out
+
+
+def previous_wall(records, run_id):
+    """
+    wall time ของ run ล่าสุดก่อนหน้า ต่อ (script, stage)
+    """
+    prev = defaultdict(lambda: defaultdict(float))
+    for r in records:
+        if r["run_id"] != run_id:
+            prev[(r["script"], r["stage"])][r["run_id"]] += r["wall_s"]
+    return {key: runs[max(runs)] for key, runs in prev.items()}
+
+
+def print_summary(run_id, script=None):
+    records = read_log()
+    if script is not None:
+        records = [r for r in records if r["script"] == script]
+    current = aggregate(r for r in records if r["run_id"] == run_id)
+    if not current:
+        return
+    prev = previous_wall(records, run_id)
+
+    labels = {key: key[1] if script is not None else f"{key[0]}:{key[1]}" for key in current}
+    width = max(len(label) for label in labels.values())
+
+    print(f"\n⏱️ RUN SUMMARY ({run_id})")
+    print(
+        f"   {'stage':<{width}} {'n':>4} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} "
+        f"{'rows in':>10} {'rows out':>10} {'read MB':>9} {'write MB':>9} {'vs prev':>8}"
+    )
+    for key, a in current.items():
+        before = prev.get(key)
+        delta = f"{(a['wall_s'] - before) / before:+.0%}" if before else "-"
+        flag = "" if a["status"] == "ok" else " ❌"
+        print(
+            f"   {labels[key]:<{width}} {a['n']:>4} {a['wall_s']:>9.1f} {a['cpu_s']:>9.1f} {a['peak_rss_mb']:>9.0f} "
+            f"{int(a['rows_in']):>10} {int(a['rows_out']):>10} {a['bytes_read'] / _MB:>9.1f} "
+            f"{a['bytes_written'] / _MB:>9.1f} {delta:>8}{flag}"
+        )
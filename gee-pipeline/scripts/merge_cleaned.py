@@ -2,6 +2,11 @@ import os
 import pandas as pd
 from functools import reduce
 
+from merged_manifest import write_manifest
+from cube_store import cube_path, write_cube
+from pipeline_schema import write_parquet
+from instrumentation import init, stage
+
 # ----------------------------------------
 # CONFIG
 # ----------------------------------------
@@ -10,38 +15,60 @@ OUTPUT_DIR = "gee-pipeline/outputs/merged"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 KEYS = ["province", "district", "subdistrict", "year", "month"]
+VARS = ["NDVI", "LST", "RAINFALL", "SOILMOISTURE", "FIRECOUNT"]
+
+# โฟลเดอร์ของ export แบบ combined: 1 ไฟล์/เดือน มีหลายคอลัมน์ตัวแปร
+COMBINED = "COMBINED"
 
+init("merge_cleaned")
 print("🔗 Merging FILLED parquet files...")
 
-variable_dfs = {}
+variable_parts = {}
 
 # --------------------------------------------------
 # 1) Load & concat per variable
 # --------------------------------------------------
-for variable in os.listdir(FILL_DIR):
-    var_dir = os.path.join(FILL_DIR, variable)
-    if not os.path.isdir(var_dir):
-        continue
+with stage("load") as st:
+    for variable in sorted(os.listdir(FILL_DIR)):
+        var_dir = os.path.join(FILL_DIR, variable)
+        if not os.path.isdir(var_dir):
+            continue
+
+        files = [
+            os.path.join(var_dir, f)
+            for f in os.listdir(var_dir)
+            if f.endswith(".parquet")
+        ]
+
+        if len(files) == 0:
+            print(f"⚠️ Skip {variable} — no parquet files")
+            continue
+
+        dfs = [pd.read_parquet(f) for f in files]
+        st.read(*files, rows=sum(len(df) for df in dfs))
 
-    files = [
-        os.path.join(var_dir, f)
-        for f in os.listdir(var_dir)
-        if f.endswith(".parquet")
-    ]
+        if variable == COMBINED:
+            # split combined layout back into one frame per variable
+            for df in dfs:
+                for var in VARS:
+                    if var in df.columns:
+                        variable_parts.setdefault(var, []).append(df[KEYS + [var]])
+            print(f"📦 {variable}: {len(dfs)} files")
+            continue
 
-    if len(files) == 0:
-        print(f"⚠️ Skip {variable} — no parquet files")
-        continue
+        # keep only merge keys + variable
+        keep_cols = KEYS + [variable]
+        variable_parts.setdefault(variable, []).extend(df[keep_cols] for df in dfs)
 
-    dfs = [pd.read_parquet(f) for f in files]
-    df_var = pd.concat(dfs, ignore_index=True)
+    variable_dfs = {}
+    for variable, parts in variable_parts.items():
+        df_var = pd.concat(parts, ignore_index=True)
 
-    # keep only merge keys + variable
-    keep_cols = KEYS + [variable]
-    df_var = df_var[keep_cols]
+        # เดือนเดียวกันอาจมีทั้งไฟล์แยกตัวแปรและไฟล์ combined
+        df_var = df_var.drop_duplicates(subset=KEYS, keep="last")
 
-    variable_dfs[variable] = df_var
-    print(f"📦 {variable}: {len(df_var)} rows")
+        variable_dfs[variable] = df_var
+        print(f"📦 {variable}: {len(df_var)} rows")
 
 # --------------------------------------------------
 # 2) Merge across variables
@@ -49,14 +76,20 @@ for variable in os.listdir(FILL_DIR):
 if len(variable_dfs) == 0:
     raise RuntimeError("❌ No filled variables found to merge!")
 
-df_merged = reduce(
-    lambda l, r: pd.merge(l, r, on=KEYS, how="outer"),
-    variable_dfs.values()
-)
+with stage("merge") as st:
+    df_merged = reduce(
+        lambda l, r: pd.merge(l, r, on=KEYS, how="outer"),
+        variable_dfs.values()
+    )
 
-df_merged = df_merged.sort_values(KEYS)
+    df_merged = df_merged.sort_values(KEYS)
+    st.rows(sum(len(df) for df in variable_dfs.values()), len(df_merged))
 
 output_path = os.path.join(OUTPUT_DIR, "merged_dataset.parquet")
-df_merged.to_parquet(output_path, index=False)
+with stage("write") as st:
+    df_merged = write_parquet(df_merged, output_path)
+    write_manifest(df_merged, output_path, VARS)
+    write_cube(df_merged, cube_path(output_path), VARS, source=output_path)
+    st.wrote(output_path, rows=len(df_merged))
 
 print(f"✅ Merge completed: {output_path}")
@@ -0,0 +1,128 @@
+import os
+import json
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# ----------------------------------------
+# Manifest เล็กๆ ที่ merge stage เขียนไว้ข้าง merged_dataset.parquet
+# ให้ขั้นตอนอื่น (เช่น export incremental) รู้ว่ามีเดือนไหนแล้ว
+# โดยไม่ต้องโหลด dataset ทั้งก้อน
+#
+# manifest จำ size ของไฟล์ + จำนวนแถวใน footer ของ parquet ตอนเขียน
+# (ไม่ใช้ mtime — หลัง git checkout mtime ไม่มีความหมาย)
+# ----------------------------------------
+
+def manifest_path(parquet_path):
+    return os.path.splitext(parquet_path)[0] + "_manifest.json"
+
+
+def to_period(year, month):
+    return int(year) * 12 + int(month) - 1
+
+
+def from_period(period):
+    return period // 12, period % 12 + 1
+
+
+def period_label(period):
+    year, month = from_period(period)
+    return f"{year}-{month:02d}"
+
+
+def parse_label(label):
+    year, month = label.split("-")
+    return to_period(year, month)
+
+
+def parquet_state(parquet_path):
+    """
+    size ของไฟล์ + จำนวนแถวจาก footer (อ่านแค่ metadata)
+    """
+    return {"size": os.path.getsize(parquet_path), "rows": pq.ParquetFile(parquet_path).metadata.num_rows}
+
+
+def write_manifest(df, parquet_path, variables):
+    """
+    บันทึกจำนวนแถว เดือนล่าสุด และรายการเดือนที่มีค่า (non-null) ของแต่ละตัวแปร
+    เรียกหลังเขียน parquet แล้ว (เก็บ size/จำนวนแถวของไฟล์ไว้ตรวจตอนอ่าน)
+    """
+    period = df["year"].astype(int) * 12 + df["month"].astype(int) - 1
+
+    manifest = {
+        "dataset": os.path.basename(parquet_path),
+        "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": int(len(df)),
+        "source": parquet_state(parquet_path),
+        "latest": period_label(int(period.max())),
+        "variables": {},
+    }
+
+    for var in variables:
+        if var not in df.columns:
+            continue
+        have = sorted(int(p) for p in period[df[var].notna()].unique())
+        if not have:
+            continue
+        manifest["variables"][var] = {
+            "first": period_label(have[0]),
+            "last": period_label(have[-1]),
+            "periods": [period_label(p) for p in have],
+        }
+
+    path = manifest_path(parquet_path)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+
+def read_manifest(parquet_path):
+    """
+    คืนค่า manifest ถ้ามีและตรงกับ parquet ปัจจุบัน (size + จำนวนแถวใน footer) ไม่งั้นคืน None
+    """
+    path = manifest_path(parquet_path)
+    if not os.path.exists(path) or not os.path.exists(parquet_path):
+        return None
+
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("source") != parquet_state(parquet_path):
+        print("⚠️ Manifest does not match dataset — ignoring")
+        return None
+    return manifest
+
+
+def latest_period(parquet_path):
+    """
+    เดือนล่าสุดของ dataset: manifest → อ่านแค่คอลัมน์ year/month
+    (merged เรียงตามพื้นที่ ทุก row group มีทุกปี/เดือน → footer statistics ช่วยไม่ได้)
+    """
+    manifest = read_manifest(parquet_path)
+    if manifest is not None:
+        return parse_label(manifest["latest"])
+
+    df = pd.read_parquet(parquet_path, columns=["year", "month"])
+    return int((df["year"].astype(int) * 12 + df["month"].astype(int) - 1).max())
+
+
+def available_periods(parquet_path, variables):
+    """
+    คืนค่า {variable: set(period)} ของเดือนที่มีข้อมูลแล้ว
+    """
+    manifest = read_manifest(parquet_path)
+    if manifest is not None:
+        return {
+            var: {parse_label(p) for p in manifest["variables"].get(var, {}).get("periods", [])}
+            for var in variables
+        }
+
+    cols = set(pq.read_schema(parquet_path).names)
+    var_cols = [v for v in variables if v in cols]
+    df = pd.read_parquet(parquet_path, columns=["year", "month"] + var_cols)
+    period = df["year"].astype(int) * 12 + df["month"].astype(int) - 1
+
+    return {
+        var: set(int(p) for p in period[df[var].notna()].unique()) if var in df.columns else set()
+        for var in variables
+    }
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# ----------------------------------------
+# Outlier filter ที่ดูทั้ง "ฤดูกาล" และ "พื้นที่ข้างเคียง"
+#
+#   seasonal  เทียบกับประวัติของตำบลเดียวกันในเดือนเดียวกัน (ทุกปี)
+#   spatial   เทียบกับตำบลอื่นในอำเภอเดียวกัน เดือนเดียวกัน
+#
+# ค่าจะถูกตัดก็ต่อเมื่อผิดปกติทั้งสองแบบ — อำเภอที่น้ำท่วมทั้งอำเภอ
+# (ผิดจากประวัติ แต่เหมือนเพื่อนบ้าน) จะไม่ถูกตัด
+# ถ้าข้อมูลฝั่งไหนไม่พอ ใช้อีกฝั่งเดียว ถ้าไม่พอทั้งคู่ใช้ IQR ของทั้งเดือน
+#
+# state แบ่ง partition ตามเดือนปฏิทิน (อ่าน/เขียนเฉพาะเดือนที่มีข้อมูลใหม่):
+#   outputs/state/outliers/<var>/month=MM/history.parquet     ค่าก่อนตัดของทุกปี
+#   outputs/state/outliers/<var>/month=MM/quantiles.parquet   q1/q2/q3/n ต่อตำบล
+# ตัดค่าเดือนใหม่ด้วย quantile เดิมก่อน แล้วค่อยเพิ่มค่าเข้า history
+# fence ของ seasonal เป็นแบบ leave-one-year-out (ค่าของปีอื่นทั้งใน history และในชุดที่กำลังตัด)
+# → clean ครั้งแรกหรือ re-clean ทุกปีพร้อมกัน (--force / กฎเปลี่ยน) ก็ยังเทียบกับปีอื่นได้
+# ----------------------------------------
+STATE_DIR = Path("gee-pipeline/outputs/state/outliers")
+
+AREA = ["province", "district", "subdistrict"]
+NEIGHBOURS = ["province", "district"]
+TIME = ["year", "month"]
+
+K = 1.5
+MIN_HISTORY = 4
+MIN_NEIGHBOURS = 4
+
+
+def partition_dir(var, month):
+    return STATE_DIR / var / f"month={int(month):02d}"
+
+
+def history_path(var, month):
+    return partition_dir(var, month) / "history.parquet"
+
+
+def quantiles_path(var, month):
+    return partition_dir(var, month) / "quantiles.parquet"
+
+
+DTYPES = {"year": "int64", "month": "int64", "value": "float64", "q1": "float64", "q2": "float64", "q3": "float64", "n": "int64"}
+
+
+def _empty(columns):
+    return pd.DataFrame({c: pd.Series(dtype=DTYPES.get(c, "object")) for c in columns})
+
+
+def _read(path, columns):
+    if path.exists():
+        return pd.read_parquet(path)
+    return _empty(columns)
+
+
+def _migrate(var):
+    """
+    state แบบเดิม (<var>_history.parquet ไฟล์เดียว) → partition ต่อเดือนปฏิทิน (ทำครั้งเดียว)
+    """
+    legacy = STATE_DIR / f"{var}_history.parquet"
+    if not legacy.exists():
+        return
+    history = pd.read_parquet(legacy)
+    for month, part in history.groupby("month"):
+        partition_dir(var, month).mkdir(parents=True, exist_ok=True)
+        part.to_parquet(history_path(var, month), index=False)
+        quartiles(part, AREA + ["month"]).to_parquet(quantiles_path(var, month), index=False)
+    legacy.unlink()
+    (STATE_DIR / f"{var}_quantiles.parquet").unlink(missing_ok=True)
+    print(f"📦 {var}: outlier state split into {history['month'].nunique()} monthly partitions")
+
+
+def load_partition(var, month):
+    history = _read(history_path(var, month), AREA + TIME + ["value"])
+    table = _read(quantiles_path(var, month), AREA + ["month", "q1", "q2", "q3", "n"])
+    return history, table
+
+
+def _concat(old, new):
+    return pd.concat([old, new], ignore_index=True) if len(old) else new.reset_index(drop=True)
+
+
+def _in_areas(df, areas):
+    return pd.MultiIndex.from_frame(df[AREA].astype(str)).isin(pd.MultiIndex.from_frame(areas[AREA].astype(str)))
+
+
+def quartiles(df, keys, value="value"):
+    """
+    q1 / median / q3 / n ต่อกลุ่ม (vectorized groupby) — ไม่มีข้อมูลคืนตารางว่างที่มี column ครบ
+    """
+    if df[value].notna().sum() == 0:
+        return _empty(keys + ["q1", "q2", "q3", "n"])
+    g = df.groupby(keys, observed=True)[value]
+    q = g.quantile([0.25, 0.5, 0.75]).unstack()
+    q.columns = ["q1", "q2", "q3"]
+    q["n"] = g.count()
+    return q.reset_index()
+
+
+def fences(var, frame):
+    """
+    quantile table ของ (ตำบล, เดือนปฏิทิน, ปี) แบบ leave-one-year-out — ค่าที่กำลังตัดไม่อยู่ใน fence ของตัวเอง
+    pool = history ของปีที่ไม่ได้รันซ้ำ + ค่าใหม่ใน frame (ปีที่รันซ้ำใช้ค่าใหม่แทนค่าเดิม)
+    เดือนปกติ (ปีใหม่ 1 ปี) ใช้ quantiles.parquet ที่เก็บไว้ได้เลย
+    """
+    _migrate(var)
+    new = frame[AREA + TIME + [var]].rename(columns={var: "value"}).dropna(subset=["value"])
+    tables = []
+    for month, part in new.groupby("month"):
+        history, table = load_partition(var, month)
+        years = part["year"].unique()
+        rerun = history["year"].isin(years).to_numpy()
+        if len(years) == 1 and not rerun.any():
+            tables.append(table.assign(year=int(years[0])))
+            continue
+
+        pool = _concat(history[~rerun], part)
+        pool = pool[_in_areas(pool, part)]
+        for year in years:
+            tables.append(quartiles(pool[pool["year"] != year], AREA + ["month"]).assign(year=int(year)))
+
+    tables = [t for t in tables if len(t)]
+    if not tables:
+        return _empty(AREA + TIME + ["q1", "q2", "q3", "n"])
+    return pd.concat(tables, ignore_index=True)
+
+
+def update_state(var, frame):
+    """
+    เพิ่มค่าเดือนใหม่ (ก่อนตัด outlier) เข้า history ของ partition เดือนปฏิทินนั้น
+    แล้วคำนวณ quantile ใหม่เฉพาะตำบลที่ถูกแตะ — partition อื่นไม่ถูกอ่าน/เขียน
+    """
+    _migrate(var)
+    new = frame[AREA + TIME + [var]].rename(columns={var: "value"})
+    new = new.dropna(subset=["value"])
+
+    for month, part in new.groupby("month"):
+        partition_dir(var, month).mkdir(parents=True, exist_ok=True)
+        history, table = load_partition(var, month)
+        history = _concat(history, part)
+        history = history.drop_duplicates(subset=AREA + TIME, keep="last")
+        history.to_parquet(history_path(var, month), index=False)
+
+        touched = part[AREA].drop_duplicates()
+        fresh = quartiles(history[_in_areas(history, touched)], AREA + ["month"])
+        table = _concat(table[~_in_areas(table, touched)], fresh)
+        table.to_parquet(quantiles_path(var, month), index=False)
+
+
+def _outside(v, q1, q3):
+    iqr = q3 - q1
+    return (v < q1 - K * iqr) | (v > q3 + K * iqr)
+
+
+def score(frame, var, table):
+    """
+    คืนค่า boolean array (ยาวเท่า frame) ว่าแถวไหนเป็น outlier
+    frame อาจเป็นไฟล์เดียวหรือทั้ง partition ก็ได้ (table จาก fences(): ต่อตำบล + year + month)
+    """
+    df = frame[AREA + TIME + [var]].reset_index(drop=True)
+    v = df[var].to_numpy(float)
+
+    own = df[AREA + TIME].merge(table, on=AREA + TIME, how="left")
+    seasonal = _outside(v, own["q1"].to_numpy(float), own["q3"].to_numpy(float))
+    has_history = own["n"].to_numpy(float, na_value=0) >= MIN_HISTORY
+
+    nb = quartiles(df.rename(columns={var: "value"}), NEIGHBOURS + TIME)
+    near = df[NEIGHBOURS + TIME].merge(nb, on=NEIGHBOURS + TIME, how="left")
+    spatial = _outside(v, near["q1"].to_numpy(float), near["q3"].to_numpy(float))
+    has_neighbours = near["n"].fillna(0).to_numpy() >= MIN_NEIGHBOURS
+
+    whole = quartiles(df.rename(columns={var: "value"}), TIME)
+    month = df[TIME].merge(whole, on=TIME, how="left")
+    global_ = _outside(v, month["q1"].to_numpy(float), month["q3"].to_numpy(float))
+
+    flag = np.select(
+        [has_history & has_neighbours, has_history, has_neighbours],
+        [seasonal & spatial, seasonal, spatial],
+        default=global_,
+    )
+    return flag & ~np.isnan(v)
+
+
+def filter_partition(frame, var):
+    """
+    score กับ state เดิม → ตั้งค่า outlier เป็น NaN → แล้วค่อย update state
+    คืนค่า (Series ที่ clean แล้ว, จำนวนที่ถูกตัด)
+    """
+    flag = score(frame, var, fences(var, frame))
+    update_state(var, frame)
+    values = frame[var].mask(flag)
+    return values, int(flag.sum())
@@ -0,0 +1,152 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ----------------------------------------
+# DTYPE POLICY ของ output ทุก stage (clean / merge / fill / DTW)
+#
+#   province / district / subdistrict  category (parquet dictionary)
+#   year                               int16
+#   month                              int8
+#   ค่าตัวแปร / baseline / dtw / z     float32
+#   *_flag                             int8
+#
+# Round-trip guarantee (ตรวจใน memory ก่อนเขียน และตรวจ schema ของไฟล์หลังเขียน):
+#   - key, year, month, flag ได้ค่าเดิมทุกแถว (ไม่มีการปัด/ตัด)
+#   - ค่า float ต่างจาก float64 เดิมไม่เกิน relative 2^-24 (ปัดเป็น float32 ที่ใกล้ที่สุด)
+#     NaN ยังเป็น NaN และค่าที่เกินช่วง float32 จะ error แทนที่จะกลายเป็น inf
+# ----------------------------------------
+AREA = ["province", "district", "subdistrict"]
+YEAR_DTYPE = "int16"
+MONTH_DTYPE = "int8"
+VALUE_DTYPE = "float32"
+FLAG_DTYPE = "int8"
+
+FLOAT_RTOL = 2.0 ** -24
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+FLOAT32_TINY = float(np.finfo(np.float32).tiny)
+
+
+def is_flag(column):
+    return column.endswith("_flag")
+
+
+def compact(df):
+    """
+    คืนค่า DataFrame ใหม่ตาม dtype policy (ไม่แก้ df เดิม)
+    """
+    out = df.copy()
+    for col in out.columns:
+        s = out[col]
+        if col in AREA:
+            out[col] = s.astype("category")
+        elif col == "year":
+            out[col] = s.astype(YEAR_DTYPE)
+        elif col == "month":
+            out[col] = s.astype(MONTH_DTYPE)
+        elif is_flag(col):
+            out[col] = s.astype(FLAG_DTYPE)
+        elif pd.api.types.is_float_dtype(s):
+            out[col] = s.astype(VALUE_DTYPE)
+    return out
+
+
+def check_round_trip(original, compacted):
+    """
+    ValueError ถ้า compact ทำให้ค่าผิดไปเกิน guarantee ข้างบน
+    """
+    for col in compacted.columns:
+        a, b = original[col], compacted[col]
+        if col in AREA:
+            same = (a.astype(str).to_numpy() == b.astype(str).to_numpy()).all()
+        elif col in ("year", "month") or is_flag(col):
+            if a.isna().any():
+                raise ValueError(f"❌ {col}: missing values cannot be stored as {b.dtype}")
+            same = (a.to_numpy(np.int64) == b.to_numpy(np.int64)).all()
+        elif b.dtype == VALUE_DTYPE and a.dtype != VALUE_DTYPE:
+            x = a.to_numpy(float)
+            if np.nanmax(np.abs(x), initial=0.0) > FLOAT32_MAX:
+                raise ValueError(f"❌ {col}: values outside float32 range")
+            same = np.allclose(b.to_numpy(float), x, rtol=FLOAT_RTOL, atol=FLOAT32_TINY, equal_nan=True)
+        else:
+            continue
+        if not same:
+            raise ValueError(f"❌ {col}: values changed when cast to {b.dtype}")
+
+
+def verify_schema(path, compacted):
+    """
+    อ่าน footer แล้วเทียบ arrow schema กับ dtype ที่ตั้งใจเขียน
+    """
+    expected = pa.Schema.from_pandas(compacted, preserve_index=False).remove_metadata()
+    actual = pq.read_schema(path).remove_metadata()
+    if not actual.equals(expected):
+        raise ValueError(f"❌ {path}: written schema does not match policy\n{actual}\n!=\n{expected}")
+
+
+def write_parquet(df, path):
+    """
+    compact + ตรวจ round-trip + เขียน parquet — ใช้แทน df.to_parquet ใน stage ต่างๆ
+    คืนค่า DataFrame ที่ compact แล้ว
+    """
+    out = compact(df)
+    check_round_trip(df, out)
+    out.to_parquet(path, index=False)
+    verify_schema(path, out)
+    return out
+
+# ----------------------------------------
+# MEMORY MEASUREMENT
+# ----------------------------------------
+def legacy(df):
+    """
+    dtype แบบเดิม (object keys, int64, float64) — ใช้เทียบหน่วยความจำ
+    """
+    out = df.copy()
+    for col in out.columns:
+        s = out[col]
+        if col in AREA:
+            out[col] = s.astype(object)
+        elif pd.api.types.is_integer_dtype(s):
+            out[col] = s.astype("int64")
+        elif pd.api.types.is_float_dtype(s):
+            out[col] = s.astype("float64")
+    return out
+
+
+def memory_report(paths):
+    rows = []
+    for name, path in paths.items():
+        if not os.path.exists(path):
+            continue
+        df = pd.read_parquet(path)
+        before = int(legacy(df).memory_usage(deep=True).sum())
+        after = int(compact(df).memory_usage(deep=True).sum())
+        rows.append({
+            "dataset": name,
+            "rows": len(df),
+            "legacy_mb": round(before / 2**20, 1),
+            "compact_mb": round(after / 2**20, 1),
+            "saving": round(1 - after / before, 3) if before else 0.0,
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    OUT = "gee-pipeline/outputs"
+    report = memory_report({
+        "merged": f"{OUT}/merged/merged_dataset.parquet",
+        "filled": f"{OUT}/merged/merged_dataset_FILLED.parquet",
+        "dtw": f"{OUT}/merged/dtw_results.parquet",
+    })
+    print("🧮 Loaded memory per dataset (pandas, deep)")
+    print(report.to_string(index=False))
+
+    path = f"{OUT}/state/schema_memory.json"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report.to_dict(orient="records"), f, indent=2)
+    print(f"📝 Saved to {path}")
@@ -7,6 +7,8 @@ import geopandas as gpd
 from google.cloud import storage
 from tqdm import tqdm
 
+from instrumentation import init, stage
+
 RAW_OUTPUT = "gee-pipeline/outputs/raw_parquet"
 os.makedirs(RAW_OUTPUT, exist_ok=True)
 
@@ -21,6 +23,8 @@ args = parser.parse_args()
 variable_filter = args.var.upper() if args.var else None
 limit = args.limit
 
+init(f"poll_download_convert:{variable_filter}" if variable_filter else "poll_download_convert")
+
 # ----------------------------------------
 #   LOAD ENV
 # ----------------------------------------
@@ -45,7 +49,9 @@ print(f"📥 Downloading from bucket: {bucket_name}")
 # ----------------------------------------
 print("🔎 Scanning bucket for GeoJSON files...")
 
-blobs = list(bucket.list_blobs(prefix="raw_export/"))
+with stage("list") as st:
+    blobs = list(bucket.list_blobs(prefix="raw_export/"))
+    st.rows(rows_in=len(blobs))
 
 geojson_files = []
 
@@ -100,23 +106,31 @@ for blob, var in tqdm(geojson_files, desc="Processing"):
     local_geojson_path = os.path.join(RAW_OUTPUT, filename)
     parquet_path = os.path.join(RAW_OUTPUT, parquet_filename)
 
-    blob.download_to_filename(local_geojson_path)
+    with stage("download") as st:
+        blob.download_to_filename(local_geojson_path)
+        st.read(local_geojson_path)
 
     # ----------------------------------------
     #   CONVERT GEOJSON → PARQUET
     # ----------------------------------------
-    gdf = gpd.read_file(local_geojson_path)
-    df = pd.DataFrame(gdf.drop(columns="geometry"))
-    df.columns = [c.lower() for c in df.columns]
+    with stage("convert") as st:
+        with stage("read_geojson"):
+            gdf = gpd.read_file(local_geojson_path)
+        df = pd.DataFrame(gdf.drop(columns="geometry"))
+        df.columns = [c.lower() for c in df.columns]
 
-    table = pa.Table.from_pandas(df)
-    pq.write_table(table, parquet_path)
+        table = pa.Table.from_pandas(df)
+        pq.write_table(table, parquet_path)
+        st.read(local_geojson_path, rows=len(gdf))
+        st.wrote(parquet_path, rows=len(df))
 
     # ----------------------------------------
     #   UPLOAD PARQUET → GCS
     # ----------------------------------------
-    out_blob = bucket.blob(gcs_output_path)
-    out_blob.upload_from_filename(parquet_path)
+    with stage("upload") as st:
+        out_blob = bucket.blob(gcs_output_path)
+        out_blob.upload_from_filename(parquet_path)
+        st.wrote(parquet_path)
 
     print(f"\n✔ Uploaded: gs://{bucket_name}/{gcs_output_path}")
 
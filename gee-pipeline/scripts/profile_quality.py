@@ -0,0 +1,157 @@
+import os
+import pandas as pd
+import numpy as np
+
+from instrumentation import init, stage
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+MERGED = "gee-pipeline/outputs/merged/merged_dataset.parquet"
+FILLED = "gee-pipeline/outputs/merged/merged_dataset_FILLED.parquet"
+REJECTIONS = "gee-pipeline/outputs/state/clean_rejections.parquet"
+OUTPUT_PATH = "gee-pipeline/outputs/merged/quality_summary.parquet"
+
+AREA = ["province", "district", "subdistrict"]
+TIME = ["year", "month"]
+VARS = ["NDVI", "LST", "RAINFALL", "SOILMOISTURE", "FIRECOUNT"]
+
+# ระดับของสรุป: ทั้งตัวแปร / ต่อตำบล / ต่อเดือน
+LEVELS = {
+    "variable": [],
+    "area": AREA,
+    "month": TIME,
+}
+ROW_KEYS = ["level", "variable"] + AREA + TIME
+
+# -----------------------------
+# LOAD (อ่านครั้งเดียว)
+# -----------------------------
+init("profile_quality")
+
+print("📥 Loading merged / filled datasets...")
+with stage("load") as st:
+    merged = pd.read_parquet(MERGED)
+    st.read(MERGED, rows=len(merged))
+    vars_ = [v for v in VARS if v in merged.columns]
+
+    if os.path.exists(FILLED):
+        filled = pd.read_parquet(FILLED, columns=AREA + TIME + vars_)
+        st.read(FILLED, rows=len(filled))
+        observed = filled[AREA + TIME].merge(
+            merged[AREA + TIME + vars_].drop_duplicates(subset=AREA + TIME),
+            on=AREA + TIME,
+            how="left",
+        )
+    else:
+        print("⚠️ FILLED dataset not found — imputation share will be 0")
+        filled = merged[AREA + TIME + vars_]
+        observed = filled
+
+# -----------------------------
+# REJECTIONS FROM CLEAN STAGE (ต่อ variable, month)
+# -----------------------------
+rejected = pd.DataFrame({
+    "variable": pd.Series(dtype=object),
+    "year": pd.Series(dtype=int),
+    "month": pd.Series(dtype=int),
+    "rejected": pd.Series(dtype=int),
+})
+if os.path.exists(REJECTIONS):
+    rej = pd.read_parquet(REJECTIONS)
+    rej = rej[rej["rule"] != "missing"]
+    period = rej["file"].str.extract(r"(\d{4})_(\d{2})\.parquet$").astype(float)
+    rej = rej.assign(year=period[0], month=period[1]).dropna(subset=TIME)
+    rejected = (
+        rej.groupby(["variable"] + TIME, as_index=False)["count"].sum()
+        .rename(columns={"count": "rejected"})
+    )
+    rejected[TIME] = rejected[TIME].astype(int)
+
+# -----------------------------
+# PROFILE (vectorized group reductions)
+# -----------------------------
+def profile(cells, keys):
+    if keys:
+        g = cells.groupby(keys, observed=True)
+    else:
+        g = cells.assign(_all=0).groupby("_all")
+
+    out = g.agg(
+        cells=("value", "size"),
+        observed=("observed", "sum"),
+        imputed=("imputed", "sum"),
+        missing=("missing", "sum"),
+        mean=("value", "mean"),
+        std=("value", "std"),
+        min=("value", "min"),
+        max=("value", "max"),
+    )
+    q = g["value"].quantile([0.05, 0.5, 0.95]).unstack()
+    out[["p05", "p50", "p95"]] = q.to_numpy()
+    out = out.reset_index()
+    return out.drop(columns="_all", errors="ignore")
+
+
+with stage("profile") as st:
+    frames = []
+    for var in vars_:
+        print(f"📊 PROFILE {var}")
+        obs = observed[var].notna().to_numpy()
+        val = filled[var].to_numpy(float)
+
+        cells = filled[AREA + TIME].copy()
+        cells["value"] = val
+        cells["observed"] = obs
+        cells["imputed"] = ~obs & ~np.isnan(val)
+        cells["missing"] = np.isnan(val)
+
+        for level, keys in LEVELS.items():
+            out = profile(cells, keys)
+            out.insert(0, "variable", var)
+            out.insert(0, "level", level)
+            frames.append(out)
+
+    summary = pd.concat(frames, ignore_index=True)
+    for col in AREA:
+        summary[col] = summary[col].astype(object)
+    for col in TIME:
+        summary[col] = summary[col].astype("Int64")
+
+    summary["completeness"] = summary["observed"] / summary["cells"]
+    summary["imputed_share"] = summary["imputed"] / summary["cells"]
+
+    # rejected: ต่อเดือน + รวมทั้งตัวแปร (ไม่มีระดับตำบลใน clean manifest)
+    month_rej = rejected.assign(level="month")
+    var_rej = rejected.groupby("variable", as_index=False)["rejected"].sum().assign(level="variable")
+    rej_all = pd.concat([month_rej, var_rej], ignore_index=True)
+    for col in TIME:
+        rej_all[col] = rej_all[col].astype("Int64")
+    summary = summary.merge(rej_all, on=["level", "variable"] + TIME, how="left")
+    summary["rejected"] = summary["rejected"].fillna(0).astype(int)
+    st.rows(len(filled) * len(vars_), len(summary))
+
+# -----------------------------
+# DRIFT VS PREVIOUS RUN
+# -----------------------------
+with stage("drift"):
+    if os.path.exists(OUTPUT_PATH):
+        prev = pd.read_parquet(OUTPUT_PATH, columns=ROW_KEYS + ["mean", "completeness"])
+        prev = prev.rename(columns={"mean": "prev_mean", "completeness": "prev_completeness"})
+        summary = summary.merge(prev, on=ROW_KEYS, how="left")
+        summary["drift_mean"] = summary["mean"] - summary.pop("prev_mean")
+        summary["drift_completeness"] = summary["completeness"] - summary.pop("prev_completeness")
+    else:
+        summary["drift_mean"] = np.nan
+        summary["drift_completeness"] = np.nan
+
+# -----------------------------
+# SAVE
+# -----------------------------
+with stage("write") as st:
+    summary.to_parquet(OUTPUT_PATH, index=False)
+    st.wrote(OUTPUT_PATH, rows=len(summary))
+
+overall = summary[summary["level"] == "variable"].set_index("variable")
+print(overall[["cells", "completeness", "imputed_share", "rejected", "mean", "drift_mean"]].round(4).to_string())
+print(f"✅ Quality summary saved to {OUTPUT_PATH} ({len(summary)} rows)")
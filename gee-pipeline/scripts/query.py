@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import argparse
+import duckdb
+
+# ----------------------------------------
+# SQL QUERY LAYER (DuckDB, in-process)
+#
+# ลงทะเบียน dataset ของ pipeline เป็น view แล้ว query ตรงจาก parquet
+# DuckDB อ่านเฉพาะคอลัมน์ที่ใช้ ข้าม row group/ไฟล์ด้วย min/max statistics
+# (clean เป็น 1 ไฟล์/เดือน → filter year/month = อ่านแค่ไฟล์ที่เกี่ยว) และรันหลาย thread
+#
+#   python gee-pipeline/scripts/query.py "SELECT district, avg(LST) FROM merged WHERE month = 4 GROUP BY 1"
+#   python gee-pipeline/scripts/query.py --views
+#
+#   from query import connect, query
+#   df = query("SELECT * FROM dtw WHERE dtw_ndvi_z_flag = 1")
+# ----------------------------------------
+OUT = "gee-pipeline/outputs"
+
+DATASETS = {
+    "merged": f"{OUT}/merged/merged_dataset.parquet",
+    "filled": f"{OUT}/merged/merged_dataset_FILLED.parquet",
+    "dtw": f"{OUT}/merged/dtw_results.parquet",
+    "quality": f"{OUT}/merged/quality_summary.parquet",
+    "rejections": f"{OUT}/state/clean_rejections.parquet",
+}
+CLEAN_DIR = f"{OUT}/clean"
+
+AREA = ["province", "district", "subdistrict"]
+VARS = ["NDVI", "LST", "RAINFALL", "SOILMOISTURE", "FIRECOUNT"]
+COMBINED = "COMBINED"
+
+_con = None
+
+
+def _sql_path(path):
+    return path.replace("\\", "/").replace("'", "''")
+
+
+def clean_view_sql(con, root="."):
+    """
+    clean/<VAR>/*.parquet (1 คอลัมน์ค่า/โฟลเดอร์) → long format: variable, keys, value
+    """
+    parts = []
+    clean_dir = os.path.join(root, CLEAN_DIR)
+    for var in VARS:
+        if os.path.isdir(os.path.join(clean_dir, var)):
+            files = _sql_path(os.path.join(clean_dir, var, "*.parquet"))
+            parts.append(
+                f"SELECT '{var}' AS variable, province, district, subdistrict, year, month, "
+                f"CAST({var} AS DOUBLE) AS value FROM read_parquet('{files}')"
+            )
+
+    if os.path.isdir(os.path.join(clean_dir, COMBINED)):
+        files = _sql_path(os.path.join(clean_dir, COMBINED, "*.parquet"))
+        cols = {c[0] for c in con.execute(f"DESCRIBE SELECT * FROM read_parquet('{files}', union_by_name = true)").fetchall()}
+        for var in [v for v in VARS if v in cols]:
+            parts.append(
+                f"SELECT '{var}' AS variable, province, district, subdistrict, year, month, "
+                f"CAST({var} AS DOUBLE) AS value FROM read_parquet('{files}', union_by_name = true) "
+                f"WHERE {var} IS NOT NULL"
+            )
+    return "\nUNION ALL\n".join(parts)
+
+
+def connect(root=".", threads=None, refresh=False):
+    """
+    connection แบบ in-memory ที่มี view: clean, merged, filled, dtw, quality, rejections
+    (เฉพาะที่มีไฟล์) — สร้างครั้งเดียวต่อ process
+    """
+    global _con
+    if _con is not None and not refresh:
+        return _con
+
+    con = duckdb.connect(database=":memory:")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+
+    for name, path in DATASETS.items():
+        full = os.path.join(root, path)
+        if os.path.exists(full):
+            con.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{_sql_path(full)}')")
+
+    clean_sql = clean_view_sql(con, root)
+    if clean_sql:
+        con.execute(f"CREATE OR REPLACE VIEW clean AS {clean_sql}")
+
+    _con = con
+    return con
+
+
+def views(con=None):
+    con = con or connect()
+    return [row[0] for row in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY 1").fetchall()]
+
+
+def query(sql, params=None, con=None):
+    """
+    รัน SQL แล้วคืน pandas DataFrame (โหลดเฉพาะผลลัพธ์)
+    """
+    con = con or connect()
+    return con.execute(sql, params or []).df()
+
+# ----------------------------------------
+# CANNED QUERIES
+# ----------------------------------------
+def _check(name, allowed):
+    if name not in allowed:
+        raise ValueError(f"❌ {name!r} not in {allowed}")
+    return name
+
+
+def monthly_mean(var, month, years=None, by="district", dataset="merged", con=None):
+    """
+    ค่าเฉลี่ยของ var ในเดือนปฏิทิน month ต่อ province/district/subdistrict
+    เช่น monthly_mean("LST", 4, (2016, 2024))
+    """
+    var = _check(var, VARS)
+    dataset = _check(dataset, ["merged", "filled"])
+    keys = AREA[:AREA.index(_check(by, AREA)) + 1]
+    lo, hi = years or (0, 9999)
+    cols = ", ".join(keys)
+    return query(
+        f"SELECT {cols}, avg({var}) AS {var.lower()}_mean, count({var}) AS n "
+        f"FROM {dataset} WHERE month = ? AND year BETWEEN ? AND ? "
+        f"GROUP BY {cols} ORDER BY {cols}",
+        [int(month), int(lo), int(hi)],
+        con,
+    )
+
+
+def top_areas(var, n=10, agg="sum", years=None, dataset="merged", con=None):
+    """
+    n ตำบลที่มีค่ารวม/เฉลี่ยสูงสุด เช่น top_areas("FIRECOUNT") = ตำบลที่มี fire-days มากสุด
+    """
+    var = _check(var, VARS)
+    agg = _check(agg, ["sum", "avg", "max"])
+    dataset = _check(dataset, ["merged", "filled"])
+    lo, hi = years or (0, 9999)
+    return query(
+        f"SELECT province, district, subdistrict, {agg}({var}) AS {var.lower()}_{agg} "
+        f"FROM {dataset} WHERE year BETWEEN ? AND ? "
+        f"GROUP BY ALL ORDER BY 4 DESC NULLS LAST LIMIT ?",
+        [int(lo), int(hi), int(n)],
+        con,
+    )
+
+# ----------------------------------------
+# CLI
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Query pipeline outputs with SQL (DuckDB)")
+    parser.add_argument("sql", nargs="?", help="SQL to run; views: clean, merged, filled, dtw, quality, rejections")
+    parser.add_argument("--file", help="Read SQL from a file")
+    parser.add_argument("--views", action="store_true", help="List registered views and their columns")
+    parser.add_argument("--explain", action="store_true", help="Show the query plan instead of running it")
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB threads (default: all cores)")
+    parser.add_argument("--out", help="Write result to .csv or .parquet instead of printing")
+    parser.add_argument("--limit", type=int, default=50, help="Rows to print")
+    args = parser.parse_args()
+
+    con = connect(threads=args.threads)
+
+    if args.views:
+        for name in views(con):
+            cols = con.execute(f"DESCRIBE {name}").fetchall()
+            print(f"📄 {name}: " + ", ".join(f"{c[0]} {c[1]}" for c in cols))
+        return
+
+    sql = open(args.file).read() if args.file else args.sql
+    if not sql:
+        parser.error("give SQL, --file or --views")
+
+    if args.explain:
+        for _, plan in con.execute(f"EXPLAIN {sql}").fetchall():
+            print(plan)
+        return
+
+    t0 = time.perf_counter()
+    rel = con.sql(sql)
+    if args.out:
+        if args.out.endswith(".parquet"):
+            rel.write_parquet(args.out)
+        else:
+            rel.write_csv(args.out)
+        print(f"✅ Saved to {args.out} ({time.perf_counter() - t0:.2f}s)")
+        return
+
+    df = rel.df()
+    print(df.head(args.limit).to_string(index=False))
+    print(f"\n⏱️ {len(df)} rows in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+import os
+import sys
+import ast
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+from glob import glob
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from cleaning_rules import CLEANING_RULES
+from instrumentation import RUN_ID_ENV, init
+
+# ----------------------------------------
+# PIPELINE RUNNER
+#
+#   export → download/convert → clean → merge → fill → (dtw → snapshot, quality)
+#
+# ทุก stage ประกาศ inputs/outputs ไว้ ถ้า fingerprint ของ inputs (+ ตัว script)
+# ไม่เปลี่ยนและ outputs ยังอยู่ จะ skip stage นั้น
+# fingerprint ใช้ sha256 ของเนื้อไฟล์ (ไม่ใช่ mtime) → หลัง actions/checkout ยังตรงกัน
+# ถ้า workflow commit pipeline_state.json ไปพร้อม outputs
+# รันจาก root ของ repo เหมือน script อื่น:
+#   python gee-pipeline/scripts/run_pipeline.py --backend local --source <dir>
+# ----------------------------------------
+SCRIPTS = Path(__file__).resolve().parent
+AUTO = SCRIPTS.parent / "scripts_auto"
+
+OUT = "gee-pipeline/outputs"
+RAW_DIR = f"{OUT}/raw_parquet"
+CLEAN_DIR = f"{OUT}/clean"
+MERGED = f"{OUT}/merged/merged_dataset.parquet"
+FILLED = f"{OUT}/merged/merged_dataset_FILLED.parquet"
+DTW = f"{OUT}/merged/dtw_results.parquet"
+QUALITY = f"{OUT}/merged/quality_summary.parquet"
+SNAPSHOTS = f"{OUT}/snapshots"
+STATE_PATH = f"{OUT}/state/pipeline_state.json"
+# key ใน state ที่เก็บ sha256 ของไฟล์ input (ใช้ซ้ำถ้า size/mtime ไม่เปลี่ยน)
+FILES_KEY = "_files"
+
+VARS = list(CLEANING_RULES)
+COMBINED = "COMBINED"
+# โฟลเดอร์ raw ที่ต้อง sync: ต่อตัวแปร + ตาราง multi-band ของ export แบบ --combined
+RAW_FOLDERS = VARS + [COMBINED]
+
+# ----------------------------------------
+# STAGE DEFINITIONS
+# ----------------------------------------
+def python(script, *args):
+    return [sys.executable, str(script), *args]
+
+
+def build_stages(backend, source=None):
+    """
+    คืนค่า dict ของ stage ตามลำดับ topological
+    run = list ของคำสั่ง (subprocess) หรือ callable
+    """
+    stages = {}
+
+    def add(name, deps, inputs, outputs, run, scripts=(), always=False):
+        stages[name] = {
+            "deps": deps,
+            "inputs": inputs,
+            "outputs": outputs,
+            "run": run,
+            "scripts": [str(s) for s in code_inputs(scripts)],
+            "always": always,
+        }
+
+    # 1) export (GEE → GCS) — มี side effect ภายนอก, ไม่มี output ในเครื่อง
+    if backend == "gcs":
+        export = AUTO / "gee_export_tasks.py"
+        add("export", [], [], [], [python(export)], [export], always=True)
+    else:
+        add("export", [], [], [], None)
+
+    # 2) download/convert แยกต่อโฟลเดอร์ raw (รันขนานกันได้)
+    for var in RAW_FOLDERS:
+        target = f"{RAW_DIR}/{var}"
+        if backend == "gcs":
+            convert = SCRIPTS / "poll_download_convert.py"
+            bucket = os.environ.get("GCS_BUCKET", "")
+            run = [
+                python(convert, "--var", var),
+                ["gsutil", "-m", "rsync", "-r", f"gs://{bucket}/parquet/{var}", target],
+            ]
+            add(f"download:{var}", ["export"], [], [target], run, [convert], always=True)
+        else:
+            run = [lambda var=var, target=target: sync_local(Path(source) / var, Path(target))]
+            add(f"download:{var}", ["export"], [f"{source}/{var}/*.parquet"], [target], run)
+
+    # 3) clean (incremental + process pool ภายใน script)
+    clean = SCRIPTS / "clean_raw_data.py"
+    add(
+        "clean",
+        [f"download:{var}" for var in RAW_FOLDERS],
+        [f"{RAW_DIR}/**/*.parquet"],
+        [CLEAN_DIR],
+        [python(clean)],
+        [clean],
+    )
+
+    # 4) merge → 5) fill
+    merge = SCRIPTS / "merge_cleaned.py"
+    add("merge", ["clean"], [f"{CLEAN_DIR}/**/*.parquet"], [MERGED], [python(merge)], [merge])
+
+    fill = SCRIPTS / "final_fill_after_merge.py"
+    add("fill", ["merge"], [MERGED], [FILLED], [python(fill)], [fill])
+
+    # 6) DTW และ quality profile ไม่ขึ้นต่อกัน
+    dtw = SCRIPTS / "compute_dtw_from_baseline.py"
+    add("dtw", ["fill"], [FILLED], [DTW], [python(dtw)], [dtw])
+
+    quality = SCRIPTS / "profile_quality.py"
+    add("quality", ["fill"], [MERGED, FILLED], [QUALITY], [python(quality)], [quality])
+
+    # 7) snapshot (เก็บเฉพาะปีที่เปลี่ยน)
+    snapshot = SCRIPTS / "snapshots.py"
+    add("snapshot", ["dtw"], [MERGED, FILLED, DTW], [SNAPSHOTS], [python(snapshot, "take", "merged", "filled", "dtw")], [snapshot])
+
+    return stages
+
+
+def sync_local(source, target):
+    """
+    local backend: คัดลอก parquet จากโฟลเดอร์ (layout เดียวกับ gs://bucket/parquet/)
+    เฉพาะไฟล์ที่ยังไม่มีหรือ size/mtime เปลี่ยน
+    """
+    target.mkdir(parents=True, exist_ok=True)
+    copied = 0
+    for src in sorted(source.glob("*.parquet")):
+        dst = target / src.name
+        if dst.exists():
+            s, d = src.stat(), dst.stat()
+            if s.st_size == d.st_size and s.st_mtime_ns == d.st_mtime_ns:
+                continue
+        shutil.copy2(src, dst)
+        copied += 1
+    print(f"⬇️ {source.name}: {copied} files synced")
+
+# ----------------------------------------
+# FINGERPRINTS
+# ----------------------------------------
+def code_inputs(scripts):
+    """
+    script ของ stage + module ใน repo ที่ถูก import ต่อกันไป (transitive)
+    แก้ helper (cleaning_rules, cube_store, pipeline_schema, ...) → stage ที่ใช้ถูกรันใหม่
+    """
+    seen = set()
+    todo = [Path(s) for s in scripts]
+    while todo:
+        path = todo.pop()
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"))):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                for folder in (path.parent, SCRIPTS):
+                    module = folder / f"{name.split('.')[0]}.py"
+                    if module.exists():
+                        todo.append(module)
+                        break
+    return sorted(seen)
+
+
+def expand(pattern):
+    if any(ch in pattern for ch in "*?["):
+        return sorted(glob(pattern, recursive=True))
+    if os.path.isdir(pattern):
+        return sorted(glob(os.path.join(pattern, "**", "*"), recursive=True))
+    return [pattern] if os.path.exists(pattern) else []
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_hash(path, files):
+    """
+    sha256 ของไฟล์ — ถ้า size/mtime ตรงกับที่จำไว้ใน files ใช้ hash เดิม ไม่ต้องอ่านซ้ำ
+    """
+    st = os.stat(path)
+    entry = files.get(path)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha256"]
+    sha = file_sha256(path)
+    files[path] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    return sha
+
+
+def fingerprint(stage, files):
+    """
+    hash ของ (path, sha256) ทุกไฟล์ input + เนื้อหาของ script และ module ที่ import
+    """
+    h = hashlib.sha256()
+    for pattern in stage["inputs"]:
+        for path in expand(pattern):
+            if os.path.isfile(path):
+                h.update(f"{Path(path).as_posix()}|{content_hash(path, files)}\n".encode())
+    for script in stage["scripts"]:
+        with open(script, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp = f"{STATE_PATH}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+
+def is_up_to_date(name, stage, state, fp):
+    if stage["always"]:
+        return False
+    if state.get(name, {}).get("fingerprint") != fp:
+        return False
+    return all(os.path.exists(p) for p in stage["outputs"])
+
+# ----------------------------------------
+# SELECTION (--from / --until)
+# ----------------------------------------
+def stage_index(stages, name):
+    names = list(stages)
+    for i, s in enumerate(names):
+        if s == name or s.split(":")[0] == name:
+            return i
+    raise SystemExit(f"❌ Unknown stage: {name} (choose from {', '.join(names)})")
+
+
+def select(stages, start=None, until=None):
+    names = list(stages)
+    lo = stage_index(stages, start) if start else 0
+    hi = stage_index(stages, until) if until else len(names) - 1
+    # --until download → รวม download:* ทุกตัว
+    while hi + 1 < len(names) and names[hi + 1].split(":")[0] == names[hi].split(":")[0]:
+        hi += 1
+    return names[lo:hi + 1]
+
+# ----------------------------------------
+# EXECUTION
+# ----------------------------------------
+def run_stage(name, stage):
+    t0 = time.time()
+    for cmd in stage["run"] or []:
+        if callable(cmd):
+            cmd()
+            continue
+        print(f"▶ [{name}] {' '.join(cmd)}")
+        subprocess.run(cmd, check=True)
+    return time.time() - t0
+
+
+def execute(stages, selected, jobs, force=False, dry_run=False):
+    state = load_state()
+    files = state.setdefault(FILES_KEY, {})
+    done = {n for n in stages if n not in selected}
+    pending = list(selected)
+    running = {}
+    failed = []
+    summary = []
+    would_run = set()
+
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        while pending or running:
+            for name in list(pending):
+                stage = stages[name]
+                if any(d in failed for d in stage["deps"]):
+                    pending.remove(name)
+                    failed.append(name)
+                    summary.append((name, "blocked", 0.0))
+                    continue
+                if not all(d in done for d in stage["deps"]):
+                    continue
+
+                pending.remove(name)
+                fp = fingerprint(stage, files)
+                if stage["run"] is None:
+                    summary.append((name, "n/a (local backend)", 0.0))
+                    done.add(name)
+                elif dry_run:
+                    stale = force or would_run.intersection(stage["deps"]) or not is_up_to_date(name, stage, state, fp)
+                    if stale:
+                        would_run.add(name)
+                    summary.append((name, "would run" if stale else "up to date", 0.0))
+                    done.add(name)
+                elif not force and is_up_to_date(name, stage, state, fp):
+                    summary.append((name, "up to date", 0.0))
+                    done.add(name)
+                else:
+                    running[ex.submit(run_stage, name, stage)] = (name, fp)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, fp = running.pop(fut)
+                try:
+                    seconds = fut.result()
+                except Exception as e:
+                    print(f"❌ [{name}] {e}")
+                    failed.append(name)
+                    summary.append((name, "failed", 0.0))
+                    continue
+
+                state[name] = {
+                    "fingerprint": fp,
+                    "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "seconds": round(seconds, 2),
+                }
+                save_state(state)
+                done.add(name)
+                summary.append((name, "ran", seconds))
+
+    if not dry_run:
+        save_state(state)
+
+    print("\n📋 PIPELINE SUMMARY")
+    for name, status, seconds in summary:
+        print(f"   {name:<22} {status:<20} {seconds:>8.1f}s")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the GEE pipeline as a stage DAG")
+    parser.add_argument("--backend", choices=["gcs", "local"], default="gcs", help="gcs = GEE + bucket, local = offline copy of parquet/")
+    parser.add_argument("--source", default=None, help="Local folder laid out like gs://<bucket>/parquet/ (local backend)")
+    parser.add_argument("--from", dest="start", default=None, help="First stage to run")
+    parser.add_argument("--until", default=None, help="Last stage to run")
+    parser.add_argument("--jobs", type=int, default=4, help="Stages to run concurrently")
+    parser.add_argument("--force", action="store_true", help="Run selected stages even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would run")
+    args = parser.parse_args()
+
+    if args.backend == "local" and args.source is None:
+        parser.error("--source is required with --backend local")
+
+    # script ลูกทุกตัวเขียน run log ภายใต้ run_id เดียวกัน → สรุปรวมตอนจบ
+    os.environ[RUN_ID_ENV] = init("run_pipeline", scope="run")
+
+    stages = build_stages(args.backend, args.source)
+    selected = select(stages, args.start, args.until)
+    print(f"🧭 Stages: {' → '.join(selected)}")
+
+    if not execute(stages, selected, args.jobs, args.force, args.dry_run):
+        sys.exit(1)
+    print("✅ Pipeline finished")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime, timezone
+
+# ----------------------------------------
+# SNAPSHOTS ของ merged / filled / DTW
+#
+#   outputs/snapshots/
+#     objects/ab/abcd….parquet       partition (1 ปี) แบบ content-addressed
+#     versions/<dataset>/v000003.json manifest: ปี → object hash
+#     versions/<dataset>/tags.json    ชื่อ → version (ให้ dashboard pin ได้)
+#
+# ปีที่ไม่เปลี่ยนชี้ไป object เดิม → เก็บซ้ำแค่ปีที่เปลี่ยน
+# (ยกเว้น dtw: baseline และ z-score คิดจากทุกปี → ทุกปีเปลี่ยนเมื่อมีปีใหม่ ได้ object ใหม่ทุก partition)
+# diff อ่านเฉพาะ partition ที่ hash ต่างกัน แล้วเทียบแบบ vectorized
+#
+#   python gee-pipeline/scripts/snapshots.py take merged filled dtw -m "monthly run"
+#   python gee-pipeline/scripts/snapshots.py diff merged 3 4
+#
+# store เก็บถาวรใน branch "snapshots" (workflow dtw-run push ทุกครั้ง) — ใช้ในเครื่อง:
+#   git fetch origin snapshots && git worktree add gee-pipeline/outputs/snapshots FETCH_HEAD
+# ----------------------------------------
+# อ้างอิงจากตำแหน่ง script (dashboard อ่าน snapshot ได้แม้ไม่ได้รันจาก root ของ repo)
+STORE = Path(__file__).resolve().parents[1] / "outputs" / "snapshots"
+OBJECTS = STORE / "objects"
+VERSIONS = STORE / "versions"
+
+AREA = ["province", "district", "subdistrict"]
+
+DATASETS = {
+    "merged": {"path": "gee-pipeline/outputs/merged/merged_dataset.parquet", "keys": AREA + ["year", "month"]},
+    "filled": {"path": "gee-pipeline/outputs/merged/merged_dataset_FILLED.parquet", "keys": AREA + ["year", "month"]},
+    "dtw": {"path": "gee-pipeline/outputs/merged/dtw_results.parquet", "keys": AREA + ["year"]},
+}
+PARTITION = "year"
+
+# ----------------------------------------
+# OBJECTS
+# ----------------------------------------
+def content_hash(df):
+    """
+    hash ของเนื้อข้อมูล (ชื่อคอลัมน์ + dtype + ค่าทุกแถว) ไม่ขึ้นกับ bytes ของ parquet
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([[c, str(t)] for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def object_path(sha):
+    return OBJECTS / sha[:2] / f"{sha}.parquet"
+
+
+def put_object(df):
+    sha = content_hash(df)
+    path = object_path(sha)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    return sha
+
+# ----------------------------------------
+# VERSIONS
+# ----------------------------------------
+def version_dir(dataset):
+    return VERSIONS / dataset
+
+
+def list_versions(dataset):
+    folder = version_dir(dataset)
+    if not folder.exists():
+        return []
+    return sorted(int(p.stem[1:]) for p in folder.glob("v*.json"))
+
+
+def load_version(dataset, version):
+    with open(version_dir(dataset) / f"v{version:06d}.json") as f:
+        return json.load(f)
+
+
+def load_tags(dataset):
+    path = version_dir(dataset) / "tags.json"
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def tag(dataset, version, name):
+    tags = load_tags(dataset)
+    tags[name] = resolve_version(dataset, version)
+    with open(version_dir(dataset) / "tags.json", "w") as f:
+        json.dump(tags, f, indent=2, sort_keys=True)
+    return tags[name]
+
+
+def resolve_version(dataset, version=None):
+    """
+    None / "latest" / เลข version / ชื่อ tag → เลข version
+    """
+    versions = list_versions(dataset)
+    if not versions:
+        raise FileNotFoundError(f"❌ No snapshots for {dataset}")
+    if version in (None, "latest"):
+        return versions[-1]
+    if isinstance(version, str) and not version.isdigit():
+        tags = load_tags(dataset)
+        if version not in tags:
+            raise KeyError(f"❌ Unknown tag for {dataset}: {version}")
+        return tags[version]
+    version = int(version)
+    if version not in versions:
+        raise KeyError(f"❌ {dataset} has no version {version}")
+    return version
+
+
+def take_snapshot(dataset, message=None, path=None):
+    """
+    แบ่ง dataset เป็น partition ต่อปี เก็บเฉพาะ object ที่ยังไม่มี แล้วเขียน manifest ใหม่
+    ถ้าไม่มีปีไหนเปลี่ยนจาก version ล่าสุด จะไม่สร้าง version ใหม่
+    """
+    spec = DATASETS[dataset]
+    path = path or spec["path"]
+    df = pd.read_parquet(path)
+
+    partitions = {}
+    for year, part in df.groupby(PARTITION, sort=True):
+        part = part.sort_values(spec["keys"]).reset_index(drop=True)
+        partitions[str(int(year))] = {"object": put_object(part), "rows": len(part)}
+
+    versions = list_versions(dataset)
+    parent = versions[-1] if versions else None
+    previous = load_version(dataset, parent)["partitions"] if parent is not None else {}
+    if parent is not None and previous == partitions:
+        print(f"📸 {dataset}: unchanged (v{parent})")
+        return parent
+
+    version = (parent or 0) + 1
+    manifest = {
+        "dataset": dataset,
+        "version": version,
+        "parent": parent,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "message": message,
+        "commit": os.environ.get("GITHUB_SHA"),
+        "rows": int(len(df)),
+        "columns": list(df.columns),
+        "partitions": partitions,
+    }
+    folder = version_dir(dataset)
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / f"v{version:06d}.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    reused = sum(1 for y, p in partitions.items() if previous.get(y) == p)
+    print(f"📸 {dataset}: v{version} ({len(partitions)} partitions, {reused} reused)")
+    return version
+
+# ----------------------------------------
+# TIME-TRAVEL READ
+# ----------------------------------------
+def read_snapshot(dataset, version=None, years=None, columns=None):
+    """
+    อ่าน dataset ตาม version (เลข / "latest" / tag) เฉพาะปีที่ต้องการได้
+    """
+    manifest = load_version(dataset, resolve_version(dataset, version))
+    parts = [
+        pd.read_parquet(object_path(p["object"]), columns=columns)
+        for y, p in sorted(manifest["partitions"].items())
+        if years is None or int(y) in years
+    ]
+    if not parts:
+        return pd.DataFrame(columns=columns or manifest["columns"])
+    return pd.concat(parts, ignore_index=True)
+
+# ----------------------------------------
+# DIFF
+# ----------------------------------------
+def diff(dataset, old, new):
+    """
+    เทียบ 2 version คืนค่า (rows, cells)
+      rows   keys + status: added / removed / changed (1 แถวต่อ area-month ที่ต่าง)
+      cells  keys + column + old + new (1 แถวต่อค่าที่เปลี่ยน)
+    อ่านเฉพาะปีที่ object hash ต่างกัน
+    """
+    keys = DATASETS[dataset]["keys"]
+    a = load_version(dataset, resolve_version(dataset, old))["partitions"]
+    b = load_version(dataset, resolve_version(dataset, new))["partitions"]
+    years = sorted(int(y) for y in set(a) | set(b) if a.get(y) != b.get(y))
+
+    if not years:
+        empty = pd.DataFrame(columns=keys + ["status"])
+        return empty, pd.DataFrame(columns=keys + ["column", "old", "new"])
+
+    before = read_snapshot(dataset, old, years=years)
+    after = read_snapshot(dataset, new, years=years)
+    values = [c for c in after.columns if c in before.columns and c not in keys]
+
+    joined = before.merge(after, on=keys, how="outer", suffixes=("_old", "_new"), indicator=True)
+
+    old_vals = joined[[f"{c}_old" for c in values]].to_numpy()
+    new_vals = joined[[f"{c}_new" for c in values]].to_numpy()
+    same = (old_vals == new_vals) | (pd.isna(old_vals) & pd.isna(new_vals))
+    both = (joined["_merge"] == "both").to_numpy()
+    changed = ~same & both[:, None]
+
+    status = np.select(
+        [joined["_merge"].eq("left_only"), joined["_merge"].eq("right_only"), changed.any(axis=1)],
+        ["removed", "added", "changed"],
+        default="",
+    )
+    rows = joined.loc[status != "", keys].assign(status=status[status != ""]).reset_index(drop=True)
+
+    r, c = np.nonzero(changed)
+    cells = joined.iloc[r][keys].reset_index(drop=True)
+    cells["column"] = np.array(values, dtype=object)[c]
+    cells["old"] = old_vals[r, c]
+    cells["new"] = new_vals[r, c]
+    return rows, cells
+
+# ----------------------------------------
+# CLI
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Versioned snapshots of merged / filled / DTW outputs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("take", help="Snapshot the current outputs")
+    p.add_argument("datasets", nargs="*", metavar="dataset", help=f"{', '.join(DATASETS)} (default: all)")
+    p.add_argument("-m", "--message", default=None)
+
+    p = sub.add_parser("list", help="List versions")
+    p.add_argument("dataset", choices=list(DATASETS))
+
+    p = sub.add_parser("diff", help="Which area-months changed between two versions")
+    p.add_argument("dataset", choices=list(DATASETS))
+    p.add_argument("old")
+    p.add_argument("new", nargs="?", default="latest")
+    p.add_argument("--out", default=None, help="Write changed cells to parquet")
+
+    p = sub.add_parser("tag", help="Name a version so dashboards can pin it")
+    p.add_argument("dataset", choices=list(DATASETS))
+    p.add_argument("version")
+    p.add_argument("name")
+
+    p = sub.add_parser("checkout", help="Write a version back to a parquet file")
+    p.add_argument("dataset", choices=list(DATASETS))
+    p.add_argument("version")
+    p.add_argument("--out", required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "take":
+        unknown = set(args.datasets) - set(DATASETS)
+        if unknown:
+            parser.error(f"unknown dataset(s): {', '.join(sorted(unknown))}")
+        for dataset in args.datasets or list(DATASETS):
+            if os.path.exists(DATASETS[dataset]["path"]):
+                take_snapshot(dataset, args.message)
+            else:
+                print(f"⚠️ {DATASETS[dataset]['path']} not found — skip {dataset}")
+
+    elif args.command == "list":
+        tags = {}
+        for name, v in load_tags(args.dataset).items():
+            tags.setdefault(v, []).append(name)
+        for v in list_versions(args.dataset):
+            m = load_version(args.dataset, v)
+            label = f" [{', '.join(tags[v])}]" if v in tags else ""
+            print(f"v{v:<5} {m['created']}  {m['rows']:>9} rows  {len(m['partitions'])} partitions  {m['message'] or ''}{label}")
+
+    elif args.command == "diff":
+        rows, cells = diff(args.dataset, args.old, args.new)
+        print(f"🔍 {args.dataset} {args.old} → {args.new}")
+        print(rows["status"].value_counts().to_string() if len(rows) else "no changes")
+        if len(cells):
+            print(cells.groupby("column").size().rename("changed cells").to_string())
+        if args.out:
+            cells.to_parquet(args.out, index=False)
+            print(f"✅ Changed cells saved to {args.out}")
+
+    elif args.command == "tag":
+        v = tag(args.dataset, args.version, args.name)
+        print(f"🏷 {args.dataset} {args.name} → v{v}")
+
+    elif args.command == "checkout":
+        df = read_snapshot(args.dataset, args.version)
+        df.to_parquet(args.out, index=False)
+        print(f"✅ {args.dataset} v{resolve_version(args.dataset, args.version)} → {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,16 @@
 import os
-import pandas as pd
-from glob import glob
+import sys
 
 assert "scripts_auto" in __file__, "❌ Wrong script path"
 
-RAW_DIR = "gee-pipeline/outputs/raw_parquet"
-CLEAN_DIR = "gee-pipeline/outputs/clean"
-
-os.makedirs(CLEAN_DIR, exist_ok=True)
+# ใช้ตารางกฎ + manifest ชุดเดียวกับ scripts/clean_raw_data.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from clean_raw_data import main as clean_main
 
 def main():
-    files = glob(f"{RAW_DIR}/*.parquet")
-
-    for f in files:
-        name = os.path.basename(f)
-        out = os.path.join(CLEAN_DIR, name)
-
-        if os.path.exists(out):
-            continue
-
-        df = pd.read_parquet(f)
-        df["date"] = pd.to_datetime(df["date"])
-        df = df.dropna()
-
-        df.to_parquet(out)
-        print(f"🧹 Cleaned {name}")
-
+    # gsutil cp -r parquet/* → raw_parquet/<VAR>/<file>.parquet (+ raw_parquet/COMBINED/ จาก export --combined)
+    # clean เฉพาะไฟล์ที่เนื้อหาหรือกฎเปลี่ยน
+    clean_main()
     print("✅ Clean complete")
 
 if __name__ == "__main__":
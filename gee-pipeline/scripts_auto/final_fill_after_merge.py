@@ -1,20 +1,16 @@
-import pandas as pd
+import os
+import sys
+import runpy
 
 assert "scripts_auto" in __file__, "❌ Wrong script path"
 
-MERGED = "gee-pipeline/outputs/merged/merged_dataset.parquet"
-OUT = "gee-pipeline/outputs/merged/merged_dataset_FILLED.parquet"
+# merged_dataset.parquet ใช้ year/month (ไม่มีคอลัมน์ date แล้ว)
+# → ใช้ fill ชุดเดียวกับ scripts/final_fill_after_merge.py
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS)
 
 def main():
-    df = pd.read_parquet(MERGED)
-    df["date"] = pd.to_datetime(df["date"])
-
-    df = df.sort_values(["province", "date"])
-    df = df.groupby("province").apply(
-        lambda x: x.ffill().bfill()
-    ).reset_index(drop=True)
-
-    df.to_parquet(OUT)
+    runpy.run_path(os.path.join(SCRIPTS, "final_fill_after_merge.py"), run_name="__main__")
     print("✅ Final fill complete")
 
 if __name__ == "__main__":
@@ -1,11 +1,17 @@
 import os
+import sys
 import json
 import time
+import argparse
 import ee
-import pandas as pd
+from collections import deque
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from merged_manifest import available_periods, from_period, latest_period, to_period
+from instrumentation import init, stage
+
 # =====================================================
 # 🔐 AUTHENTICATION (FIXED – SERVICE ACCOUNT ONLY)
 # =====================================================
@@ -25,6 +31,12 @@ print("✅ Earth Engine initialized with service account")
 MERGED_PATH = "gee-pipeline/outputs/merged/merged_dataset.parquet"
 RAW_OUTPUT = "raw"
 
+# =====================================================
+# ⏳ QUEUE CONFIG (CATCH-UP)
+# =====================================================
+MAX_IN_FLIGHT = int(os.environ.get("GEE_MAX_IN_FLIGHT", 10))
+POLL_SECONDS = 30
+
 # =====================================================
 # 🗺 LOAD GEOMETRY
 # =====================================================
@@ -53,6 +65,7 @@ DATASETS = {
         "band": "sm_surface",
         "scale": 10000,
         "reducer": ee.Reducer.mean(),
+        "start": (2015, 3),  # SMAP L4 เริ่ม 31 มี.ค. 2015
     },
     "RAINFALL": {
         "ic": "UCSB-CHG/CHIRPS/DAILY",
@@ -80,10 +93,8 @@ def get_next_month():
     if not os.path.exists(MERGED_PATH):
         raise RuntimeError("❌ merged_dataset.parquet not found")
 
-    df = pd.read_parquet(MERGED_PATH)
-
-    last_year = int(df["year"].max())
-    last_month = int(df[df["year"] == last_year]["month"].max())
+    # manifest / footer statistics — ไม่โหลด dataset ทั้งก้อน
+    last_year, last_month = from_period(latest_period(MERGED_PATH))
 
     target = datetime(last_year, last_month, 1) + relativedelta(months=1)
     today = datetime.today()
@@ -94,23 +105,81 @@ def get_next_month():
 
     return target.year, target.month
 
+# =====================================================
+# 🧭 CATCH-UP PLANNER (ALL MISSING MONTHS)
+# =====================================================
+def month_range(start, end):
+    y, m = start
+    while (y, m) <= end:
+        yield y, m
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+def last_finished_month():
+    last = datetime.today().replace(day=1) - relativedelta(months=1)
+    return last.year, last.month
+
+
+def plan_missing_months():
+    """
+    คืนค่า list ของ (variable, year, month) ที่ยังไม่มีใน merged dataset
+    ตั้งแต่เดือนแรกของ store จนถึงเดือนล่าสุดที่จบแล้ว (รวมรูที่หายกลางทาง)
+    """
+    if not os.path.exists(MERGED_PATH):
+        raise RuntimeError("❌ merged_dataset.parquet not found")
+
+    periods = available_periods(MERGED_PATH, list(DATASETS))
+    present = set().union(*periods.values())
+    if not present:
+        raise RuntimeError("❌ merged_dataset.parquet has no data")
+
+    store_start = from_period(min(present))
+    end = last_finished_month()
+
+    plan = []
+    for var, spec in DATASETS.items():
+        have = periods[var]
+        start = max(store_start, spec.get("start", store_start))
+        for y, m in month_range(start, end):
+            if to_period(y, m) not in have:
+                plan.append((var, y, m))
+
+    # เรียงตามเวลา เพื่อให้เดือนเก่าสุดได้คิวก่อน
+    plan.sort(key=lambda t: (t[1], t[2], t[0]))
+    return plan
+
 # =====================================================
 # 🚀 EXPORT ONE MONTH
 # =====================================================
+def monthly_image(var, spec, start, end):
+    ic = ee.ImageCollection(spec["ic"]).filterDate(start, end)
+
+    if var == "FIRECOUNT":
+        return ic.map(prepare_fire).sum().rename(var)
+    return ic.select(spec["band"]).mean().rename(var)
+
+
+def start_export(zonal, filename, folder):
+    task = ee.batch.Export.table.toCloudStorage(
+        collection=zonal,
+        description=filename,
+        bucket=os.environ["GCS_BUCKET"],
+        fileNamePrefix=f"{RAW_OUTPUT}/{folder}/{filename}",
+        fileFormat="GeoJSON",
+    )
+
+    task.start()
+    print(f"🚀 Export started: {filename}")
+    return task
+
+
 def export_month(year, month, var, spec):
 
     start = ee.Date.fromYMD(year, month, 1)
     end = start.advance(1, "month")
 
-    ic = ee.ImageCollection(spec["ic"]).filterDate(start, end)
-
-    if var == "FIRECOUNT":
-        ic = ic.map(prepare_fire)
-        img = ic.sum()
-        reducer = ee.Reducer.sum()
-    else:
-        img = ic.select(spec["band"]).mean()
-        reducer = spec["reducer"]
+    img = monthly_image(var, spec, start, end)
+    reducer = ee.Reducer.sum() if var == "FIRECOUNT" else spec["reducer"]
 
     zonal = img.reduceRegions(
         collection=TAMBON,
@@ -124,38 +193,174 @@ def export_month(year, month, var, spec):
         "variable": var,
     }))
 
-    filename = f"{var}_{year}_{month:02d}"
+    return start_export(zonal, f"{var}_{year}_{month:02d}", var)
 
-    task = ee.batch.Export.table.toCloudStorage(
-        collection=zonal,
-        description=filename,
-        bucket=os.environ["GCS_BUCKET"],
-        fileNamePrefix=f"{RAW_OUTPUT}/{var}/{filename}",
-        fileFormat="GeoJSON",
+# =====================================================
+# 🧩 COMBINED MODE (MULTI-BAND, ONE TABLE PER MONTH)
+# =====================================================
+def combined_groups(variables):
+    """
+    จัดกลุ่มตัวแปรที่ native scale เท่ากันเข้าด้วยกัน
+    ไม่บังคับ scale ร่วม: ตัวแปรแบบ sum (RAINFALL / FIRECOUNT) ความหมายเปลี่ยนถ้า scale เปลี่ยน
+    """
+    groups = {}
+    for var in variables:
+        groups.setdefault(DATASETS[var]["scale"], []).append(var)
+    return [(key, tuple(vars_)) for key, vars_ in sorted(groups.items())]
+
+
+def export_combined_month(year, month, variables, scale):
+    """
+    ต่อ composite รายเดือนเป็นภาพ multi-band แล้ว reduce ครั้งเดียว
+    คอลัมน์ที่ได้คือ <VAR>_mean / <VAR>_sum ต่อ 1 ตำบล
+    """
+    start = ee.Date.fromYMD(year, month, 1)
+    end = start.advance(1, "month")
+
+    img = ee.Image.cat([
+        monthly_image(var, DATASETS[var], start, end) for var in variables
+    ])
+    reducer = ee.Reducer.mean().combine(ee.Reducer.sum(), sharedInputs=True)
+
+    zonal = img.reduceRegions(
+        collection=TAMBON,
+        reducer=reducer,
+        scale=scale,
     )
 
-    task.start()
-    print(f"🚀 Export started: {filename}")
-    return task
+    zonal = zonal.map(lambda f: f.set({
+        "year": year,
+        "month": month,
+        "variable": "COMBINED",
+    }))
+
+    filename = f"COMBINED_{scale}m_{year}_{month:02d}"
+    return start_export(zonal, filename, "COMBINED")
+
+
+def build_jobs(plan, combined=False):
+    """
+    แปลง plan (variable, year, month) เป็น job (variables, year, month, scale)
+    โหมดปกติ 1 job ต่อ 1 ตัวแปร / โหมด combined 1 job ต่อกลุ่ม scale
+    """
+    if not combined:
+        return [((var,), y, m, None) for var, y, m in plan]
+
+    by_month = {}
+    for var, y, m in plan:
+        by_month.setdefault((y, m), []).append(var)
+
+    jobs = []
+    for (y, m), variables in sorted(by_month.items()):
+        for group_scale, group in combined_groups(variables):
+            jobs.append((group, y, m, group_scale))
+    return jobs
+
+
+def submit_job(job):
+    variables, year, month, scale = job
+    if len(variables) == 1:
+        var = variables[0]
+        return export_month(year, month, var, DATASETS[var])
+    return export_combined_month(year, month, variables, scale)
+
+# =====================================================
+# 📬 BOUNDED QUEUE + PER-VARIABLE COMPLETENESS
+# =====================================================
+def print_progress(progress):
+    print("📊 VAR            planned  done  failed  running")
+    for var, p in progress.items():
+        print(
+            f"   {var:<14} {p['planned']:>7} {p['done']:>5} "
+            f"{p['failed']:>7} {p['running']:>8}"
+        )
+
+
+def run_queue(jobs, max_in_flight=MAX_IN_FLIGHT):
+    pending = deque(jobs)
+    running = {}
+    progress = {
+        var: {"planned": 0, "done": 0, "failed": 0, "running": 0}
+        for var in DATASETS
+    }
+    for variables, _, _, _ in jobs:
+        for var in variables:
+            progress[var]["planned"] += 1
+
+    while pending or running:
+        # เติมคิวไม่ให้เกิน max_in_flight (GEE จำกัด concurrent tasks)
+        while pending and len(running) < max_in_flight:
+            job = pending.popleft()
+            running[job] = submit_job(job)
+            for var in job[0]:
+                progress[var]["running"] += 1
+
+        time.sleep(POLL_SECONDS)
+
+        for job, task in list(running.items()):
+            state = task.status()["state"]
+            if state not in ("COMPLETED", "FAILED", "CANCELLED"):
+                continue
+
+            variables, year, month, _ = job
+            for var in variables:
+                progress[var]["running"] -= 1
+                progress[var]["done" if state == "COMPLETED" else "failed"] += 1
+            if state != "COMPLETED":
+                print(f"❌ {'+'.join(variables)}_{year}_{month:02d}: {state}")
+            del running[job]
+
+        print_progress(progress)
+
+    return progress
 
 # =====================================================
 # ▶ MAIN
 # =====================================================
 def main():
-    target = get_next_month()
-    if target is None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--next-only", action="store_true", help="Export only the month after the last merged month")
+    parser.add_argument("--combined", action="store_true", help="Export one multi-band table per month and scale group")
+    args = parser.parse_args()
+    init("gee_export_tasks")
+
+    if args.next_only:
+        target = get_next_month()
+        if target is None:
+            return
+
+        year, month = target
+        print(f"📅 EXPORT TARGET: {year}-{month:02d}")
+
+        plan = [(var, year, month) for var in DATASETS]
+        tasks = []
+        with stage("submit"):
+            for job in build_jobs(plan, args.combined):
+                tasks.append(submit_job(job))
+                time.sleep(5)
+
+        print(f"✅ Submitted {len(tasks)} export tasks")
         return
 
-    year, month = target
-    print(f"📅 EXPORT TARGET: {year}-{month:02d}")
+    with stage("plan"):
+        plan = plan_missing_months()
+    if not plan:
+        print("⏸ Nothing to catch up")
+        return
 
-    tasks = []
-    for var, spec in DATASETS.items():
-        task = export_month(year, month, var, spec)
-        tasks.append(task)
-        time.sleep(5)
+    print(f"📅 CATCH-UP: {len(plan)} (variable, month) exports")
+    for var, year, month in plan:
+        print(f"   • {var} {year}-{month:02d}")
+
+    jobs = build_jobs(plan, args.combined)
+    with stage("queue") as st:
+        progress = run_queue(jobs)
+        st.rows(len(jobs), sum(p["done"] for p in progress.values()))
 
-    print(f"✅ Submitted {len(tasks)} export tasks")
+    failed = sum(p["failed"] for p in progress.values())
+    if failed:
+        raise SystemExit(f"❌ {failed} (variable, month) exports failed")
+    print(f"✅ Completed {len(jobs)} export tasks for {len(plan)} (variable, month) pairs")
 
 if __name__ == "__main__":
     main()
@@ -1,30 +1,17 @@
 import os
-import pandas as pd
-from glob import glob
+import sys
+import runpy
 
 assert "scripts_auto" in __file__, "❌ Wrong script path"
 
-MERGED_PATH = "gee-pipeline/outputs/merged/merged_dataset.parquet"
-CLEAN_DIR = "gee-pipeline/outputs/clean"
+# clean stage เขียน clean/<VAR>/<file>.parquet (key = province/district/subdistrict/year/month)
+# → ใช้ merge ชุดเดียวกับ scripts/merge_cleaned.py (manifest + cube ข้าง merged_dataset.parquet)
+# ไฟล์จาก export แบบ --combined (clean/COMBINED/, หลายตัวแปรใน 1 ไฟล์) ถูกแยกเป็นรายตัวแปรในนั้นด้วย
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS)
 
 def main():
-    clean_files = glob(f"{CLEAN_DIR}/*.parquet")
-    if not clean_files:
-        print("⚠️ No clean files")
-        return
-
-    new_df = pd.concat([pd.read_parquet(f) for f in clean_files])
-
-    if os.path.exists(MERGED_PATH):
-        old_df = pd.read_parquet(MERGED_PATH)
-        df = pd.concat([old_df, new_df])
-    else:
-        df = new_df
-
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.drop_duplicates(subset=["date", "province"]).sort_values("date")
-
-    df.to_parquet(MERGED_PATH)
+    runpy.run_path(os.path.join(SCRIPTS, "merge_cleaned.py"), run_name="__main__")
     print("✅ Merge complete")
 
 if __name__ == "__main__":
@@ -0,0 +1,305 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+import plotly.graph_objects as go
+
+# ----------------------------------------------------
+# GEOMETRY ASSET สำหรับ choropleth ของ dashboard
+#
+# สร้างครั้งเดียวต่อ process (เรียกผ่าน st.cache_resource) แล้วใช้ซ้ำทุก rerun:
+#   - ทุก feature มี "id" = area id (PROVINCE|DISTRICT|SUBDISTRICT) → featureidkey="id"
+#   - ถ้าเปิด static serving ของ Streamlit จะเขียน GeoJSON เป็นไฟล์ใน static/geo/
+#     แล้วส่งให้ plotly เป็น URL → browser โหลด polygon ครั้งเดียวแล้ว cache ไว้
+#   - update แผนที่แต่ละครั้งส่งแค่ (locations=id, z=value)
+#
+# geometry หลาย LOD มาจาก build_geometry.py (data/geo/) — dashboard เลือก LOD ตาม zoom
+# ถ้ายังไม่ได้ build จะ simplify จาก shapefile ตอนเริ่ม (1 LOD) เหมือนเดิม
+# ----------------------------------------------------
+AREA = ['province', 'district', 'subdistrict']
+LEVELS = AREA
+OUTLINE_LEVELS = ['province', 'district']
+SEP = '|'
+
+NAME_MAP = {
+    'Subdistric': 'subdistrict', 'District': 'district', 'Province': 'province',
+    'ADM3_EN': 'subdistrict', 'ADM2_EN': 'district', 'ADM1_EN': 'province',
+    'amphoe_en': 'district', 'tambon_en': 'subdistrict', 'changwat_en': 'province'
+}
+
+GEO_DIR = 'data/geo'
+STATIC_DIR = 'static/geo'
+STATIC_URL = 'app/static/geo'
+
+
+def level_keys(level):
+    return AREA[:LEVELS.index(level) + 1]
+
+
+def area_id(frame, level='subdistrict'):
+    """
+    key ของ level (ตัวพิมพ์ใหญ่แล้ว) → id เดียวกับ feature ใน asset
+    """
+    keys = [frame[c].astype(str) for c in level_keys(level)]
+    out = keys[0]
+    for k in keys[1:]:
+        out = out + SEP + k
+    return out.to_numpy()
+
+
+def normalize(gdf):
+    gdf = gdf.rename(columns=NAME_MAP)
+    for col in AREA:
+        gdf[col] = gdf[col].astype(str).str.upper()
+    return gdf
+
+
+def outline_coords(geom):
+    """
+    ขอบของ (Multi)Polygon → ([lon...], [lat...]) คั่นแต่ละเส้นด้วย None (plot เป็น trace เดียวได้)
+    """
+    lon, lat = [], []
+    for line in shapely.get_parts(shapely.boundary(geom)):
+        xy = shapely.get_coordinates(line)
+        lon += xy[:, 0].tolist() + [None]
+        lat += xy[:, 1].tolist() + [None]
+    return lon, lat
+
+
+def outline_table(gdf):
+    """
+    GeoDataFrame ระดับตำบล → {level: {id: (lon, lat)}} ของขอบจังหวัด/อำเภอ (dissolve ครั้งเดียว)
+    """
+    out = {}
+    for level in OUTLINE_LEVELS:
+        keys = level_keys(level)
+        dissolved = gdf[keys + ['geometry']].dissolve(by=keys, as_index=False)
+        out[level] = dict(zip(area_id(dissolved, level), map(outline_coords, dissolved.geometry)))
+    return out
+
+
+def lod_for_zoom(zoom, lods):
+    """
+    LOD ที่หยาบที่สุดที่ tolerance ยังไม่เกิน 1 pixel ที่ zoom นี้
+    lods = {name: tolerance °}
+    """
+    deg_per_px = 360 / (256 * 2 ** zoom)
+    fine_to_coarse = sorted(lods, key=lods.get)
+    fitting = [name for name in fine_to_coarse if lods[name] <= deg_per_px]
+    return fitting[-1] if fitting else fine_to_coarse[0]
+
+
+class GeoAsset:
+    """
+    geometry + lookup ต่อพื้นที่ (index = area id) สำหรับแผนที่ 1 level / 1 LOD
+    """
+
+    def __init__(self, gdf, url=None):
+        self.gdf = gdf
+        self.ids = gdf.index.to_numpy()
+        self.geojson = json.loads(gdf[['geometry']].to_json())
+        self.url = url
+
+        b = gdf.geometry.bounds
+        c = gdf.geometry.representative_point()
+        self.areas = pd.DataFrame({
+            **{col: gdf[col] for col in AREA if col in gdf.columns},
+            'lon': c.x, 'lat': c.y,
+            'minx': b['minx'], 'miny': b['miny'], 'maxx': b['maxx'], 'maxy': b['maxy'],
+        }, index=gdf.index)
+
+    def ref(self):
+        """
+        ค่าที่ส่งให้ geojson= ของ plotly: URL ถ้ามีไฟล์ static ไม่อย่างนั้น dict
+        """
+        return self.url or self.geojson
+
+    def bounds(self, ids=None):
+        a = self.areas if ids is None else self.areas.loc[self.areas.index.intersection(ids)]
+        return np.array([a['minx'].min(), a['miny'].min(), a['maxx'].max(), a['maxy'].max()])
+
+    def center(self, ids=None):
+        minx, miny, maxx, maxy = self.bounds(ids)
+        return {'lat': (miny + maxy) / 2, 'lon': (minx + maxx) / 2}
+
+    def align(self, ids, values):
+        """
+        ค่าตามลำดับ self.ids (พื้นที่ที่ไม่มีค่า = NaN)
+        values: (len(ids),) หรือ (len(ids), k) เช่น 1 คอลัมน์ต่อ frame
+        """
+        values = np.asarray(values, dtype=float)
+        pos = pd.Index(ids).get_indexer(self.ids)
+        out = np.full((len(self.ids),) + values.shape[1:], np.nan)
+        out[pos >= 0] = values[pos[pos >= 0]]
+        return out
+
+
+class GeoSet:
+    """
+    asset ทุก level × LOD (โหลดแบบ lazy ทีละไฟล์)
+    bounds / center / ids ใช้ subdistrict LOD หยาบสุด (ต่างจาก LOD ละเอียดไม่เกิน tolerance)
+    """
+
+    def __init__(self, loaders, lods, static=False, outline_loaders=None):
+        self._loaders = loaders
+        self._assets = {}
+        self._outline_loaders = outline_loaders or {}
+        self._outlines = {}
+        self.lods = lods
+        self.static = static
+
+    def asset(self, level='subdistrict', lod=None):
+        lod = lod or self.coarsest
+        key = (level, lod)
+        if key not in self._assets:
+            gdf, name = self._loaders[key]()
+            self._assets[key] = GeoAsset(gdf, _publish(gdf, name) if self.static else None)
+        return self._assets[key]
+
+    @property
+    def coarsest(self):
+        return max(self.lods, key=self.lods.get)
+
+    def for_zoom(self, zoom, level='subdistrict'):
+        return self.asset(level, lod_for_zoom(zoom, self.lods))
+
+    @property
+    def ids(self):
+        return self.asset().ids
+
+    def bounds(self, ids=None):
+        return self.asset().bounds(ids)
+
+    def center(self, ids=None):
+        return self.asset().center(ids)
+
+    def outline(self, level, ids, zoom=None):
+        """
+        เส้นขอบของ province/district ที่เลือก → (lon, lat) สำหรับ Scattermapbox 1 trace
+        ใช้เส้นที่ build ไว้แล้ว ถ้าไม่มีจะ dissolve จาก asset ระดับตำบลครั้งเดียวแล้ว cache
+        """
+        lod = self.coarsest if zoom is None else lod_for_zoom(zoom, self.lods)
+        if lod not in self._outlines:
+            loader = self._outline_loaders.get(lod)
+            self._outlines[lod] = loader() if loader else outline_table(self.asset('subdistrict', lod).gdf)
+        table = self._outlines[lod][level]
+
+        lon, lat = [], []
+        for i in ids:
+            if i in table:
+                lon += table[i][0]
+                lat += table[i][1]
+        return lon, lat
+
+
+# ----------------------------------------------------
+# ANIMATION (เล่นใน browser ทั้งหมด)
+# ----------------------------------------------------
+def animate(fig, frames, labels, duration=300, active=0, prefix='', customdata=None):
+    """
+    ใส่ animation ให้ trace แรกของ fig: geometry/hover ส่งครั้งเดียว แต่ละ frame มีแค่ z
+    frames: (n_frames, n_locations) ตามลำดับ locations ของ trace
+    customdata: list ต่อ frame (ถ้า hover แสดงค่าที่เปลี่ยนตาม frame นอกจาก z)
+    """
+    labels = [str(l) for l in labels]
+    frames = np.round(np.asarray(frames, dtype=float), 4)
+    play = dict(frame=dict(duration=duration, redraw=True), transition=dict(duration=0), fromcurrent=True, mode='immediate')
+    jump = dict(frame=dict(duration=0, redraw=True), transition=dict(duration=0), mode='immediate')
+
+    data = [dict(z=z) for z in frames]
+    if customdata is not None:
+        for d, c in zip(data, customdata):
+            d['customdata'] = c
+
+    fig.update_traces(data[active], selector=0)
+    fig.frames = [go.Frame(name=l, data=[d], traces=[0]) for d, l in zip(data, labels)]
+    fig.update_layout(
+        updatemenus=[dict(
+            type='buttons', direction='left', showactive=False,
+            x=0, y=0, xanchor='left', yanchor='top', pad=dict(t=10, r=10),
+            buttons=[
+                dict(label='▶', method='animate', args=[None, play]),
+                dict(label='⏸', method='animate', args=[[None], dict(frame=dict(duration=0, redraw=False), mode='immediate')]),
+            ],
+        )],
+        sliders=[dict(
+            active=active, x=0.08, len=0.92, y=0, yanchor='top', pad=dict(t=10),
+            currentvalue=dict(prefix=prefix),
+            steps=[dict(method='animate', label=l, args=[[l], jump]) for l in labels],
+        )],
+    )
+    return fig
+
+
+def _publish(gdf, name):
+    """
+    เขียน GeoJSON ลง static/geo/<name>-<hash>.json (ชื่อไฟล์เปลี่ยนเมื่อ geometry เปลี่ยน)
+    """
+    text = gdf[['geometry']].to_json()
+    digest = hashlib.sha1(text.encode()).hexdigest()[:10]
+    filename = f"{name}-{digest}.json"
+    path = os.path.join(STATIC_DIR, filename)
+    if not os.path.exists(path):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return f"{STATIC_URL}/{filename}"
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _read_built(path, level):
+    gdf = gpd.read_file(path)
+    gdf.index = pd.Index(area_id(gdf, level), name='id')
+    return gdf[level_keys(level) + ['geometry']]
+
+
+def build_asset(shp_path, tolerance=None):
+    """
+    อ่าน shapefile → GeoDataFrame 1 feature ต่อ area id (simplify ตาม tolerance)
+    """
+    gdf = normalize(gpd.read_file(shp_path))
+    if tolerance:
+        gdf['geometry'] = gdf['geometry'].simplify(tolerance, preserve_topology=True)
+
+    gdf.index = pd.Index(area_id(gdf), name='id')
+    if gdf.index.duplicated().any():
+        gdf = gdf.dissolve(by=AREA, as_index=False)
+        gdf.index = pd.Index(area_id(gdf), name='id')
+    return gdf[AREA + ['geometry']].sort_index()
+
+
+def load_geometry(shp_path, tolerance, geo_dir=GEO_DIR, static=False):
+    """
+    GeoSet จาก data/geo/manifest.json (build_geometry.py) ถ้ามี
+    ไม่อย่างนั้น simplify shapefile ตอนเริ่มเป็น LOD เดียว (subdistrict)
+    """
+    manifest_path = os.path.join(geo_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        lods = {name: spec['tolerance'] for name, spec in manifest['lods'].items()}
+        loaders = {
+            (level, lod): (lambda p=os.path.join(geo_dir, spec['file']), level=level, name=f"{level}_{lod}":
+                           (_read_built(p, level), name))
+            for level, files in manifest['files'].items()
+            for lod, spec in files.items()
+        }
+        outline_loaders = {
+            lod: (lambda p=os.path.join(geo_dir, filename): _read_json(p))
+            for lod, filename in manifest.get('outlines', {}).items()
+        }
+        return GeoSet(loaders, lods, static, outline_loaders)
+
+    print(f"⚠️ {manifest_path} not found — simplifying {shp_path} at start-up (run build_geometry.py)")
+    name = os.path.splitext(os.path.basename(shp_path))[0]
+    loaders = {('subdistrict', 'default'): lambda: (build_asset(shp_path, tolerance), name)}
+    return GeoSet(loaders, {'default': tolerance}, static)